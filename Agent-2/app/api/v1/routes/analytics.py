@@ -1,66 +1,216 @@
-from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_db
-from app.services.campaigns.analytics import campaign_analytics_service
-from sqlalchemy import select, desc
-from app.models.locks import SchedulerLock, SchedulerRun
+from app.core.db import AsyncSessionLocal, engine, get_db
+from app.services.campaigns.analytics import LEAD_DIMENSIONS, campaign_analytics_service
+from app.services.campaigns.rollups import rebuild_rollups
+from app.services.campaigns.analytics_cache import ALL_CAMPAIGNS, analytics_cache
+from app.services.campaigns.experiments import FUNNEL_STAGES, experiment_service
+from sqlalchemy import select, desc, func
+from app.models.locks import SchedulerRun
+from app.models.campaign import CampaignRecipient
+from app.services.campaigns.leases import WORKER_ID, lease_worker
+from app.services.campaigns.timer import send_timer
+from app.services.campaigns.templates import template_cache
+from app.services.export.streaming import (
+    MEDIA_TYPES,
+    PARQUET_AVAILABLE,
+    export_filename,
+    leads_export_stmt,
+    messages_export_stmt,
+    recipients_export_stmt,
+    scores_export_stmt,
+    stream_export,
+)
 
 router = APIRouter()
 
+# Hourly series are capped so a response stays a few hundred points
+MAX_HOURLY_DAYS = 31
+
+def _cached(endpoint: str, params: dict, fn, tags=(ALL_CAMPAIGNS,)):
+    """Serve `fn(db)` through the analytics cache; the computation gets its own session so it can outlive the request."""
+    async def compute():
+        async with AsyncSessionLocal() as db:
+            return await fn(db)
+    return analytics_cache.get_or_compute(endpoint, params, compute, tags)
+
 @router.get("/campaigns/{campaign_id}/performance")
-async def get_campaign_performance(
-    campaign_id: int,
-    db: AsyncSession = Depends(get_db)
-):
+async def get_campaign_performance(campaign_id: int):
     """Get performance metrics for a specific campaign"""
-    return await campaign_analytics_service.get_campaign_performance(campaign_id, db)
+    return await _cached(
+        "campaign_performance", {"campaign_id": campaign_id},
+        lambda db: campaign_analytics_service.get_campaign_performance(campaign_id, db),
+        tags=(campaign_id,),
+    )
 
-@router.get("/campaigns/overview")
-async def get_campaigns_overview(
+@router.get("/campaigns/{campaign_id}/timeseries")
+async def get_campaign_timeseries(
+    campaign_id: int,
+    granularity: str = Query(default="day", pattern="^(hour|day)$"),
     days: int = Query(default=30, ge=1, le=365),
-    db: AsyncSession = Depends(get_db)
+    step: Optional[int] = Query(default=None, ge=0, description="Only this sequence step"),
+    variant_label: Optional[str] = Query(default=None, description="Only this A/B variant (\"\" for unvaried sends)"),
 ):
+    """Sent/delivered/opened/clicked/replied/bounced per hour or day, gap-filled for charting"""
+    if granularity == "hour" and days > MAX_HOURLY_DAYS:
+        raise HTTPException(status_code=400, detail=f"Hourly series cover at most {MAX_HOURLY_DAYS} days")
+    return await _cached(
+        "campaign_timeseries",
+        {"campaign_id": campaign_id, "granularity": granularity, "days": days, "step": step, "variant_label": variant_label},
+        lambda db: campaign_analytics_service.get_campaign_timeseries(campaign_id, db, granularity, days, step, variant_label),
+        tags=(campaign_id,),
+    )
+
+@router.get("/campaigns/{campaign_id}/funnel")
+async def get_campaign_funnel(
+    campaign_id: int,
+    days: Optional[int] = Query(default=None, ge=1, le=365, description="Only messages sent in the last N days"),
+    metric: str = Query(default="replied", description="Stage the significance test compares"),
+    confidence: float = Query(default=0.95, gt=0.5, lt=1),
+):
+    """Sent→delivered→opened→clicked→replied per (step, variant) with Wilson intervals and a z-test against each step's control"""
+    if metric not in FUNNEL_STAGES:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {', '.join(FUNNEL_STAGES)}")
+    return await _cached(
+        "campaign_funnel",
+        {"campaign_id": campaign_id, "days": days, "metric": metric, "confidence": confidence},
+        lambda db: experiment_service.get_funnel(db, campaign_id, days, metric, confidence),
+        tags=(campaign_id,),
+    )
+
+async def _overall(days: int):
+    return await _cached("overall", {"days": days}, lambda db: campaign_analytics_service.get_overall_analytics(db, days))
+
+@router.get("/campaigns/overview")
+async def get_campaigns_overview(days: int = Query(default=30, ge=1, le=365)):
     """Get campaigns overview analytics"""
-    return await campaign_analytics_service.get_overall_analytics(db, days)
+    return await _overall(days)
 
 @router.get("/overall")
-async def get_overall_analytics(
-    days: int = Query(default=30, ge=1, le=365),
-    db: AsyncSession = Depends(get_db)
-):
+async def get_overall_analytics(days: int = Query(default=30, ge=1, le=365)):
     """Get overall analytics across all campaigns"""
-    return await campaign_analytics_service.get_overall_analytics(db, days)
+    return await _overall(days)
+
+def _lead_dimensions(group_by: Optional[List[str]]) -> List[str]:
+    dimensions = [d.strip() for value in group_by or [] for d in value.split(",") if d.strip()]
+    unknown = [d for d in dimensions if d not in LEAD_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by {unknown}; expected any of {list(LEAD_DIMENSIONS)}")
+    return list(dict.fromkeys(dimensions))
+
+async def _lead_performance(days: int, group_by: Optional[List[str]], bucket_size: int):
+    dimensions = _lead_dimensions(group_by)
+    # Lead analytics do not depend on campaign events, so only the TTL expires them
+    return await _cached(
+        "lead_performance", {"days": days, "group_by": dimensions, "bucket_size": bucket_size},
+        lambda db: campaign_analytics_service.get_lead_performance_analytics(db, days, dimensions, bucket_size),
+        tags=(),
+    )
 
 @router.get("/leads")
 async def get_lead_performance_analytics(
     days: int = Query(default=30, ge=1, le=365),
-    db: AsyncSession = Depends(get_db)
+    group_by: Optional[List[str]] = Query(default=None, description="Extra breakdowns: role, location, source, stage"),
+    bucket_size: int = Query(default=10, ge=1, le=100, description="Score histogram bucket width"),
 ):
     """Get lead performance analytics"""
-    return await campaign_analytics_service.get_lead_performance_analytics(db, days)
+    return await _lead_performance(days, group_by, bucket_size)
 
 @router.get("/leads/performance")
 async def get_leads_performance(
     days: int = Query(default=30, ge=1, le=365),
-    db: AsyncSession = Depends(get_db)
+    group_by: Optional[List[str]] = Query(default=None, description="Extra breakdowns: role, location, source, stage"),
+    bucket_size: int = Query(default=10, ge=1, le=100, description="Score histogram bucket width"),
 ):
     """Get leads performance analytics (alias for /leads)"""
-    return await campaign_analytics_service.get_lead_performance_analytics(db, days)
+    return await _lead_performance(days, group_by, bucket_size)
+
+@router.get("/cache")
+async def analytics_cache_stats():
+    """Hit/miss counters for the analytics response cache"""
+    return analytics_cache.snapshot()
+
+@router.delete("/cache")
+async def clear_analytics_cache():
+    analytics_cache.clear()
+    return {"ok": True}
+
+@router.get("/export")
+async def export_analytics(
+    dataset: str = Query(default="scores", pattern="^(leads|scores|recipients|messages)$"),
+    format: str = Query(default="csv", pattern="^(csv|ndjson|parquet)$"),
+    campaign_id: Optional[int] = None,
+    days: Optional[int] = Query(default=None, ge=1),
+    qualification_status: Optional[str] = None,
+    company_size: Optional[str] = None,
+    role: Optional[str] = None,
+    industry: Optional[str] = None,
+    location: Optional[str] = None,
+):
+    """Stream leads, lead scores, campaign recipients or message logs for warehouse loads.
+
+    Lead filters apply to leads/scores, campaign_id to recipients/messages, days to messages.
+    """
+    if format == "parquet" and not PARQUET_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    filters = {"company_size": company_size, "role": role, "industry": industry, "location": location}
+    if dataset == "leads":
+        stmt = leads_export_stmt(filters)
+    elif dataset == "scores":
+        stmt = scores_export_stmt(filters, qualification_status)
+    elif dataset == "recipients":
+        stmt = recipients_export_stmt(campaign_id)
+    else:
+        stmt = messages_export_stmt(campaign_id, days)
+    return StreamingResponse(
+        stream_export(stmt, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(dataset, format)}"'},
+    )
+
+async def _rebuild_rollups(campaign_id: Optional[int]) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(rebuild_rollups, campaign_id)
+    if campaign_id is None:
+        analytics_cache.invalidate_all()
+    else:
+        analytics_cache.invalidate_campaigns([campaign_id])
+
+@router.post("/rollups/rebuild", status_code=202)
+async def rebuild_campaign_rollups(background_tasks: BackgroundTasks, campaign_id: Optional[int] = None):
+    """Recompute the hourly/daily campaign rollups from recorded events in the background."""
+    background_tasks.add_task(_rebuild_rollups, campaign_id)
+    return {"ok": True, "campaign_id": campaign_id}
 
 @router.get("/scheduler/health")
 async def scheduler_health(db: AsyncSession = Depends(get_db)):
-    """Expose scheduler lock ownership and expiration."""
-    lock = await db.get(SchedulerLock, "campaign_scheduler")
-    if not lock:
-        out = {"locked": False}
-    else:
-        out = {
-        "locked": bool(lock.owner_token),
-        "owner_token": lock.owner_token,
-        "expires_at": lock.expires_at.isoformat() if lock.expires_at else None,
-    }
+    """Expose active recipient leases per scheduler worker and the last run."""
+    now = datetime.now(timezone.utc)
+    res = await db.execute(
+        select(CampaignRecipient.lease_owner, func.count(), func.max(CampaignRecipient.lease_expires_at))
+        .where(CampaignRecipient.lease_owner.is_not(None), CampaignRecipient.lease_expires_at > now)
+        .group_by(CampaignRecipient.lease_owner)
+    )
+    # lease_owner is a per-claim token; report per worker
+    by_worker = {}
+    for owner, leased, expires in res.all():
+        entry = by_worker.setdefault(lease_worker(owner), {"owner": lease_worker(owner), "leased": 0, "expires_at": None})
+        entry["leased"] += leased
+        if expires and (entry["expires_at"] is None or expires > entry["expires_at"]):
+            entry["expires_at"] = expires
+    workers = [
+        {**entry, "expires_at": entry["expires_at"].isoformat() if entry["expires_at"] else None}
+        for entry in by_worker.values()
+    ]
+    expired = await db.scalar(
+        select(func.count()).select_from(CampaignRecipient)
+        .where(CampaignRecipient.lease_owner.is_not(None), CampaignRecipient.lease_expires_at <= now)
+    )
+    out = {"worker_id": WORKER_ID, "active_workers": workers, "expired_leases": expired or 0, "timer": send_timer.snapshot(), "templates": template_cache.snapshot()}
     # Add last run stats
     res = await db.execute(select(SchedulerRun).order_by(desc(SchedulerRun.id)).limit(1))
     last = res.scalars().first()
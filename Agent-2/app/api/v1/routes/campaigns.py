@@ -9,7 +9,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.db import get_db
 from app.models.campaign import Campaign, CampaignEmail, CampaignEmailVariant, CampaignRecipient
 from app.models.email_tracking import CampaignRecipientEvent, EmailMessageLog
-from app.models.locks import SchedulerLock
 
 from app.schemas.campaign import (
 	CampaignCreate,
@@ -19,22 +18,36 @@ from app.schemas.campaign import (
 )
 from app.models.lead import Lead
 from app.services.ai.suggest import suggest
+from app.services.campaigns.experiments import experiment_service
+from app.services.campaigns.leases import release_all_leases
+from app.services.campaigns.timer import send_timer
+from app.services.campaigns.templates import template_errors
 
 router = APIRouter()
 
+def _check_email_templates(emails: List[CampaignEmailCreate] | None) -> None:
+	"""Reject sequences whose templates do not compile, before anything is saved."""
+	errors = template_errors(
+		(f"emails[{i}].{name}", getattr(e, name))
+		for i, e in enumerate(emails or [])
+		for name in ("subject_template", "body_template")
+	)
+	if errors:
+		raise HTTPException(status_code=422, detail=errors)
+
 @router.get("/", response_model=List[CampaignOut])
-async def list_campaigns(skip: int = 0, limit: int = 50, db: AsyncSession = Depends(get_db), response: Response | None = None):
+async def list_campaigns(response: Response, skip: int = 0, limit: int = 50, db: AsyncSession = Depends(get_db)):
 	from sqlalchemy import func
 	base = select(Campaign)
-	if response is not None:
-		count_res = await db.execute(select(func.count()).select_from(base.subquery()))
-		response.headers["X-Total-Count"] = str(count_res.scalar_one() or 0)
+	count_res = await db.execute(select(func.count()).select_from(base.subquery()))
+	response.headers["X-Total-Count"] = str(count_res.scalar_one() or 0)
 	res = await db.execute(base.options(selectinload(Campaign.emails)).offset(skip).limit(limit))
 	return list(res.scalars().all())
 
 @router.post("/", response_model=CampaignOut)
 async def create_campaign(payload: CampaignCreate, db: AsyncSession = Depends(get_db)):
-	campaign = Campaign(name=payload.name, offer=payload.offer, status=payload.status)
+	_check_email_templates(payload.emails)
+	campaign = Campaign(name=payload.name, offer=payload.offer, status=payload.status, ab_bandit=payload.ab_bandit)
 	if payload.emails:
 		await db.flush()
 		for i, e in enumerate(payload.emails):
@@ -60,6 +73,7 @@ async def get_campaign(campaign_id: int, db: AsyncSession = Depends(get_db)):
 
 @router.patch("/{campaign_id}", response_model=CampaignOut)
 async def update_campaign(campaign_id: int, payload: CampaignUpdate, db: AsyncSession = Depends(get_db)):
+	_check_email_templates(payload.emails)
 	campaign = await db.get(Campaign, campaign_id)
 	if not campaign:
 		return None
@@ -103,6 +117,8 @@ async def enroll_recipients(campaign_id: int, body: EnrollRequest, db: AsyncSess
 			rec.next_send_at = datetime.now(timezone.utc)
 		db.add(rec)
 	await db.commit()
+	if body.send_now:
+		send_timer.schedule(datetime.now(timezone.utc))
 	return {"ok": True}
 
 class PauseRequest(BaseModel):
@@ -115,6 +131,8 @@ async def pause_recipient(campaign_id: int, recipient_id: int, body: PauseReques
 		return {"ok": False}
 	rec.paused = body.paused
 	await db.commit()
+	if not rec.paused:
+		send_timer.schedule(rec.next_send_at)
 	return {"ok": True}
 
 class VariantRequest(BaseModel):
@@ -125,6 +143,9 @@ class VariantRequest(BaseModel):
 
 @router.post("/emails/{email_id}/variants")
 async def add_variant(email_id: int, body: VariantRequest, db: AsyncSession = Depends(get_db)):
+	errors = template_errors([("subject_template", body.subject_template), ("body_template", body.body_template)])
+	if errors:
+		raise HTTPException(status_code=422, detail=errors)
 	email = await db.get(CampaignEmail, email_id)
 	if not email:
 		return {"ok": False}
@@ -133,6 +154,14 @@ async def add_variant(email_id: int, body: VariantRequest, db: AsyncSession = De
 	await db.commit()
 	return {"ok": True}
 
+@router.post("/{campaign_id}/variants/rebalance")
+async def rebalance_variants(campaign_id: int, db: AsyncSession = Depends(get_db)):
+	"""Re-derive A/B weights from results now (bandit campaigns also do this after scheduler runs)."""
+	campaign = await db.get(Campaign, campaign_id)
+	if not campaign:
+		raise HTTPException(status_code=404, detail="Campaign not found")
+	return {"ok": True, "weights": await experiment_service.rebalance(db, campaign_id)}
+
 class GenerateSequenceRequest(BaseModel):
 	role: str
 	offer: str
@@ -154,15 +183,10 @@ async def generate_sequence(campaign_id: int, body: GenerateSequenceRequest, db:
 	await db.commit()
 	return {"ok": True, "steps": len(texts)}
 
-# --- Admin: force release scheduler lock ---
+# --- Admin: force release scheduler leases ---
 
 @router.post("/admin/scheduler/unlock")
 async def force_unlock_scheduler(db: AsyncSession = Depends(get_db)):
-    lock = await db.get(SchedulerLock, "campaign_scheduler")
-    if not lock:
-        return {"ok": True, "message": "No lock present"}
-    lock.owner_token = None
-    lock.expires_at = None
-    db.add(lock)
-    await db.commit()
-    return {"ok": True}
+    """Release every recipient lease so any worker can claim the rows on its next tick."""
+    released = await release_all_leases(db)
+    return {"ok": True, "released": released}
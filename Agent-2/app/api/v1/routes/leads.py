@@ -1,16 +1,27 @@
 from typing import List, Optional
+import json
 import os
 
-from fastapi import APIRouter, Depends, Query, HTTPException, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Form, Query, HTTPException, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_db
+from app.core.db import get_db, AsyncSessionLocal
 from app.models.lead import Lead
 from app.models.lead_note import LeadNote
+from app.models.lead_import import LeadImportJob, LeadImportError
 from sqlalchemy import desc
 from app.schemas.lead import LeadCreate, LeadOut, LeadUpdate
-from app.services.scrapers.aggregator import aggregate_search
+from app.services.scrapers.aggregator import aggregate_search, stream_search
+from app.services.leads.upsert import upsert_scraped_leads, link_lead_sources
+from app.services.export.streaming import MEDIA_TYPES, PARQUET_AVAILABLE, export_filename, leads_export_stmt, stream_export
+from app.services.leads.importer import detect_format, run_import, spool_upload
+from app.services.leads.listing import filtered_leads, encode_cursor, decode_cursor, lead_counts
+from app.services.leads.leaderboard import leaderboards
+from app.services.scrapers.cache import search_cache
 from app.core.config import settings
 from app.models.scraping import SearchRun, LeadSource
 from sqlalchemy import desc
@@ -66,6 +77,16 @@ async def debug_scrapers():
 		"config_file_location": os.path.dirname(__file__)
 	}
 
+@router.get("/search-cache")
+async def search_cache_stats():
+	"""Hit/miss counters for the lead search result cache"""
+	return search_cache.snapshot()
+
+@router.delete("/search-cache")
+async def clear_search_cache():
+	await search_cache.clear()
+	return {"ok": True}
+
 @router.get("/search-runs")
 async def list_search_runs(skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=200), db: AsyncSession = Depends(get_db)):
 	from sqlalchemy import select
@@ -111,7 +132,7 @@ async def test_mock_scraping():
 	}
 	
 	# Force mock data by passing empty providers list
-	records = await aggregate_search(query, providers=[])
+	records, _run_id = await aggregate_search(query, providers=[])
 	
 	return {
 		"query": query,
@@ -122,40 +143,119 @@ async def test_mock_scraping():
 
 @router.get("/", response_model=List[LeadOut])
 async def list_leads(
+	response: Response,
 	company_size: Optional[str] = None,
 	role: Optional[str] = None,
 	industry: Optional[str] = None,
 	location: Optional[str] = None,
-	skip: int = Query(0, ge=0),
+	cursor: Optional[str] = Query(None, description="Opaque token from a previous page's X-Next-Cursor header"),
+	skip: int = Query(0, ge=0, description="Deprecated offset paging; ignored when cursor is given"),
 	limit: int = Query(50, ge=1, le=200),
 	db: AsyncSession = Depends(get_db),
-	response: Response | None = None,
 ):
-	from sqlalchemy import func
-	base_stmt = select(Lead)
-	if company_size:
-		base_stmt = base_stmt.where(Lead.company_size == company_size)
-	if role:
-		base_stmt = base_stmt.where(Lead.role == role)
-	if industry:
-		base_stmt = base_stmt.where(Lead.industry == industry)
-	if location:
-		base_stmt = base_stmt.where(Lead.location == location)
-	# total count header
-	if response is not None:
-		count_stmt = select(func.count()).select_from(base_stmt.subquery())
-		count_res = await db.execute(count_stmt)
-		total = count_res.scalar_one() or 0
-		response.headers["X-Total-Count"] = str(total)
-	stmt = base_stmt.offset(skip).limit(limit)
-	res = await db.execute(stmt)
-	return list(res.scalars().all())
+	"""Newest-first leads page. Follow X-Next-Cursor for subsequent pages (keyset on id);
+	X-Total-Count is cached per filter combination and reset on lead writes."""
+	filters = {"company_size": company_size, "role": role, "industry": industry, "location": location}
+	stmt = filtered_leads(filters).order_by(desc(Lead.id))
+	if cursor:
+		try:
+			stmt = stmt.where(Lead.id < decode_cursor(cursor))
+		except ValueError:
+			raise HTTPException(status_code=400, detail="Invalid cursor")
+	elif skip:
+		stmt = stmt.offset(skip)
+	# Fetch one extra row to know whether another page exists
+	res = await db.execute(stmt.limit(limit + 1))
+	leads = list(res.scalars().all())
+	response.headers["X-Total-Count"] = str(await lead_counts.count(db, filters))
+	if len(leads) > limit:
+		response.headers["X-Next-Cursor"] = encode_cursor(leads[limit - 1].id)
+	return leads[:limit]
+
+@router.get("/export")
+async def export_leads(
+	format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+	company_size: Optional[str] = None,
+	role: Optional[str] = None,
+	industry: Optional[str] = None,
+	location: Optional[str] = None,
+):
+	"""Stream every lead matching the list_leads filters as CSV, NDJSON or Parquet."""
+	if format == "parquet" and not PARQUET_AVAILABLE:
+		raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+	stmt = leads_export_stmt({"company_size": company_size, "role": role, "industry": industry, "location": location})
+	return StreamingResponse(
+		stream_export(stmt, format),
+		media_type=MEDIA_TYPES[format],
+		headers={"Content-Disposition": f'attachment; filename="{export_filename("leads", format)}"'},
+	)
+
+def _import_job_out(job: LeadImportJob) -> dict:
+	return {
+		"id": job.id,
+		"filename": job.filename,
+		"format": job.format,
+		"overwrite": job.overwrite,
+		"status": job.status,
+		"processed_rows": job.processed_rows,
+		"inserted_rows": job.inserted_rows,
+		"updated_rows": job.updated_rows,
+		"duplicate_rows": job.duplicate_rows,
+		"failed_rows": job.failed_rows,
+		"error": job.error,
+		"created_at": job.created_at.isoformat() if job.created_at else None,
+		"started_at": job.started_at.isoformat() if job.started_at else None,
+		"finished_at": job.finished_at.isoformat() if job.finished_at else None,
+	}
+
+@router.post("/import", status_code=202)
+async def import_leads(
+	background_tasks: BackgroundTasks,
+	file: UploadFile = File(...),
+	format: Optional[str] = Form(None, pattern="^(csv|ndjson)$"),
+	overwrite: bool = Form(False),
+	db: AsyncSession = Depends(get_db),
+):
+	"""Queue a CSV/NDJSON lead import. Rows are deduped by email/LinkedIn identity (within the
+	file and against existing leads); poll GET /import/{job_id} for progress."""
+	fmt = detect_format(file.filename, format)
+	if not fmt:
+		raise HTTPException(status_code=400, detail="Unknown file format; pass format=csv|ndjson")
+	path = await spool_upload(file)
+	job = LeadImportJob(filename=file.filename, format=fmt, overwrite=overwrite)
+	db.add(job)
+	await db.commit()
+	await db.refresh(job)
+	background_tasks.add_task(run_import, job.id, path)
+	return _import_job_out(job)
+
+@router.get("/import/{job_id}")
+async def get_import_job(job_id: int, db: AsyncSession = Depends(get_db)):
+	job = await db.get(LeadImportJob, job_id)
+	if not job:
+		raise HTTPException(status_code=404, detail="Import job not found")
+	return _import_job_out(job)
+
+@router.get("/import/{job_id}/errors")
+async def list_import_errors(
+	job_id: int,
+	after: int = Query(0, ge=0, description="Return errors with id greater than this (keyset paging)"),
+	limit: int = Query(500, ge=1, le=5000),
+	db: AsyncSession = Depends(get_db),
+):
+	res = await db.execute(
+		select(LeadImportError).where(LeadImportError.job_id == job_id, LeadImportError.id > after).order_by(LeadImportError.id).limit(limit)
+	)
+	return [{"id": e.id, "row": e.row_number, "error": e.error, "data": e.data} for e in res.scalars().all()]
 
 @router.post("/", response_model=LeadOut)
 async def create_lead(payload: LeadCreate, db: AsyncSession = Depends(get_db)):
 	lead = Lead(**payload.model_dump(exclude_unset=True))
 	db.add(lead)
-	await db.commit()
+	try:
+		await db.commit()
+	except IntegrityError:
+		raise HTTPException(status_code=409, detail="A lead with this email or LinkedIn URL already exists")
 	await db.refresh(lead)
 	return lead
 
@@ -171,7 +271,10 @@ async def update_lead(lead_id: int, payload: LeadUpdate, db: AsyncSession = Depe
 		return None
 	for k, v in payload.model_dump(exclude_unset=True).items():
 		setattr(lead, k, v)
-	await db.commit()
+	try:
+		await db.commit()
+	except IntegrityError:
+		raise HTTPException(status_code=409, detail="A lead with this email or LinkedIn URL already exists")
 	await db.refresh(lead)
 	return lead
 
@@ -182,6 +285,7 @@ async def delete_lead(lead_id: int, db: AsyncSession = Depends(get_db)):
 		return {"ok": True}
 	await db.delete(lead)
 	await db.commit()
+	leaderboards.forget([lead_id])
 	return {"ok": True}
 
 # --- Lead Notes ---
@@ -235,39 +339,63 @@ async def scrape_leads(
 	industry: Optional[str] = None,
 	location: Optional[str] = None,
 	providers: Optional[List[str]] = Query(default=None),
+	force_refresh: bool = False,
 	db: AsyncSession = Depends(get_db),
 ):
-    query = {"company_size": company_size, "role": role, "industry": industry, "location": location}
-    records, run_id = await aggregate_search(query, providers)
-    created: List[Lead] = []
-    # Upsert by email/linkedin
-    from sqlalchemy import select
-    for r in records:
-        payload = {k: v for k, v in r.items() if k in {"name","email","company","role","linkedin_url","source","company_size","industry","location"}}
-        existing: Lead | None = None
-        if payload.get("email"):
-            res = await db.execute(select(Lead).where(Lead.email == payload["email"]))
-            existing = res.scalars().first()
-        if not existing and payload.get("linkedin_url"):
-            res = await db.execute(select(Lead).where(Lead.linkedin_url == payload["linkedin_url"]))
-            existing = res.scalars().first()
-        if existing:
-            for k, v in payload.items():
-                if v is not None:
-                    setattr(existing, k, v)
-            db.add(existing)
-            created.append(existing)
-        else:
-            lead = Lead(**payload)
-            db.add(lead)
-            created.append(lead)
-    await db.commit()
-    for l in created:
-        await db.refresh(l)
-    # Optionally attach lead_ids to LeadSource for this run
-    if run_id:
-        from sqlalchemy import update
-        for l in created:
-            await db.execute(update(LeadSource).where(LeadSource.search_run_id == run_id).where((LeadSource.data["email"].as_string() == (l.email or "")) | (LeadSource.data["linkedin_url"].as_string() == (l.linkedin_url or ""))).values(lead_id=l.id))
-        await db.commit()
-    return created
\ No newline at end of file
+	query = {"company_size": company_size, "role": role, "industry": industry, "location": location}
+	records, run_id = await aggregate_search(query, providers, force_refresh=force_refresh)
+	# Set-based upsert by email/linkedin, then attach lead_ids to this run's LeadSource rows
+	# (several scraped rows can resolve to one lead; list it once)
+	created = list(dict.fromkeys(l for l in await upsert_scraped_leads(db, records) if l is not None))
+	if run_id:
+		await link_lead_sources(db, run_id, created)
+	await db.commit()
+	return created
+
+@router.post("/scrape/stream")
+async def scrape_leads_stream(
+	company_size: Optional[str] = None,
+	role: Optional[str] = None,
+	industry: Optional[str] = None,
+	location: Optional[str] = None,
+	providers: Optional[List[str]] = Query(default=None),
+	force_refresh: bool = False,
+	batch_size: int = Query(default=settings.SCRAPE_STREAM_BATCH_SIZE, ge=1, le=500),
+):
+	"""NDJSON variant of /scrape: each deduped lead is pushed as its provider yields it,
+	and leads are persisted in micro-batches (`persisted` events carry their ids)."""
+	query = {"company_size": company_size, "role": role, "industry": industry, "location": location}
+
+	async def _persist(db: AsyncSession, batch: List[tuple[str, dict]], run_id: int | None) -> List[int]:
+		# One entry per record, in order, so each provenance row gets its own lead
+		leads = await upsert_scraped_leads(db, [n for _, n in batch])
+		if run_id:
+			db.add_all([
+				LeadSource(search_run_id=run_id, provider=name, lead_id=l.id if l else None, data=n)
+				for (name, n), l in zip(batch, leads)
+				if name != "mock"  # fallback leads have no provider provenance
+			])
+		await db.commit()
+		return [l.id for l in leads if l is not None]
+
+	async def _events():
+		batch: List[tuple[str, dict]] = []
+		run_id: int | None = None
+		async with AsyncSessionLocal() as db:
+			async for event in stream_search(query, providers, force_refresh=force_refresh):
+				if event["type"] == "run":
+					# Cached runs already have their provenance rows
+					run_id = None if event["cached"] else event["search_run_id"]
+				elif event["type"] == "lead":
+					batch.append((event["provider"], event["lead"]))
+				elif batch:
+					lead_ids = await _persist(db, batch, run_id)
+					batch = []
+					yield json.dumps({"type": "persisted", "lead_ids": lead_ids}) + "\n"
+				yield json.dumps(event, default=str) + "\n"
+				if len(batch) >= batch_size:
+					lead_ids = await _persist(db, batch, run_id)
+					batch = []
+					yield json.dumps({"type": "persisted", "lead_ids": lead_ids}) + "\n"
+
+	return StreamingResponse(_events(), media_type="application/x-ndjson")
@@ -2,13 +2,13 @@ from typing import List, Optional
 
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.db import get_db
 from app.models.campaign import Campaign, CampaignEmail, CampaignRecipient
 from app.models.lead import Lead
 from app.services.scrapers.aggregator import aggregate_search
+from app.services.leads.upsert import upsert_scraped_leads
 from app.services.ai.suggest import suggest
 
 router = APIRouter()
@@ -20,6 +20,7 @@ class OneClickRequest(BaseModel):
 	industry: Optional[str] = None
 	location: Optional[str] = None
 	providers: Optional[List[str]] = None
+	force_refresh: bool = False
 	limit: int = 25
 	# campaign
 	campaign_name: str = "One-Click Outreach"
@@ -31,31 +32,12 @@ class OneClickRequest(BaseModel):
 async def one_click(body: OneClickRequest, db: AsyncSession = Depends(get_db)):
 	# 1) Scrape
 	query = {"company_size": body.company_size, "role": body.role, "industry": body.industry, "location": body.location}
-	records = await aggregate_search(query, body.providers)
+	records, _run_id = await aggregate_search(query, body.providers, force_refresh=body.force_refresh)
 	records = records[: max(0, body.limit)]
 
-	# 2) Upsert leads (by email or linkedin_url)
-	created_lead_ids: List[int] = []
-	for r in records:
-		lead: Lead | None = None
-		key_email = (r.get("email") or "").lower()
-		key_li = (r.get("linkedin_url") or "").lower()
-		if key_email:
-			res = await db.execute(select(Lead).where(Lead.email == key_email))
-			lead = res.scalars().first()
-		if not lead and key_li:
-			res = await db.execute(select(Lead).where(Lead.linkedin_url == key_li))
-			lead = res.scalars().first()
-		if not lead:
-			lead = Lead(**{k: v for k, v in r.items() if k in {"name","email","company","role","linkedin_url","source","company_size","industry","location"}})
-			db.add(lead)
-			await db.flush()
-		else:
-			for k, v in r.items():
-				if k in {"name","company","role","linkedin_url","source","company_size","industry","location"} and getattr(lead, k) is None and v:
-					setattr(lead, k, v)
-			await db.flush()
-		created_lead_ids.append(lead.id)
+	# 2) Upsert leads (by normalized email or LinkedIn identity), filling only missing fields
+	leads = await upsert_scraped_leads(db, records, overwrite=False)
+	created_lead_ids: List[int] = list(dict.fromkeys(l.id for l in leads if l is not None))
 	await db.commit()
 
 	# 3) Create campaign
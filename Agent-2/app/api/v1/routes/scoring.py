@@ -1,5 +1,6 @@
-from typing import Dict, Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
@@ -7,6 +8,9 @@ from app.core.db import get_db
 from app.models.lead import Lead
 from app.models.lead_score import ScoringRule, LeadScore
 from app.services.leads.scoring import lead_scoring_service
+from app.services.leads.rules import RULE_CONDITIONS, RULE_FIELDS, scoring_rule_engine
+from app.services.leads.engagement import engagement_rescorer
+from app.services.leads.leaderboard import ALL, QUALIFICATION_STATUSES, decode_score_cursor, encode_score_cursor, leaderboards
 
 router = APIRouter()
 
@@ -26,6 +30,30 @@ class ScoringRuleUpdate(BaseModel):
     score: float = None
     is_active: bool = None
 
+class BatchScoreRequest(BaseModel):
+    lead_ids: Optional[List[int]] = None
+    company_size: Optional[str] = None
+    role: Optional[str] = None
+    industry: Optional[str] = None
+    location: Optional[str] = None
+    all: bool = False
+
+@router.post("/calculate-batch")
+async def calculate_batch_scores(
+    body: BatchScoreRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Score leads in bulk by id list or filters (set all=true to rescore every lead)"""
+    filters = {"company_size": body.company_size, "role": body.role, "industry": body.industry, "location": body.location}
+    if body.lead_ids is None and not any(filters.values()) and not body.all:
+        raise HTTPException(status_code=400, detail="Pass lead_ids, at least one filter, or all=true")
+    return await lead_scoring_service.score_leads(db, lead_ids=body.lead_ids, filters=filters)
+
+@router.get("/engagement")
+async def get_engagement_rescoring_stats():
+    """Counters for event-driven engagement rescoring"""
+    return engagement_rescorer.snapshot()
+
 @router.post("/calculate/{lead_id}")
 async def calculate_lead_score(
     lead_id: int,
@@ -90,11 +118,30 @@ async def qualify_lead(
         }
     }
 
+def _rule_out(rule: ScoringRule) -> Dict[str, Any]:
+    return {
+        "id": rule.id,
+        "name": rule.name,
+        "field": rule.field,
+        "condition": rule.condition,
+        "value": rule.value,
+        "score": rule.score,
+        "is_active": rule.is_active,
+        "created_at": rule.created_at.isoformat() if rule.created_at else None,
+        "updated_at": rule.updated_at.isoformat() if rule.updated_at else None,
+    }
+
+def _validate_rule(field: Optional[str], condition: Optional[str]) -> None:
+    if field is not None and field not in RULE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"field must be one of {', '.join(RULE_FIELDS)}")
+    if condition is not None and condition not in RULE_CONDITIONS:
+        raise HTTPException(status_code=400, detail=f"condition must be one of {', '.join(RULE_CONDITIONS)}")
+
 @router.get("/rules")
 async def get_scoring_rules(db: AsyncSession = Depends(get_db)):
     """Get all active scoring rules"""
     rules = await lead_scoring_service.get_scoring_rules(db)
-    return {"rules": [rule.__dict__ for rule in rules]}
+    return {"rules": [_rule_out(rule) for rule in rules]}
 
 @router.post("/rules")
 async def create_scoring_rule(
@@ -102,28 +149,69 @@ async def create_scoring_rule(
     db: AsyncSession = Depends(get_db)
 ):
     """Create a new scoring rule"""
-    rule = await lead_scoring_service.create_scoring_rule(rule_data.dict(), db)
-    return {"rule": rule.__dict__}
+    _validate_rule(rule_data.field, rule_data.condition)
+    rule = await lead_scoring_service.create_scoring_rule(rule_data.model_dump(), db)
+    return {"rule": _rule_out(rule)}
 
-@router.get("/leads/top-scored")
-async def get_top_scored_leads(
-    limit: int = 10,
+@router.patch("/rules/{rule_id}")
+async def update_scoring_rule(
+    rule_id: int,
+    rule_data: ScoringRuleUpdate,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get top scored leads"""
-    from sqlalchemy import select, desc
-    
-    from sqlalchemy.orm import selectinload
-    
-    result = await db.execute(
-        select(Lead)
-        .options(selectinload(Lead.score))
-        .join(Lead.score)
-        .order_by(desc(LeadScore.total_score))
-        .limit(limit)
-    )
-    leads = list(result.scalars().all())
-    
+    """Update a scoring rule"""
+    rule = await db.get(ScoringRule, rule_id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Scoring rule not found")
+    changes = rule_data.model_dump(exclude_unset=True)
+    _validate_rule(changes.get("field"), changes.get("condition"))
+    rule = await lead_scoring_service.update_scoring_rule(rule, changes, db)
+    return {"rule": _rule_out(rule)}
+
+@router.delete("/rules/{rule_id}")
+async def delete_scoring_rule(
+    rule_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete a scoring rule"""
+    rule = await db.get(ScoringRule, rule_id)
+    if not rule:
+        raise HTTPException(status_code=404, detail="Scoring rule not found")
+    await lead_scoring_service.delete_scoring_rule(rule, db)
+    return {"ok": True}
+
+@router.get("/rules/plan")
+async def get_scoring_plan(db: AsyncSession = Depends(get_db)):
+    """Version and shape of the compiled rule plan this worker is scoring with"""
+    await scoring_rule_engine.refresh(db)
+    return scoring_rule_engine.snapshot()
+
+async def _leaderboard_response(db: AsyncSession, board: str, limit: int, cursor: Optional[str]) -> Dict[str, Any]:
+    """One leaderboard page: keys from the in-memory board (or keyset SQL past page one), then one IN load."""
+    try:
+        after = decode_score_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    keys = await leaderboards.page(db, board, limit + 1, after)
+    page, more = keys[:limit], len(keys) > limit
+    rows = {}
+    if page:
+        result = await db.execute(
+            select(Lead, LeadScore.total_score, LeadScore.qualification_status)
+            .join(LeadScore, LeadScore.lead_id == Lead.id)
+            .where(Lead.id.in_([lead_id for _, lead_id in page]))
+        )
+        rows = {lead.id: (lead, total, status) for lead, total, status in result.all()}
+    # Leads deleted by another worker since the board loaded
+    missing = [lead_id for _, lead_id in page if lead_id not in rows]
+    if missing:
+        leaderboards.forget(missing)
+    next_cursor = None
+    if more:
+        # Continue from the score just read from the database; the board's key may predate a rescore elsewhere
+        last = next((lead_id for _, lead_id in reversed(page) if lead_id in rows), None)
+        next_cursor = encode_score_cursor((float(rows[last][1] or 0.0), last) if last is not None else page[-1])
+
     return {
         "leads": [
             {
@@ -135,44 +223,31 @@ async def get_top_scored_leads(
                 "industry": lead.industry,
                 "company_size": lead.company_size,
                 "location": lead.location,
-                "score": lead.score.total_score if lead.score else 0,
-                "qualification_status": lead.score.qualification_status if lead.score else "unqualified"
+                "score": total,
+                "qualification_status": status
             }
-            for lead in leads
-        ]
+            for lead, total, status in (rows[lead_id] for _, lead_id in page if lead_id in rows)
+        ],
+        "next_cursor": next_cursor,
     }
 
+@router.get("/leads/top-scored")
+async def get_top_scored_leads(
+    limit: int = Query(10, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get top scored leads"""
+    return await _leaderboard_response(db, ALL, limit, cursor)
+
 @router.get("/leads/qualified")
 async def get_qualified_leads(
     status: str = "qualified",  # qualified, hot, unqualified
-    limit: int = 50,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get leads by qualification status"""
-    from sqlalchemy import select
-    
-    result = await db.execute(
-        select(Lead)
-        .join(Lead.score)
-        .where(LeadScore.qualification_status == status)
-        .limit(limit)
-    )
-    leads = list(result.scalars().all())
-    
-    return {
-        "leads": [
-            {
-                "id": lead.id,
-                "name": lead.name,
-                "email": lead.email,
-                "company": lead.company,
-                "role": lead.role,
-                "industry": lead.industry,
-                "company_size": lead.company_size,
-                "location": lead.location,
-                "score": lead.score.total_score if lead.score else 0,
-                "qualification_status": lead.score.qualification_status if lead.score else "unqualified"
-            }
-            for lead in leads
-        ]
-    }
+    """Get leads by qualification status, highest score first"""
+    if status not in QUALIFICATION_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {list(QUALIFICATION_STATUSES)}")
+    return await _leaderboard_response(db, status, limit, cursor)
@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+
 from fastapi import APIRouter, Header, HTTPException, Depends, Request
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -5,10 +7,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.config import settings
 from app.core.db import get_db
 from app.models.lead import Lead
+from app.services.leads.identity import normalize_email
 from app.models.lead_note import LeadNote
 from app.models.campaign import CampaignRecipient
 from app.models.email_tracking import EmailMessageLog, CampaignRecipientEvent
 from app.services.crm.manager import crm_manager
+from app.services.leads.engagement import engagement_rescorer
+from app.services.campaigns.rollups import RollupEvent, record_rollup_events
+from app.services.campaigns.analytics_cache import analytics_cache
 
 router = APIRouter()
 
@@ -28,7 +34,7 @@ async def inbound_email_webhook(payload: InboundEmailPayload, x_webhook_secret:
 		lead = await db.get(Lead, payload.lead_id)
 	elif payload.email:
 		from sqlalchemy import select
-		res = await db.execute(select(Lead).where(Lead.email == payload.email))
+		res = await db.execute(select(Lead).where(Lead.email_key == normalize_email(payload.email)))
 		lead = res.scalars().first()
 	if not lead and payload.email:
 		lead = Lead(email=payload.email)
@@ -47,6 +53,9 @@ async def inbound_email_webhook(payload: InboundEmailPayload, x_webhook_secret:
 		for rec in res.scalars().all():
 			rec.paused = True
 	await db.commit()
+	if lead:
+		# An inbound email from the lead is a reply
+		engagement_rescorer.record(lead.id, "reply")
 	if lead and lead.email:
 		if payload.stage:
 			await crm_manager.update_stage(lead.email, payload.stage)
@@ -103,7 +112,7 @@ async def provider_event_webhook(body: ProviderEvent, x_webhook_secret: str | No
 		from sqlalchemy import select, desc
 		res = await db.execute(
 			select(EmailMessageLog)
-			.where(EmailMessageLog.metadata["to"].as_string() == body.recipient)  # best-effort
+			.where(EmailMessageLog.meta["to"].as_string() == body.recipient)  # best-effort
 			.order_by(desc(EmailMessageLog.created_at))
 			.limit(1)
 		)
@@ -114,15 +123,33 @@ async def provider_event_webhook(body: ProviderEvent, x_webhook_secret: str | No
 			provider=body.provider or "unknown",
 			provider_message_id=body.message_id,
 			lead_id=body.lead_id,
-			metadata=body.payload or {},
+			meta=body.payload or {},
 		)
 		db.add(log)
 	# Update log based on event
 	_update_log_for_event(log, body.event)
 	# Map to recipient events if known
+	recipient = await db.get(CampaignRecipient, log.recipient_id) if log.recipient_id else None
 	if log.recipient_id:
-		db.add(CampaignRecipientEvent(recipient_id=log.recipient_id, event_type=body.event, payload=body.payload))
+		now = datetime.now(timezone.utc)
+		db.add(CampaignRecipientEvent(
+			recipient_id=log.recipient_id,
+			event_type=body.event,
+			payload=body.payload,
+			step=log.step,
+			variant_label=log.variant_label,
+			created_at=now,
+		))
+		if recipient:
+			await record_rollup_events(db, [RollupEvent(recipient.campaign_id, log.step, log.variant_label, body.event, now)])
+	lead_id = log.lead_id or body.lead_id
+	if not lead_id and recipient:
+		lead_id = recipient.lead_id
 	await db.commit()
+	if recipient:
+		analytics_cache.invalidate_campaigns([recipient.campaign_id])
+	# Opens/clicks/replies feed the lead's engagement score (coalesced, applied shortly after)
+	engagement_rescorer.record(lead_id, body.event)
 	return {"ok": True}
 
 
@@ -157,7 +184,7 @@ async def ses_webhook(request: Request, db: AsyncSession = Depends(get_db)):
 		body = await request.json()
 	except Exception:
 		raise HTTPException(status_code=400, detail="Invalid JSON")
-\t# Map common SES notification types
+	# Map common SES notification types
 	mail = body.get("mail", {})
 	common = {
 		"provider": "ses",
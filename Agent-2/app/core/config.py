@@ -86,9 +86,17 @@ class Settings(BaseSettings):
 	EMAIL_FROM: str | None = None
 	# Email sending behavior
 	EMAIL_RATE_PER_SEC: int = 5
+	# A failed send is retried by a later scheduler tick after RETRY_BACKOFF_SECS * 2^(failures - 1);
+	# after MAX_RETRIES consecutive failures the recipient waits FAILURE_DEFERRAL_MINUTES and starts over
 	EMAIL_MAX_RETRIES: int = 3
 	EMAIL_RETRY_BACKOFF_SECS: float = 0.5
 	EMAIL_FAILURE_DEFERRAL_MINUTES: int = 15
+	# Scheduler send pool: concurrent sends, provider burst (0 = one second of EMAIL_RATE_PER_SEC)
+	EMAIL_SEND_CONCURRENCY: int = 8
+	EMAIL_RATE_BURST: int = 0
+	# Per-recipient-domain pacing (0 disables), e.g. to stay under gmail.com/outlook.com receiving limits
+	EMAIL_DOMAIN_RATE_PER_SEC: float = 0.0
+	EMAIL_DOMAIN_BURST: int = 0
 	# Additional API keys from environment
 	# CRM and Integrations
 	ZOHO_API_KEY: str | None = None  # legacy; prefer ZOHO_ACCESS_TOKEN
@@ -107,6 +115,58 @@ class Settings(BaseSettings):
 	GMAIL_SMTP_API_KEY: str | None = None
 	ENABLED_CRMS: str | None = None
 	ENABLED_SCRAPERS: str | None = None
+	# Scraper fan-out: run selected providers concurrently with per-provider and global deadlines
+	SCRAPER_CONCURRENT: bool = True
+	SCRAPER_PROVIDER_TIMEOUT_SECS: float = 20.0
+	SCRAPER_SEARCH_TIMEOUT_SECS: float = 45.0
+	SCRAPE_STREAM_BATCH_SIZE: int = 25
+	# Lead search result cache (LRU in memory, optional SQLite file tier)
+	SEARCH_CACHE_ENABLED: bool = True
+	SEARCH_CACHE_TTL_SECS: float = 6 * 60 * 60
+	SEARCH_CACHE_PROVIDER_TTLS: str | None = None  # e.g. "apollo=86400,web=900"
+	SEARCH_CACHE_MAX_ENTRIES: int = 512
+	SEARCH_CACHE_SQLITE_PATH: str | None = None
+	# Outbound HTTP connection pooling (shared per-host clients)
+	HTTP_ENABLE_HTTP2: bool = True
+	HTTP_MAX_CONNECTIONS_PER_HOST: int = 20
+	HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+	HTTP_KEEPALIVE_EXPIRY_SECS: float = 30.0
+	HTTP_DEFAULT_TIMEOUT_SECS: float = 30.0
+	# Leads grid: cached X-Total-Count per filter combination (0 disables caching)
+	LEAD_COUNT_CACHE_TTL_SECS: float = 300.0
+	# Streaming exports: rows fetched per server-side cursor batch (one CSV chunk / Parquet row group)
+	EXPORT_BATCH_SIZE: int = 5000
+	# Bulk lead import: rows validated and upserted per batch (one commit per batch)
+	LEAD_IMPORT_BATCH_SIZE: int = 1000
+	# Batch lead scoring: leads loaded, scored and written per batch
+	SCORING_BATCH_SIZE: int = 5000
+	# How often a worker checks the shared scoring rule version before reusing its compiled plan
+	SCORING_RULES_CHECK_SECS: float = 5.0
+	# Open/click/reply events are buffered this long and applied per lead in one incremental rescore
+	SCORING_ENGAGEMENT_COALESCE_SECS: float = 2.0
+	# Lead leaderboards: entries held in memory per board, and how often a board reloads from the DB
+	LEADERBOARD_SIZE: int = 1000
+	LEADERBOARD_REFRESH_SECS: float = 60.0
+	# Analytics responses: served fresh for TTL (0 disables), then served stale for up to STALE_SECS while one refresh runs
+	ANALYTICS_CACHE_TTL_SECS: float = 30.0
+	ANALYTICS_CACHE_STALE_SECS: float = 300.0
+	ANALYTICS_CACHE_MAX_ENTRIES: int = 256
+	# Compiled campaign subject/body templates kept in the LRU cache
+	TEMPLATE_CACHE_SIZE: int = 512
+	# Send timer: next_send_at times loaded this far ahead (and reloaded this often), at most WINDOW_MAX per load
+	SCHEDULER_WINDOW_SECS: float = 60.0
+	SCHEDULER_WINDOW_MAX: int = 10000
+	# Send timer never arms sooner than this, so a send time left in the past cannot spin the scheduler
+	SCHEDULER_MIN_DELAY_SECS: float = 0.5
+	# Scheduler workers lease due recipients in batches; leases are renewed every HEARTBEAT_SECS and reclaimable after LEASE_SECS
+	SCHEDULER_CLAIM_BATCH_SIZE: int = 500
+	SCHEDULER_LEASE_SECS: float = 120.0
+	SCHEDULER_HEARTBEAT_SECS: float = 30.0
+	# Campaign scheduler: due recipients whose campaigns, leads and steps are prefetched per query batch
+	SCHEDULER_PREFETCH_BATCH_SIZE: int = 1000
+	# A/B bandit campaigns: variant weights are re-derived by Thompson sampling on this funnel metric at most this often
+	AB_BANDIT_METRIC: str = "replied"
+	AB_BANDIT_REBALANCE_SECS: float = 900.0
 	# Data integrity controls
 	REQUIRE_REAL_DATA: bool = True
 	# App settings
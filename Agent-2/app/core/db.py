@@ -25,8 +25,12 @@ async def init_db() -> None:
 	from app.models import user  # noqa: F401
 	from app.models import locks  # noqa: F401
 	from app.models import scraping  # noqa: F401
+	from app.models import lead_import  # noqa: F401
+	from app.models import campaign_stats  # noqa: F401
+	from app.core.migrations import run_migrations
 	async with engine.begin() as conn:
 		await conn.run_sync(Base.metadata.create_all)
+		await conn.run_sync(run_migrations)
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
 	async with AsyncSessionLocal() as session:
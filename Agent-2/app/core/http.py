@@ -0,0 +1,97 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Mapping
+import importlib.util
+import logging
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class HTTPClientRegistry:
+	"""App-lifetime registry of pooled httpx clients, one per scheme+host.
+
+	Clients are created lazily on first use and closed together on shutdown,
+	so outbound integrations reuse TCP/TLS connections instead of handshaking per call.
+	"""
+
+	def __init__(self) -> None:
+		self._clients: dict[str, httpx.AsyncClient] = {}
+
+	def _new_client(self) -> httpx.AsyncClient:
+		limits = httpx.Limits(
+			max_connections=settings.HTTP_MAX_CONNECTIONS_PER_HOST,
+			max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+			keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECS,
+		)
+		return httpx.AsyncClient(
+			http2=settings.HTTP_ENABLE_HTTP2 and HTTP2_AVAILABLE,
+			limits=limits,
+			timeout=settings.HTTP_DEFAULT_TIMEOUT_SECS,
+		)
+
+	def get(self, url: str | httpx.URL) -> httpx.AsyncClient:
+		parsed = httpx.URL(url)
+		key = f"{parsed.scheme}://{parsed.netloc.decode('ascii')}"
+		client = self._clients.get(key)
+		if client is None or client.is_closed:
+			client = self._new_client()
+			self._clients[key] = client
+		return client
+
+	async def open(self) -> None:
+		logger.info("http_client_registry_open http2=%s", settings.HTTP_ENABLE_HTTP2 and HTTP2_AVAILABLE)
+
+	async def aclose(self) -> None:
+		clients, self._clients = list(self._clients.values()), {}
+		for client in clients:
+			try:
+				await client.aclose()
+			except Exception:
+				logger.debug("http_client_close_failed", exc_info=True)
+
+
+http_clients = HTTPClientRegistry()
+
+
+class PooledClient:
+	"""Drop-in for the subset of httpx.AsyncClient used by integrations.
+
+	Each request is routed to the shared pool for its host, with the
+	caller's default headers and timeout applied per request.
+	"""
+
+	def __init__(self, timeout: float | httpx.Timeout | None = None, headers: Mapping[str, str] | None = None) -> None:
+		self.timeout = timeout if timeout is not None else settings.HTTP_DEFAULT_TIMEOUT_SECS
+		self.headers = dict(headers or {})
+
+	async def request(self, method: str, url: str, *, headers: Mapping[str, str] | None = None, **kwargs: Any) -> httpx.Response:
+		merged = {**self.headers, **(headers or {})}
+		kwargs.setdefault("timeout", self.timeout)
+		return await http_clients.get(url).request(method, url, headers=merged, **kwargs)
+
+	async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+		return await self.request("GET", url, **kwargs)
+
+	async def post(self, url: str, **kwargs: Any) -> httpx.Response:
+		return await self.request("POST", url, **kwargs)
+
+	async def put(self, url: str, **kwargs: Any) -> httpx.Response:
+		return await self.request("PUT", url, **kwargs)
+
+	async def patch(self, url: str, **kwargs: Any) -> httpx.Response:
+		return await self.request("PATCH", url, **kwargs)
+
+	async def delete(self, url: str, **kwargs: Any) -> httpx.Response:
+		return await self.request("DELETE", url, **kwargs)
+
+
+@asynccontextmanager
+async def pooled_client(timeout: float | httpx.Timeout | None = None, headers: Mapping[str, str] | None = None) -> AsyncIterator[PooledClient]:
+	"""`async with pooled_client(...) as client:` in place of `httpx.AsyncClient(...)`; exiting does not close the pool."""
+	yield PooledClient(timeout=timeout, headers=headers)
@@ -0,0 +1,222 @@
+"""Idempotent schema/data migrations applied on startup after `create_all`.
+
+`create_all` only creates missing tables, so columns and indexes added to
+existing tables are brought up to date here. Each step checks the live
+schema first and is safe to run on every boot.
+"""
+from typing import Callable, Dict, List
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+# Qualification flags OR-ed together when two leads' qualification rows are merged
+QUALIFICATION_FLAGS = ["has_email", "has_linkedin", "has_company_info", "has_role_info", "email_opened", "email_clicked", "email_replied", "is_qualified"]
+
+# Tables holding a lead_id that must follow a merged lead to its survivor
+LEAD_REFERENCES = [
+	"campaign_recipients",
+	"email_message_logs",
+	"lead_notes",
+	"lead_scores",
+	"lead_qualifications",
+	"lead_sources",
+]
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+	insp = inspect(conn)
+	if not insp.has_table(table):
+		return set()
+	return {c["name"] for c in insp.get_columns(table)}
+
+
+def _add_missing_columns(conn: Connection, table: str, columns: Dict[str, str]) -> List[str]:
+	existing = _columns(conn, table)
+	added = []
+	for name, ddl in columns.items():
+		if existing and name not in existing:
+			conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+			added.append(name)
+	return added
+
+
+def _create_model_indexes(conn: Connection, table) -> None:
+	for index in table.indexes:
+		index.create(conn, checkfirst=True)
+
+
+def migrate_lead_identity(conn: Connection) -> None:
+	"""Backfill leads.email_key/linkedin_key, merge duplicate leads, then add the unique indexes."""
+	from app.models.lead import Lead
+	from app.services.leads.identity import normalize_email, normalize_linkedin
+
+	added = _add_missing_columns(conn, "leads", {"email_key": "VARCHAR(255)", "linkedin_key": "VARCHAR(512)"})
+	if added:
+		logger.info(f"🛠️ Added lead identity columns: {added}")
+
+	pending = conn.execute(text(
+		"SELECT count(*) FROM leads WHERE (email IS NOT NULL AND email_key IS NULL) OR (linkedin_url IS NOT NULL AND linkedin_key IS NULL)"
+	)).scalar_one()
+	if pending:
+		rows = conn.execute(text("SELECT id, email, linkedin_url FROM leads ORDER BY id")).all()
+		keys = {r.id: (normalize_email(r.email), normalize_linkedin(r.linkedin_url)) for r in rows}
+
+		# Union leads sharing either identity; the oldest (lowest id) survives
+		parent: Dict[int, int] = {r.id: r.id for r in rows}
+
+		def find(i: int) -> int:
+			while parent[i] != i:
+				parent[i] = parent[parent[i]]
+				i = parent[i]
+			return i
+
+		owners: Dict[tuple, int] = {}
+		for lead_id, (email_key, linkedin_key) in keys.items():
+			for k in (("e", email_key), ("l", linkedin_key)):
+				if not k[1]:
+					continue
+				if k in owners:
+					a, b = find(owners[k]), find(lead_id)
+					parent[max(a, b)] = min(a, b)
+				else:
+					owners[k] = lead_id
+
+		merged = _merge_duplicates(conn, {i: find(i) for i in parent if find(i) != i})
+		if merged:
+			logger.info(f"🧹 Merged {merged} duplicate leads into their oldest record")
+
+		# Survivors may have picked up an email/linkedin_url from their duplicates, so derive keys afterwards
+		rows = conn.execute(text("SELECT id, email, linkedin_url FROM leads")).all()
+		params = [{"id": r.id, "email_key": normalize_email(r.email), "linkedin_key": normalize_linkedin(r.linkedin_url)} for r in rows]
+		if params:
+			conn.execute(text("UPDATE leads SET email_key = :email_key, linkedin_key = :linkedin_key WHERE id = :id"), params)
+
+	_create_model_indexes(conn, Lead.__table__)
+
+
+def _merge_duplicates(conn: Connection, survivor_of: Dict[int, int]) -> int:
+	"""Fold each duplicate into its survivor: fill the survivor's empty fields, repoint references, delete the duplicate."""
+	if not survivor_of:
+		return 0
+	fields = ["name", "email", "company", "role", "linkedin_url", "source", "company_size", "industry", "location"]
+	referencing = [t for t in LEAD_REFERENCES if "lead_id" in _columns(conn, t)]
+	for dup_id, survivor_id in sorted(survivor_of.items()):
+		sets = ", ".join(f"{f} = COALESCE({f}, (SELECT {f} FROM leads WHERE id = :dup))" for f in fields)
+		conn.execute(text(f"UPDATE leads SET {sets} WHERE id = :survivor"), {"dup": dup_id, "survivor": survivor_id})
+		_merge_one_per_lead(conn, referencing, dup_id, survivor_id)
+		for table in referencing:
+			conn.execute(text(f"UPDATE {table} SET lead_id = :survivor WHERE lead_id = :dup"), {"dup": dup_id, "survivor": survivor_id})
+		conn.execute(text("DELETE FROM leads WHERE id = :dup"), {"dup": dup_id})
+	return len(survivor_of)
+
+
+def _merge_one_per_lead(conn: Connection, referencing: List[str], dup_id: int, survivor_id: int) -> None:
+	"""Leave at most one lead_scores/lead_qualifications row between a duplicate and its survivor before repointing.
+
+	The newer score is kept; the survivor's qualification absorbs the duplicate's flags.
+	"""
+	params = {"dup": dup_id, "survivor": survivor_id}
+	if "lead_scores" in referencing:
+		conn.execute(text(
+			"DELETE FROM lead_scores WHERE lead_id IN (:dup, :survivor) "
+			"AND id <> (SELECT max(id) FROM lead_scores WHERE lead_id IN (:dup, :survivor))"
+		), params)
+	if "lead_qualifications" in referencing:
+		has_own = conn.execute(text("SELECT 1 FROM lead_qualifications WHERE lead_id = :survivor"), params).first()
+		if has_own:
+			sets = ", ".join(
+				f"{f} = (COALESCE({f}, false) OR EXISTS (SELECT 1 FROM lead_qualifications WHERE lead_id = :dup AND {f}))"
+				for f in QUALIFICATION_FLAGS
+			)
+			conn.execute(text(f"UPDATE lead_qualifications SET {sets} WHERE lead_id = :survivor"), params)
+			conn.execute(text("DELETE FROM lead_qualifications WHERE lead_id = :dup"), params)
+
+
+def _make_lead_id_unique(conn: Connection, table) -> None:
+	"""Keep only the newest row per lead in a one-per-lead table, then make its lead_id index unique."""
+	insp = inspect(conn)
+	if not insp.has_table(table.name):
+		return
+	index_name = f"ix_{table.name}_lead_id"
+	index = next((ix for ix in insp.get_indexes(table.name) if ix["name"] == index_name), None)
+	if index is not None and index["unique"]:
+		return
+	removed = conn.execute(text(
+		f"DELETE FROM {table.name} WHERE id NOT IN (SELECT max(id) FROM {table.name} GROUP BY lead_id)"
+	)).rowcount
+	if removed:
+		logger.info(f"🧹 Removed {removed} duplicate {table.name} rows")
+	if index is not None:
+		conn.execute(text(f"DROP INDEX {index_name}"))
+	_create_model_indexes(conn, table)
+
+
+def migrate_unique_lead_scores(conn: Connection) -> None:
+	"""Keep only the newest lead_scores row per lead, then make lead_scores.lead_id unique."""
+	from app.models.lead_score import LeadScore
+
+	_make_lead_id_unique(conn, LeadScore.__table__)
+
+
+def migrate_unique_lead_qualifications(conn: Connection) -> None:
+	"""Keep only the newest lead_qualifications row per lead (Lead.qualification is one-to-one), then make lead_id unique."""
+	from app.models.lead_score import LeadQualification
+
+	_make_lead_id_unique(conn, LeadQualification.__table__)
+
+
+def migrate_campaign_rollups(conn: Connection) -> None:
+	"""Add step/variant attribution and the A/B bandit flag, then backfill empty rollups from past events."""
+	from app.services.campaigns.rollups import rebuild_rollups
+
+	for table in ("email_message_logs", "campaign_recipient_events"):
+		added = _add_missing_columns(conn, table, {"step": "INTEGER", "variant_label": "VARCHAR(32)"})
+		if added:
+			logger.info(f"🛠️ Added {table} columns: {added}")
+	if _add_missing_columns(conn, "campaigns", {"ab_bandit": "BOOLEAN DEFAULT FALSE"}):
+		logger.info("🛠️ Added campaigns columns: ['ab_bandit']")
+	has_rollups = conn.execute(text("SELECT 1 FROM campaign_stats_daily LIMIT 1")).first()
+	has_events = conn.execute(text("SELECT 1 FROM campaign_recipient_events LIMIT 1")).first()
+	if has_events and not has_rollups:
+		rebuild_rollups(conn)
+
+
+def migrate_recipient_leases(conn: Connection) -> None:
+	"""Add scheduler lease columns to campaign recipients."""
+	added = _add_missing_columns(conn, "campaign_recipients", {"lease_owner": "VARCHAR(64)", "lease_expires_at": "TIMESTAMP WITH TIME ZONE"})
+	if added:
+		logger.info(f"🛠️ Added campaign_recipients columns: {added}")
+
+
+def migrate_recipient_retries(conn: Connection) -> None:
+	"""Add the consecutive send failure counter to campaign recipients."""
+	if _add_missing_columns(conn, "campaign_recipients", {"send_failures": "INTEGER DEFAULT 0"}):
+		logger.info("🛠️ Added campaign_recipients columns: ['send_failures']")
+
+
+def ensure_model_indexes(conn: Connection) -> None:
+	"""Create indexes declared on models whose tables predate them."""
+	from app.core.db import Base
+
+	for table in Base.metadata.sorted_tables:
+		if inspect(conn).has_table(table.name):
+			_create_model_indexes(conn, table)
+
+
+MIGRATIONS: List[Callable[[Connection], None]] = [
+	migrate_lead_identity,
+	migrate_unique_lead_scores,
+	migrate_unique_lead_qualifications,
+	migrate_campaign_rollups,
+	migrate_recipient_leases,
+	migrate_recipient_retries,
+	ensure_model_indexes,
+]
+
+
+def run_migrations(conn: Connection) -> None:
+	for migration in MIGRATIONS:
+		migration(conn)
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,12 +8,29 @@ import asyncio
 
 from app.core.config import settings
 from app.core.db import init_db
+from app.core.http import http_clients
+from app.services.leads.engagement import engagement_rescorer
 from app.api.v1.router import api_router
 from app.services.campaigns.scheduler import send_due_emails_once
+from app.services.campaigns.timer import send_timer
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+	await init_db()
+	await http_clients.open()
+	# Fires a scheduler tick whenever a loaded next_send_at comes due
+	scheduler_task = asyncio.create_task(send_timer.run(send_due_emails_once))
+	try:
+		yield
+	finally:
+		scheduler_task.cancel()
+		await engagement_rescorer.aclose()
+		await http_clients.aclose()
 
 app = FastAPI(
 	title=settings.PROJECT_NAME,
 	default_response_class=ORJSONResponse,
+	lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -28,6 +46,7 @@ app.add_middleware(
 	allow_credentials=True,
 	allow_methods=["*"],
 	allow_headers=["*"],
+	expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 
 request_logger = logging.getLogger("request")
@@ -41,17 +60,4 @@ async def add_request_id_and_log(request: Request, call_next):
 	request_logger.info(f"{request.method} {request.url.path}", extra={"request_id": request_id})
 	return response
 
-@app.on_event("startup")
-async def on_startup() -> None:
-	await init_db()
-	async def _loop():
-		while True:
-			try:
-				await send_due_emails_once()
-			except Exception:
-				pass
-			await asyncio.sleep(60)
-	import asyncio as _a
-	_a.create_task(_loop())
-
 app.include_router(api_router, prefix=settings.API_PREFIX)
@@ -1,4 +1,4 @@
-from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Boolean, func
+from sqlalchemy import String, Integer, DateTime, ForeignKey, Text, Boolean, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.db import Base
@@ -10,6 +10,8 @@ class Campaign(Base):
 	name: Mapped[str] = mapped_column(String(255), index=True)
 	offer: Mapped[str | None] = mapped_column(Text)
 	status: Mapped[str] = mapped_column(String(32), default="draft")
+	# Shift A/B variant weights toward winners automatically (multi-armed bandit)
+	ab_bandit: Mapped[bool] = mapped_column(Boolean, default=False)
 	created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 	updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -44,6 +46,10 @@ class CampaignEmailVariant(Base):
 
 class CampaignRecipient(Base):
 	__tablename__ = "campaign_recipients"
+	__table_args__ = (
+		# Due-recipient lookups: the scheduler's claim and the send timer's window reload
+		Index("ix_campaign_recipients_paused_next_send_at", "paused", "next_send_at"),
+	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True)
 	campaign_id: Mapped[int] = mapped_column(ForeignKey("campaigns.id", ondelete="CASCADE"), index=True)
@@ -54,5 +60,10 @@ class CampaignRecipient(Base):
 	next_send_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
 	paused: Mapped[bool] = mapped_column(Boolean, default=False)
 	variant_label: Mapped[str | None] = mapped_column(String(32), nullable=True)
+	# Scheduler work lease: the worker currently sending to this recipient, until when
+	lease_owner: Mapped[str | None] = mapped_column(String(64), nullable=True)
+	lease_expires_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+	# Consecutive failed sends of the current step; drives the retry backoff
+	send_failures: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
 	campaign: Mapped[Campaign] = relationship(back_populates="recipients")
@@ -0,0 +1,33 @@
+from sqlalchemy import Integer, String, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, declared_attr
+
+from app.core.db import Base
+
+
+class _CampaignStatsColumns:
+	"""Event counters per (campaign, step, variant, time bucket), maintained as events are written"""
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	campaign_id: Mapped[int] = mapped_column(ForeignKey("campaigns.id", ondelete="CASCADE"))
+	step: Mapped[int] = mapped_column(Integer, default=0)  # CampaignEmail.sequence_order; 0 when unknown
+	variant_label: Mapped[str] = mapped_column(String(32), default="")  # "" when sent without a variant
+	bucket: Mapped[DateTime] = mapped_column(DateTime(timezone=True))  # UTC start of the hour/day
+
+	sent: Mapped[int] = mapped_column(Integer, default=0)
+	delivered: Mapped[int] = mapped_column(Integer, default=0)
+	opened: Mapped[int] = mapped_column(Integer, default=0)
+	clicked: Mapped[int] = mapped_column(Integer, default=0)
+	replied: Mapped[int] = mapped_column(Integer, default=0)
+	bounced: Mapped[int] = mapped_column(Integer, default=0)
+
+	@declared_attr.directive
+	def __table_args__(cls):
+		return (UniqueConstraint("campaign_id", "step", "variant_label", "bucket", name=f"uq_{cls.__tablename__}_key"),)
+
+
+class CampaignStatsHourly(_CampaignStatsColumns, Base):
+	__tablename__ = "campaign_stats_hourly"
+
+
+class CampaignStatsDaily(_CampaignStatsColumns, Base):
+	__tablename__ = "campaign_stats_daily"
@@ -14,7 +14,11 @@ class EmailMessageLog(Base):
 	provider_message_id: Mapped[str | None] = mapped_column(String(255), index=True, nullable=True)
 	status: Mapped[str] = mapped_column(String(32), default="sent")  # sent, delivered, opened, clicked, bounced, complained, replied, failed
 	error: Mapped[str | None] = mapped_column(Text, nullable=True)
-	metadata: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+	# `metadata` is reserved on declarative models; keep the column name, expose it as `meta`
+	meta: Mapped[dict | None] = mapped_column("metadata", JSON, nullable=True)
+	# Sequence step (CampaignEmail.sequence_order) and A/B variant this message was sent as
+	step: Mapped[int | None] = mapped_column(Integer, nullable=True)
+	variant_label: Mapped[str | None] = mapped_column(String(32), nullable=True)
 
 	subject: Mapped[str | None] = mapped_column(String(255), nullable=True)
 	body_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
@@ -30,7 +34,7 @@ class EmailMessageLog(Base):
 	created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 	# Relationships
-	recipient: Mapped["CampaignRecipient" | None] = relationship("CampaignRecipient")
+	recipient: Mapped["CampaignRecipient | None"] = relationship("CampaignRecipient")
 
 
 class CampaignRecipientEvent(Base):
@@ -40,6 +44,9 @@ class CampaignRecipientEvent(Base):
 	recipient_id: Mapped[int] = mapped_column(ForeignKey("campaign_recipients.id", ondelete="CASCADE"), index=True)
 	event_type: Mapped[str] = mapped_column(String(64))  # sent, delivered, opened, clicked, bounced, complained, replied, paused, resumed
 	payload: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+	# Copied from the message the event belongs to, so rollups can attribute it
+	step: Mapped[int | None] = mapped_column(Integer, nullable=True)
+	variant_label: Mapped[str | None] = mapped_column(String(32), nullable=True)
 	created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
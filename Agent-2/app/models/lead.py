@@ -1,10 +1,17 @@
-from sqlalchemy import String, Integer, DateTime, func
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, DateTime, Index, func
+from sqlalchemy.orm import Mapped, mapped_column, relationship, validates
 
 from app.core.db import Base
+from app.services.leads.identity import normalize_email, normalize_linkedin
 
 class Lead(Base):
 	__tablename__ = "leads"
+	# (filter, id) composites serve the leads grid's filtered keyset pages straight from the index
+	__table_args__ = (
+		Index("ix_leads_company_size_id", "company_size", "id"),
+		Index("ix_leads_industry_id", "industry", "id"),
+		Index("ix_leads_location_id", "location", "id"),
+	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
 	name: Mapped[str | None] = mapped_column(String(255), nullable=True)
@@ -12,6 +19,9 @@ class Lead(Base):
 	company: Mapped[str | None] = mapped_column(String(255), index=True)
 	role: Mapped[str | None] = mapped_column(String(255), index=True)
 	linkedin_url: Mapped[str | None] = mapped_column(String(512))
+	# Canonical identities used for dedup; kept in sync with email/linkedin_url
+	email_key: Mapped[str | None] = mapped_column(String(255), unique=True, index=True, nullable=True)
+	linkedin_key: Mapped[str | None] = mapped_column(String(512), unique=True, index=True, nullable=True)
 	source: Mapped[str | None] = mapped_column(String(64))
 	company_size: Mapped[str | None] = mapped_column(String(64))
 	industry: Mapped[str | None] = mapped_column(String(128))
@@ -21,5 +31,13 @@ class Lead(Base):
 	updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 	
 	# Relationships
-	score: Mapped["LeadScore"] = relationship("LeadScore", back_populates="lead", uselist=False)
-	qualification: Mapped["LeadQualification"] = relationship("LeadQualification", back_populates="lead", uselist=False)
+	score: Mapped["LeadScore"] = relationship("LeadScore", back_populates="lead", uselist=False, cascade="all, delete-orphan")
+	qualification: Mapped["LeadQualification"] = relationship("LeadQualification", back_populates="lead", uselist=False, cascade="all, delete-orphan")
+
+	@validates("email", "linkedin_url")
+	def _sync_identity_keys(self, key: str, value: str | None) -> str | None:
+		if key == "email":
+			self.email_key = normalize_email(value)
+		else:
+			self.linkedin_key = normalize_linkedin(value)
+		return value
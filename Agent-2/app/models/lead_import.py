@@ -0,0 +1,33 @@
+from sqlalchemy import Integer, String, Text, Boolean, DateTime, JSON, ForeignKey, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.db import Base
+
+
+class LeadImportJob(Base):
+	__tablename__ = "lead_import_jobs"
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	filename: Mapped[str | None] = mapped_column(String(255), nullable=True)
+	format: Mapped[str] = mapped_column(String(16))  # csv, ndjson
+	overwrite: Mapped[bool] = mapped_column(Boolean, default=False)
+	status: Mapped[str] = mapped_column(String(32), default="queued")  # queued, running, completed, failed
+	processed_rows: Mapped[int] = mapped_column(Integer, default=0)
+	inserted_rows: Mapped[int] = mapped_column(Integer, default=0)
+	updated_rows: Mapped[int] = mapped_column(Integer, default=0)
+	duplicate_rows: Mapped[int] = mapped_column(Integer, default=0)
+	failed_rows: Mapped[int] = mapped_column(Integer, default=0)
+	error: Mapped[str | None] = mapped_column(Text, nullable=True)
+	created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+	started_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+	finished_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class LeadImportError(Base):
+	__tablename__ = "lead_import_errors"
+
+	id: Mapped[int] = mapped_column(Integer, primary_key=True)
+	job_id: Mapped[int] = mapped_column(ForeignKey("lead_import_jobs.id", ondelete="CASCADE"), index=True)
+	row_number: Mapped[int] = mapped_column(Integer)
+	error: Mapped[str] = mapped_column(Text)
+	data: Mapped[dict | None] = mapped_column(JSON, nullable=True)
@@ -1,13 +1,18 @@
-from sqlalchemy import String, Integer, Float, DateTime, Boolean, ForeignKey, func
+from sqlalchemy import String, Integer, Float, DateTime, Boolean, ForeignKey, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.db import Base
 
 class LeadScore(Base):
 	__tablename__ = "lead_scores"
+	__table_args__ = (
+		# Leaderboard keyset order: (total_score, lead_id) descending, overall and per status
+		Index("ix_lead_scores_total_score", "total_score", "lead_id"),
+		Index("ix_lead_scores_status_total_score", "qualification_status", "total_score", "lead_id"),
+	)
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True)
-	lead_id: Mapped[int] = mapped_column(ForeignKey("leads.id", ondelete="CASCADE"), index=True)
+	lead_id: Mapped[int] = mapped_column(ForeignKey("leads.id", ondelete="CASCADE"), unique=True, index=True)
 	
 	# Scoring factors
 	company_size_score: Mapped[float] = mapped_column(Float, default=0.0)
@@ -42,11 +47,19 @@ class ScoringRule(Base):
 	created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 	updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+class ScoringRuleVersion(Base):
+	"""Version counter bumped on every ScoringRule write so workers know to recompile their rule plan"""
+	__tablename__ = "scoring_rule_versions"
+
+	name: Mapped[str] = mapped_column(String(64), primary_key=True)
+	version: Mapped[int] = mapped_column(Integer, default=0)
+	updated_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class LeadQualification(Base):
 	__tablename__ = "lead_qualifications"
 
 	id: Mapped[int] = mapped_column(Integer, primary_key=True)
-	lead_id: Mapped[int] = mapped_column(ForeignKey("leads.id", ondelete="CASCADE"), index=True)
+	lead_id: Mapped[int] = mapped_column(ForeignKey("leads.id", ondelete="CASCADE"), unique=True, index=True)
 	
 	# Qualification criteria
 	has_email: Mapped[bool] = mapped_column(Boolean, default=False)
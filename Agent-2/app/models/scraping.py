@@ -11,7 +11,7 @@ class SearchRun(Base):
 	query: Mapped[dict] = mapped_column(JSON)
 	providers_requested: Mapped[dict | None] = mapped_column(JSON, nullable=True)
 	providers_used: Mapped[dict | None] = mapped_column(JSON, nullable=True)
-	status: Mapped[str] = mapped_column(String(32), default="completed")  # completed, partial, failed
+	status: Mapped[str] = mapped_column(String(32), default="completed")  # running, completed, partial, failed
 	errors: Mapped[dict | None] = mapped_column(JSON, nullable=True)
 	created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
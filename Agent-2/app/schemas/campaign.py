@@ -21,6 +21,7 @@ class CampaignBase(BaseModel):
 	name: str
 	offer: Optional[str] = None
 	status: str = "draft"
+	ab_bandit: bool = False
 	emails: Optional[List[CampaignEmailCreate]] = None
 
 class CampaignCreate(CampaignBase):
@@ -30,6 +31,7 @@ class CampaignUpdate(BaseModel):
 	name: Optional[str] = None
 	offer: Optional[str] = None
 	status: Optional[str] = None
+	ab_bandit: Optional[bool] = None
 	emails: Optional[List[CampaignEmailCreate]] = None
 
 class CampaignOut(CampaignBase):
@@ -2,6 +2,7 @@ from typing import Literal, Mapping, Any
 
 import httpx
 from app.core.config import settings
+from app.core.http import pooled_client
 from httpx import HTTPStatusError
 import logging
 logger = logging.getLogger(__name__)
@@ -15,7 +16,7 @@ async def suggest(kind: Literal["reply","rebuttal","pricing","pitch"], context:
 		return ""
 	prompt = f"Generate a concise {kind} based on context: {context}"
 	try:
-		async with httpx.AsyncClient(timeout=60) as client:
+		async with pooled_client(timeout=60) as client:
 			resp = await client.post(
 				f"{OPENAI_BASE_URL}/chat/completions",
 				headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
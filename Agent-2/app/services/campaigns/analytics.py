@@ -1,16 +1,23 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
-from datetime import datetime, timedelta
+from sqlalchemy import Integer, and_, case, cast, select, func
+from datetime import datetime, timedelta, timezone
 import logging
 
 from app.models.campaign import Campaign, CampaignRecipient, CampaignEmail
-from app.models.email_tracking import EmailMessageLog, CampaignRecipientEvent
+from app.models.campaign_stats import CampaignStatsDaily
+from app.models.email_tracking import EmailMessageLog
+from app.services.campaigns.rollups import ROLLUP_COUNTERS, ROLLUP_MODELS, bucket_start
 from app.models.lead import Lead
 from app.models.lead_score import LeadScore
 
 logger = logging.getLogger(__name__)
 
+# Statuses counted as qualified leads in campaign metrics
+QUALIFIED_STATUSES = ("qualified", "hot")
+# Lead columns get_lead_performance_analytics can break down by
+LEAD_DIMENSIONS = ("industry", "company_size", "role", "location", "source", "stage")
+
 class CampaignAnalyticsService:
     def __init__(self):
         pass
@@ -22,46 +29,46 @@ class CampaignAnalyticsService:
         if not campaign:
             return {"error": "Campaign not found"}
         
-        # Get all recipients for this campaign
-        recipients_result = await db.execute(
-            select(CampaignRecipient).where(CampaignRecipient.campaign_id == campaign_id)
-        )
-        recipients = list(recipients_result.scalars().all())
-        
         # Get campaign emails
         emails_result = await db.execute(
-            select(CampaignEmail).where(CampaignEmail.campaign_id == campaign_id)
+            select(CampaignEmail).where(CampaignEmail.campaign_id == campaign_id).order_by(CampaignEmail.id)
         )
         emails = list(emails_result.scalars().all())
         
+        # All counters in one round trip; sends come from the daily rollup, O(days x steps) rows.
+        # Replies count messages whose status is "replied" (as before the rollups): the rollup's
+        # reply counter counts webhook events, so a retried webhook would count twice there.
+        recipient_ids = select(CampaignRecipient.id).where(CampaignRecipient.campaign_id == campaign_id)
+        lead_ids = select(CampaignRecipient.lead_id).where(CampaignRecipient.campaign_id == campaign_id)
+        scores = select(LeadScore.total_score, LeadScore.qualification_status).where(LeadScore.lead_id.in_(lead_ids)).subquery()
+        counts = (await db.execute(select(
+            select(func.count()).where(CampaignRecipient.campaign_id == campaign_id).scalar_subquery().label("total_recipients"),
+            select(func.count()).where(CampaignRecipient.campaign_id == campaign_id, CampaignRecipient.paused == True).scalar_subquery().label("paused_recipients"),
+            select(func.coalesce(func.sum(CampaignStatsDaily.sent), 0))
+            .where(CampaignStatsDaily.campaign_id == campaign_id).scalar_subquery().label("emails_sent"),
+            select(func.count()).where(
+                EmailMessageLog.recipient_id.in_(recipient_ids), EmailMessageLog.status == "replied"
+            ).scalar_subquery().label("replied_recipients"),
+            select(func.count()).select_from(scores).scalar_subquery().label("scored_leads"),
+            select(func.avg(scores.c.total_score)).scalar_subquery().label("avg_lead_score"),
+            select(func.count()).where(scores.c.qualification_status.in_(QUALIFIED_STATUSES)).scalar_subquery().label("qualified_leads"),
+        ))).one()
+        
         # Calculate metrics
-        total_recipients = len(recipients)
-        # Use recipient events/logs for sent count when available
-        sent_events_result = await db.execute(
-            select(CampaignRecipientEvent).where(CampaignRecipientEvent.recipient_id.in_([r.id for r in recipients])).where(CampaignRecipientEvent.event_type == "sent")
-        )
-        emails_sent = len(list(sent_events_result.scalars().all()))
-        paused_recipients = sum(1 for r in recipients if r.paused)
+        total_recipients = counts.total_recipients
+        emails_sent = counts.emails_sent
+        paused_recipients = counts.paused_recipients
         active_recipients = total_recipients - paused_recipients
-        
-        # Engagement metrics (simplified - would need webhook tracking for real data)
-        # Replies from logs
-        reply_logs_result = await db.execute(
-            select(EmailMessageLog).where(EmailMessageLog.recipient_id.in_([r.id for r in recipients])).where(EmailMessageLog.status == "replied")
-        )
-        replied_recipients = len(list(reply_logs_result.scalars().all()))
+        replied_recipients = counts.replied_recipients
         
         # Calculate rates
         delivery_rate = (emails_sent / total_recipients * 100) if total_recipients > 0 else 0
         reply_rate = (replied_recipients / emails_sent * 100) if emails_sent > 0 else 0
         
         # Lead quality metrics
-        lead_scores = await self._get_lead_scores_for_campaign(campaign_id, db)
-        avg_lead_score = sum(score.total_score for score in lead_scores) / len(lead_scores) if lead_scores else 0
-        
-        # Qualification metrics
-        qualified_leads = sum(1 for score in lead_scores if score.qualification_status in ["qualified", "hot"])
-        qualification_rate = (qualified_leads / len(lead_scores) * 100) if lead_scores else 0
+        avg_lead_score = counts.avg_lead_score or 0
+        qualified_leads = counts.qualified_leads
+        qualification_rate = (qualified_leads / counts.scored_leads * 100) if counts.scored_leads else 0
         
         return {
             "campaign_id": campaign_id,
@@ -97,54 +104,67 @@ class CampaignAnalyticsService:
         # Date range
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Total campaigns
-        campaigns_result = await db.execute(
-            select(Campaign).where(Campaign.created_at >= start_date)
+        # Per-campaign counters: recipients grouped from their table, sends from the daily rollup,
+        # replies as messages with status "replied" (see get_campaign_performance)
+        in_range = select(Campaign.id).where(Campaign.created_at >= start_date)
+        recipients = (
+            select(CampaignRecipient.campaign_id, func.count().label("n"))
+            .where(CampaignRecipient.campaign_id.in_(in_range))
+            .group_by(CampaignRecipient.campaign_id)
+            .subquery()
         )
-        campaigns = list(campaigns_result.scalars().all())
-        
-        # Total recipients
-        total_recipients = 0
-        total_emails_sent = 0
-        total_replies = 0
-        
-        campaign_performances = []
-        
-        for campaign in campaigns:
-            recipients_result = await db.execute(
-                select(CampaignRecipient).where(CampaignRecipient.campaign_id == campaign.id)
+        events = (
+            select(
+                CampaignStatsDaily.campaign_id,
+                func.sum(CampaignStatsDaily.sent).label("sent"),
             )
-            recipients = list(recipients_result.scalars().all())
-            
-            total_recipients += len(recipients)
-            sent_events_result = await db.execute(
-                select(CampaignRecipientEvent).where(CampaignRecipientEvent.recipient_id.in_([r.id for r in recipients])).where(CampaignRecipientEvent.event_type == "sent")
-            )
-            emails_sent = len(list(sent_events_result.scalars().all()))
-            total_emails_sent += emails_sent
-            reply_logs_result = await db.execute(
-                select(EmailMessageLog).where(EmailMessageLog.recipient_id.in_([r.id for r in recipients])).where(EmailMessageLog.status == "replied")
+            .where(CampaignStatsDaily.campaign_id.in_(in_range))
+            .group_by(CampaignStatsDaily.campaign_id)
+            .subquery()
+        )
+        replies = (
+            select(CampaignRecipient.campaign_id, func.count().label("replied"))
+            .join(EmailMessageLog, EmailMessageLog.recipient_id == CampaignRecipient.id)
+            .where(CampaignRecipient.campaign_id.in_(in_range), EmailMessageLog.status == "replied")
+            .group_by(CampaignRecipient.campaign_id)
+            .subquery()
+        )
+        rows = (await db.execute(
+            select(
+                Campaign.id,
+                Campaign.name,
+                func.coalesce(recipients.c.n, 0).label("recipients"),
+                func.coalesce(events.c.sent, 0).label("emails_sent"),
+                func.coalesce(replies.c.replied, 0).label("replies"),
             )
-            replied = len(list(reply_logs_result.scalars().all()))
-            total_replies += replied
-            
-            campaign_performances.append({
-                "campaign_id": campaign.id,
-                "campaign_name": campaign.name,
-                "recipients": len(recipients),
-                "emails_sent": emails_sent,
-                "replies": replied,
-                "reply_rate": (replied / emails_sent * 100) if emails_sent > 0 else 0
-            })
+            .outerjoin(recipients, recipients.c.campaign_id == Campaign.id)
+            .outerjoin(events, events.c.campaign_id == Campaign.id)
+            .outerjoin(replies, replies.c.campaign_id == Campaign.id)
+            .where(Campaign.created_at >= start_date)
+            .order_by(Campaign.id)
+        )).all()
         
-        # Lead quality metrics
-        all_leads_result = await db.execute(
-            select(Lead).where(Lead.created_at >= start_date)
-        )
-        all_leads = list(all_leads_result.scalars().all())
+        campaign_performances = [
+            {
+                "campaign_id": row.id,
+                "campaign_name": row.name,
+                "recipients": row.recipients,
+                "emails_sent": row.emails_sent,
+                "replies": row.replies,
+                "reply_rate": (row.replies / row.emails_sent * 100) if row.emails_sent > 0 else 0
+            }
+            for row in rows
+        ]
+        total_recipients = sum(c["recipients"] for c in campaign_performances)
+        total_emails_sent = sum(c["emails_sent"] for c in campaign_performances)
+        total_replies = sum(c["replies"] for c in campaign_performances)
         
-        lead_scores = await self._get_lead_scores_for_leads([lead.id for lead in all_leads], db)
-        avg_lead_score = sum(score.total_score for score in lead_scores) / len(lead_scores) if lead_scores else 0
+        # Lead quality metrics
+        avg_lead_score = (await db.execute(
+            select(func.avg(LeadScore.total_score))
+            .join(Lead, Lead.id == LeadScore.lead_id)
+            .where(Lead.created_at >= start_date)
+        )).scalar() or 0
         
         # Top performing campaigns
         top_campaigns = sorted(campaign_performances, key=lambda x: x["reply_rate"], reverse=True)[:5]
@@ -152,7 +172,7 @@ class CampaignAnalyticsService:
         return {
             "period_days": days,
             "summary": {
-                "total_campaigns": len(campaigns),
+                "total_campaigns": len(campaign_performances),
                 "total_recipients": total_recipients,
                 "total_emails_sent": total_emails_sent,
                 "total_replies": total_replies,
@@ -163,98 +183,156 @@ class CampaignAnalyticsService:
             "all_campaigns": campaign_performances
         }
 
-    async def get_lead_performance_analytics(self, db: AsyncSession, days: int = 30) -> Dict[str, Any]:
-        """Get lead performance analytics"""
+    async def get_campaign_timeseries(
+        self,
+        campaign_id: int,
+        db: AsyncSession,
+        granularity: str = "day",
+        days: int = 30,
+        step: Optional[int] = None,
+        variant_label: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Dense per-bucket event counters for charting, read from the hourly/daily rollups
+
+        The window ends with the current (partial) bucket. Buckets without events are
+        filled with zeros, so every series has one value per bucket.
+        """
         
-        start_date = datetime.utcnow() - timedelta(days=days)
+        campaign = await db.get(Campaign, campaign_id)
+        if not campaign:
+            return {"error": "Campaign not found"}
         
-        # Get all leads from the period
-        leads_result = await db.execute(
-            select(Lead).where(Lead.created_at >= start_date)
-        )
-        leads = list(leads_result.scalars().all())
+        model = ROLLUP_MODELS[granularity]
+        width = timedelta(hours=1) if granularity == "hour" else timedelta(days=1)
+        count = days * 24 if granularity == "hour" else days
+        end = bucket_start(datetime.now(timezone.utc), granularity)
+        start = end - width * (count - 1)
         
-        # Get lead scores
-        lead_scores = await self._get_lead_scores_for_leads([lead.id for lead in leads], db)
+        stmt = (
+            select(model.bucket, *[func.sum(getattr(model, c)).label(c) for c in ROLLUP_COUNTERS])
+            .where(model.campaign_id == campaign_id, model.bucket >= start)
+            .group_by(model.bucket)
+        )
+        if step is not None:
+            stmt = stmt.where(model.step == step)
+        if variant_label is not None:
+            stmt = stmt.where(model.variant_label == variant_label)
+        rows = {bucket_start(row.bucket, granularity): row for row in (await db.execute(stmt)).all()}
         
-        # Score distribution
-        score_ranges = {
-            "hot": sum(1 for score in lead_scores if score.total_score >= 80),
-            "qualified": sum(1 for score in lead_scores if 60 <= score.total_score < 80),
-            "unqualified": sum(1 for score in lead_scores if score.total_score < 60)
+        buckets = [start + width * i for i in range(count)]
+        return {
+            "campaign_id": campaign_id,
+            "granularity": granularity,
+            "start": start,
+            "end": end + width,
+            "step": step,
+            "variant_label": variant_label,
+            "buckets": buckets,
+            "series": {
+                c: [int(getattr(rows[b], c) or 0) if b in rows else 0 for b in buckets]
+                for c in ROLLUP_COUNTERS
+            },
         }
+
+    async def get_lead_performance_analytics(
+        self,
+        db: AsyncSession,
+        days: int = 30,
+        group_by: Sequence[str] = (),
+        bucket_size: int = 10,
+    ) -> Dict[str, Any]:
+        """Get lead performance analytics
+
+        Every figure is a grouped aggregate over leads LEFT JOIN lead_scores, so cost
+        does not depend on loading rows: one summary query, one histogram query and
+        one GROUP BY per breakdown. `group_by` adds breakdowns over LEAD_DIMENSIONS;
+        industry and company size are always included.
+        """
         
-        # Industry breakdown
-        industry_stats = {}
-        for lead in leads:
-            industry = lead.industry or "Unknown"
-            if industry not in industry_stats:
-                industry_stats[industry] = {"count": 0, "avg_score": 0, "scores": []}
-            industry_stats[industry]["count"] += 1
-            
-            # Find corresponding score
-            lead_score = next((score for score in lead_scores if score.lead_id == lead.id), None)
-            if lead_score:
-                industry_stats[industry]["scores"].append(lead_score.total_score)
+        start_date = datetime.utcnow() - timedelta(days=days)
+        in_period = Lead.created_at >= start_date
         
-        # Calculate average scores per industry
-        for industry in industry_stats:
-            scores = industry_stats[industry]["scores"]
-            industry_stats[industry]["avg_score"] = round(sum(scores) / len(scores), 2) if scores else 0
-            del industry_stats[industry]["scores"]  # Remove raw scores
+        summary = (await db.execute(
+            select(
+                func.count(Lead.id).label("total_leads"),
+                func.count(LeadScore.id).label("scored"),
+                func.avg(LeadScore.total_score).label("avg_score"),
+                func.sum(case((LeadScore.total_score >= 80, 1), else_=0)).label("hot"),
+                func.sum(case((and_(LeadScore.total_score >= 60, LeadScore.total_score < 80), 1), else_=0)).label("qualified"),
+                func.sum(case((LeadScore.total_score < 60, 1), else_=0)).label("unqualified"),
+            )
+            .select_from(Lead)
+            .outerjoin(LeadScore, LeadScore.lead_id == Lead.id)
+            .where(in_period)
+        )).one()
         
-        # Company size breakdown
-        company_size_stats = {}
-        for lead in leads:
-            size = lead.company_size or "Unknown"
-            if size not in company_size_stats:
-                company_size_stats[size] = {"count": 0, "avg_score": 0, "scores": []}
-            company_size_stats[size]["count"] += 1
-            
-            lead_score = next((score for score in lead_scores if score.lead_id == lead.id), None)
-            if lead_score:
-                company_size_stats[size]["scores"].append(lead_score.total_score)
+        # Score distribution
+        score_ranges = {
+            "hot": summary.hot or 0,
+            "qualified": summary.qualified or 0,
+            "unqualified": summary.unqualified or 0
+        }
         
-        for size in company_size_stats:
-            scores = company_size_stats[size]["scores"]
-            company_size_stats[size]["avg_score"] = round(sum(scores) / len(scores), 2) if scores else 0
-            del company_size_stats[size]["scores"]
+        breakdowns = {}
+        for dimension in ["industry", "company_size", *[d for d in group_by if d not in ("industry", "company_size")]]:
+            breakdowns[dimension] = await self._lead_breakdown(db, dimension, in_period)
         
         return {
             "period_days": days,
-            "total_leads": len(leads),
+            "total_leads": summary.total_leads,
             "score_distribution": score_ranges,
-            "industry_breakdown": industry_stats,
-            "company_size_breakdown": company_size_stats,
-            "overall_avg_score": round(sum(score.total_score for score in lead_scores) / len(lead_scores), 2) if lead_scores else 0
+            "industry_breakdown": breakdowns.pop("industry"),
+            "company_size_breakdown": breakdowns.pop("company_size"),
+            "breakdowns": breakdowns,
+            "score_histogram": await self._score_histogram(db, in_period, bucket_size),
+            "overall_avg_score": round(summary.avg_score, 2) if summary.scored else 0
         }
 
-    async def _get_lead_scores_for_campaign(self, campaign_id: int, db: AsyncSession) -> List[LeadScore]:
-        """Get lead scores for all leads in a campaign"""
-        # Get recipient lead IDs
-        recipients_result = await db.execute(
-            select(CampaignRecipient.lead_id).where(CampaignRecipient.campaign_id == campaign_id)
-        )
-        lead_ids = [row[0] for row in recipients_result.fetchall()]
-        
-        if not lead_ids:
-            return []
-        
-        # Get lead scores
-        scores_result = await db.execute(
-            select(LeadScore).where(LeadScore.lead_id.in_(lead_ids))
+    async def _lead_breakdown(self, db: AsyncSession, dimension: str, in_period) -> Dict[str, Dict[str, Any]]:
+        """Lead count and average score per value of one lead column (missing values grouped as "Unknown")"""
+        column = getattr(Lead, dimension)
+        result = await db.execute(
+            select(column, func.count(Lead.id), func.count(LeadScore.id), func.sum(LeadScore.total_score))
+            .select_from(Lead)
+            .outerjoin(LeadScore, LeadScore.lead_id == Lead.id)
+            .where(in_period)
+            .group_by(column)
         )
-        return list(scores_result.scalars().all())
+        # NULL and "" both read as "Unknown", so their groups are merged before averaging
+        totals: Dict[str, List[float]] = {}
+        for value, count, scored, score_sum in result.all():
+            acc = totals.setdefault(value or "Unknown", [0, 0, 0.0])
+            acc[0] += count
+            acc[1] += scored
+            acc[2] += score_sum or 0.0
+        return {
+            key: {"count": count, "avg_score": round(score_sum / scored, 2) if scored else 0}
+            for key, (count, scored, score_sum) in totals.items()
+        }
 
-    async def _get_lead_scores_for_leads(self, lead_ids: List[int], db: AsyncSession) -> List[LeadScore]:
-        """Get lead scores for specific lead IDs"""
-        if not lead_ids:
-            return []
-        
-        scores_result = await db.execute(
-            select(LeadScore).where(LeadScore.lead_id.in_(lead_ids))
+    async def _score_histogram(self, db: AsyncSession, in_period, bucket_size: int) -> List[Dict[str, Any]]:
+        """Scored leads per [min, max) bucket of total_score across 0-100; a score of 100 falls in the last bucket"""
+        buckets = -(-100 // bucket_size)
+        scaled = LeadScore.total_score / bucket_size
+        # CAST rounds on Postgres but truncates on SQLite (whose floor() needs a math-enabled build);
+        # scores are non-negative, so truncation already floors there
+        if db.get_bind().dialect.name != "sqlite":
+            scaled = func.floor(scaled)
+        bucket = cast(scaled, Integer)
+        result = await db.execute(
+            select(bucket, func.count())
+            .select_from(LeadScore)
+            .join(Lead, Lead.id == LeadScore.lead_id)
+            .where(in_period)
+            .group_by(bucket)
         )
-        return list(scores_result.scalars().all())
+        counts = [0] * buckets
+        for index, count in result.all():
+            counts[min(max(index or 0, 0), buckets - 1)] += count
+        return [
+            {"min": i * bucket_size, "max": min((i + 1) * bucket_size, 100), "count": counts[i]}
+            for i in range(buckets)
+        ]
 
 # Global instance
 campaign_analytics_service = CampaignAnalyticsService()
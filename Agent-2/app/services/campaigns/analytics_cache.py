@@ -0,0 +1,162 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Iterable, Mapping, Set, Tuple
+import asyncio
+import logging
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tag for entries aggregated over every campaign (invalidated by a change to any campaign)
+ALL_CAMPAIGNS = "*"
+
+CacheKey = Tuple[str, Tuple[Tuple[str, Any], ...]]
+
+
+def analytics_key(endpoint: str, params: Mapping[str, Any]) -> CacheKey:
+	"""Key by logical endpoint and parameters; list values are order-insensitive."""
+	norm = tuple(sorted(
+		(k, tuple(sorted(v)) if isinstance(v, (list, tuple)) else v)
+		for k, v in params.items()
+	))
+	return endpoint, norm
+
+
+@dataclass
+class _Entry:
+	value: Any
+	stored_at: float
+	tags: FrozenSet[Any]
+	stale: bool = False  # invalidated by a write; still servable until the stale window ends
+
+
+class AnalyticsResponseCache:
+	"""In-process TTL cache for analytics responses with stale-while-revalidate.
+
+	Fresh entries (younger than ANALYTICS_CACHE_TTL_SECS and not invalidated) are
+	served directly. Expired or invalidated entries are still served for up to
+	ANALYTICS_CACHE_STALE_SECS while one background task recomputes them. Beyond
+	that, callers wait, and concurrent callers for the same key share a single
+	computation. Entries are tagged with the campaigns they aggregate so scheduler
+	runs and tracking webhooks only invalidate what they changed.
+	"""
+
+	def __init__(self) -> None:
+		self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+		# One computation task per key; callers await it shielded, so a disconnecting client cannot cancel it
+		self._inflight: Dict[CacheKey, asyncio.Task] = {}
+		self._inflight_tags: Dict[CacheKey, FrozenSet[Any]] = {}
+		# In-flight keys invalidated mid-computation; their result is stored already stale
+		self._dirty: Set[CacheKey] = set()
+		self.stats = {
+			"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+			"refreshes": 0, "refresh_errors": 0, "invalidations": 0, "evictions": 0,
+		}
+
+	@property
+	def enabled(self) -> bool:
+		return settings.ANALYTICS_CACHE_TTL_SECS > 0
+
+	async def get_or_compute(
+		self,
+		endpoint: str,
+		params: Mapping[str, Any],
+		compute: Callable[[], Awaitable[Any]],
+		tags: Iterable[Any] = (ALL_CAMPAIGNS,),
+	) -> Any:
+		"""Cached result of `compute()`; it must open its own DB session since it may run after the request."""
+		if not self.enabled:
+			return await compute()
+		key = analytics_key(endpoint, params)
+		entry = self._entries.get(key)
+		now = time.monotonic()
+		if entry is not None:
+			age = now - entry.stored_at
+			if not entry.stale and age < settings.ANALYTICS_CACHE_TTL_SECS:
+				self._entries.move_to_end(key)
+				self.stats["hits"] += 1
+				return entry.value
+			if age < settings.ANALYTICS_CACHE_TTL_SECS + settings.ANALYTICS_CACHE_STALE_SECS:
+				self._entries.move_to_end(key)
+				self.stats["stale_hits"] += 1
+				if key not in self._inflight:
+					self._start(key, compute, frozenset(tags)).add_done_callback(self._log_failure)
+				return entry.value
+		if key in self._inflight:
+			self.stats["coalesced"] += 1
+			return await asyncio.shield(self._inflight[key])
+		self.stats["misses"] += 1
+		return await asyncio.shield(self._start(key, compute, frozenset(tags)))
+
+	def _start(self, key: CacheKey, compute: Callable[[], Awaitable[Any]], tags: FrozenSet[Any]) -> asyncio.Task:
+		task = asyncio.create_task(self._refresh(key, compute, tags))
+		self._inflight[key] = task
+		self._inflight_tags[key] = tags
+
+		def _done(_: asyncio.Task) -> None:
+			self._inflight.pop(key, None)
+			self._inflight_tags.pop(key, None)
+
+		task.add_done_callback(_done)
+		return task
+
+	async def _refresh(self, key: CacheKey, compute: Callable[[], Awaitable[Any]], tags: FrozenSet[Any]) -> Any:
+		try:
+			value = await compute()
+		except Exception:
+			self.stats["refresh_errors"] += 1
+			self._dirty.discard(key)
+			raise
+		self.stats["refreshes"] += 1
+		self._entries[key] = _Entry(value, time.monotonic(), tags, stale=key in self._dirty)
+		self._dirty.discard(key)
+		self._entries.move_to_end(key)
+		while len(self._entries) > max(1, settings.ANALYTICS_CACHE_MAX_ENTRIES):
+			self._entries.popitem(last=False)
+			self.stats["evictions"] += 1
+		return value
+
+	@staticmethod
+	def _log_failure(task: asyncio.Task) -> None:
+		if not task.cancelled() and task.exception() is not None:
+			logger.error(f"❌ Background analytics refresh failed: {task.exception()!r}")
+
+	@staticmethod
+	def _covers(tags: FrozenSet[Any], ids: FrozenSet[int]) -> bool:
+		return ALL_CAMPAIGNS in tags or bool(tags & ids)
+
+	def invalidate_campaigns(self, campaign_ids: Iterable[int]) -> None:
+		"""Mark entries covering any of these campaigns (or all campaigns) stale."""
+		ids = frozenset(campaign_ids)
+		if not ids:
+			return
+		self.stats["invalidations"] += 1
+		for entry in self._entries.values():
+			if self._covers(entry.tags, ids):
+				entry.stale = True
+		self._dirty.update(k for k, tags in self._inflight_tags.items() if self._covers(tags, ids))
+
+	def invalidate_all(self) -> None:
+		self.stats["invalidations"] += 1
+		for entry in self._entries.values():
+			entry.stale = True
+		self._dirty.update(self._inflight_tags)
+
+	def clear(self) -> None:
+		self._entries.clear()
+
+	def snapshot(self) -> Dict[str, Any]:
+		lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"] + self.stats["coalesced"]
+		served = self.stats["hits"] + self.stats["stale_hits"] + self.stats["coalesced"]
+		return {
+			**self.stats,
+			"entries": len(self._entries),
+			"inflight": len(self._inflight),
+			"hit_rate": round(served / lookups, 4) if lookups else 0.0,
+			"fresh_hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+		}
+
+
+analytics_cache = AnalyticsResponseCache()
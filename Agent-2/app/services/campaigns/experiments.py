@@ -0,0 +1,199 @@
+from datetime import datetime, timedelta, timezone
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+import math
+import time
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.campaign import CampaignEmail, CampaignEmailVariant, CampaignRecipient
+from app.models.email_tracking import EmailMessageLog
+from app.services.campaigns.analytics_cache import analytics_cache
+
+logger = logging.getLogger(__name__)
+
+# Funnel stages after "sent", in order; each counts distinct messages that reached it
+FUNNEL_STAGES = ("delivered", "opened", "clicked", "replied")
+BANDIT_DRAWS = 10000
+
+_erfc = np.vectorize(math.erfc, otypes=[float])
+
+
+def wilson_interval(successes: np.ndarray, trials: np.ndarray, z: float) -> tuple[np.ndarray, np.ndarray]:
+	"""Wilson score interval, element-wise; rows with no trials get [0, 0]."""
+	n = np.maximum(trials, 1)
+	p = successes / n
+	denom = 1 + z * z / n
+	center = (p + z * z / (2 * n)) / denom
+	half = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+	empty = trials == 0
+	return np.where(empty, 0.0, np.clip(center - half, 0, 1)), np.where(empty, 0.0, np.clip(center + half, 0, 1))
+
+
+class ExperimentService:
+	"""Per-(step, variant) funnels, significance tests and bandit weight updates for A/B variants."""
+
+	def __init__(self) -> None:
+		self._rebalanced_at: Dict[int, float] = {}
+
+	async def funnel_counts(self, db: AsyncSession, campaign_id: int, days: Optional[int] = None) -> List[Dict[str, Any]]:
+		"""sent/delivered/opened/clicked/replied per (step, variant_label), counted once per message.
+
+		Any later event counts as delivered and a click counts as opened, so dropped
+		delivery/open events do not undercount those stages. Replies are counted as
+		recorded (many replies never touch tracking), so replied may exceed clicked.
+		"""
+		log = EmailMessageLog
+		stmt = (
+			select(
+				func.coalesce(log.step, 0).label("step"),
+				func.coalesce(log.variant_label, "").label("variant_label"),
+				func.count().label("sent"),
+				func.count(func.coalesce(log.delivered_at, log.opened_at, log.clicked_at, log.replied_at)).label("delivered"),
+				func.count(func.coalesce(log.opened_at, log.clicked_at)).label("opened"),
+				func.count(log.clicked_at).label("clicked"),
+				func.count(log.replied_at).label("replied"),
+			)
+			.join(CampaignRecipient, CampaignRecipient.id == log.recipient_id)
+			.where(CampaignRecipient.campaign_id == campaign_id, log.status != "failed")
+			.group_by(func.coalesce(log.step, 0), func.coalesce(log.variant_label, ""))
+			.order_by(func.coalesce(log.step, 0), func.coalesce(log.variant_label, ""))
+		)
+		if days:
+			stmt = stmt.where(log.created_at >= datetime.now(timezone.utc) - timedelta(days=days))
+		return [dict(row._mapping) for row in (await db.execute(stmt)).all()]
+
+	def funnel_stats(self, rows: List[Dict[str, Any]], metric: str = "replied", confidence: float = 0.95) -> List[Dict[str, Any]]:
+		"""Rates with Wilson intervals for every stage, plus a two-proportion z-test on `metric`.
+
+		Within each step the variant with the most sends is the control; every other
+		variant is tested against it. All rows and stages are computed in one pass.
+		"""
+		if not rows:
+			return []
+		z = NormalDist().inv_cdf(0.5 + confidence / 2)
+		steps = np.array([r["step"] for r in rows])
+		sent = np.array([r["sent"] for r in rows], dtype=np.float64)
+		counts = np.array([[r[s] for s in FUNNEL_STAGES] for r in rows], dtype=np.float64)
+		rates = counts / np.maximum(sent, 1)[:, None]
+		low, high = wilson_interval(counts, sent[:, None], z)
+
+		# Control per step: most sends, ties to the first label (rows are ordered by step, label)
+		_, inverse = np.unique(steps, return_inverse=True)
+		control = np.empty(len(rows), dtype=np.int64)
+		for g in range(inverse.max() + 1):
+			members = np.flatnonzero(inverse == g)
+			control[members] = members[np.argmax(sent[members])]
+
+		m = FUNNEL_STAGES.index(metric)
+		k1, n1 = counts[:, m], sent
+		k0, n0 = counts[control, m], sent[control]
+		p1, p0 = k1 / np.maximum(n1, 1), k0 / np.maximum(n0, 1)
+		pooled = (k1 + k0) / np.maximum(n1 + n0, 1)
+		se = np.sqrt(pooled * (1 - pooled) * (1 / np.maximum(n1, 1) + 1 / np.maximum(n0, 1)))
+		zscore = np.divide(p1 - p0, se, out=np.zeros_like(se), where=se > 0)
+		p_value = _erfc(np.abs(zscore) / math.sqrt(2))
+		is_control = control == np.arange(len(rows))
+		lift = np.divide(p1 - p0, p0, out=np.zeros_like(p0), where=p0 > 0)
+
+		out = []
+		for i, row in enumerate(rows):
+			out.append({
+				**row,
+				"rates": {
+					stage: {"rate": round(float(rates[i, j]), 4), "ci_low": round(float(low[i, j]), 4), "ci_high": round(float(high[i, j]), 4)}
+					for j, stage in enumerate(FUNNEL_STAGES)
+				},
+				"control": rows[control[i]]["variant_label"],
+				"lift": None if is_control[i] else round(float(lift[i]), 4),
+				"z": None if is_control[i] else round(float(zscore[i]), 4),
+				"p_value": None if is_control[i] else round(float(p_value[i]), 6),
+				"significant": False if is_control[i] else bool(p_value[i] < 1 - confidence),
+			})
+		return out
+
+	async def get_funnel(
+		self,
+		db: AsyncSession,
+		campaign_id: int,
+		days: Optional[int] = None,
+		metric: str = "replied",
+		confidence: float = 0.95,
+	) -> Dict[str, Any]:
+		rows = self.funnel_stats(await self.funnel_counts(db, campaign_id, days), metric, confidence)
+		weights = await self._variant_weights(db, campaign_id)
+		steps: Dict[int, List[Dict[str, Any]]] = {}
+		for row in rows:
+			row["weight"] = weights.get((row["step"], row["variant_label"]))
+			steps.setdefault(row["step"], []).append(row)
+		return {
+			"campaign_id": campaign_id,
+			"period_days": days,
+			"metric": metric,
+			"confidence": confidence,
+			"steps": [{"step": step, "variants": variants} for step, variants in steps.items()],
+		}
+
+	async def _variant_weights(self, db: AsyncSession, campaign_id: int) -> Dict[tuple, int]:
+		res = await db.execute(
+			select(CampaignEmail.sequence_order, CampaignEmailVariant.label, CampaignEmailVariant.weight)
+			.join(CampaignEmailVariant, CampaignEmailVariant.email_id == CampaignEmail.id)
+			.where(CampaignEmail.campaign_id == campaign_id)
+		)
+		return {(step, label): weight for step, label, weight in res.all()}
+
+	async def rebalance(self, db: AsyncSession, campaign_id: int, metric: Optional[str] = None) -> Dict[int, Dict[str, int]]:
+		"""Thompson-sampling weights: each variant's weight becomes its probability (in %) of having the best `metric` rate.
+
+		Posteriors are Beta(1 + successes, 1 + failures) per variant; every variant keeps
+		weight >= 1 so losers are still explored. Commits and returns {step: {label: weight}}.
+		"""
+		metric = metric or settings.AB_BANDIT_METRIC
+		counts = {(r["step"], r["variant_label"]): r for r in await self.funnel_counts(db, campaign_id)}
+		res = await db.execute(
+			select(CampaignEmail.sequence_order, CampaignEmailVariant)
+			.join(CampaignEmailVariant, CampaignEmailVariant.email_id == CampaignEmail.id)
+			.where(CampaignEmail.campaign_id == campaign_id)
+		)
+		by_step: Dict[int, List[CampaignEmailVariant]] = {}
+		for step, variant in res.all():
+			by_step.setdefault(step, []).append(variant)
+		rng = np.random.default_rng()
+		updated: Dict[int, Dict[str, int]] = {}
+		for step, variants in by_step.items():
+			if len(variants) < 2:
+				continue
+			rows = [counts.get((step, v.label), {}) for v in variants]
+			wins = np.array([r.get(metric, 0) for r in rows], dtype=np.float64)
+			trials = np.array([r.get("sent", 0) for r in rows], dtype=np.float64)
+			draws = rng.beta(1 + wins[:, None], 1 + (trials - wins)[:, None], size=(len(variants), BANDIT_DRAWS))
+			p_best = np.bincount(draws.argmax(axis=0), minlength=len(variants)) / BANDIT_DRAWS
+			for variant, p in zip(variants, p_best):
+				variant.weight = max(1, int(round(p * 100)))
+			updated[step] = {v.label: v.weight for v in variants}
+		await db.commit()
+		self._rebalanced_at[campaign_id] = time.monotonic()
+		analytics_cache.invalidate_campaigns([campaign_id])
+		if updated:
+			logger.info(f"🧮 Rebalanced A/B weights for campaign {campaign_id}: {updated}")
+		return updated
+
+	async def rebalance_due(self, db: AsyncSession, campaign_ids: Iterable[int]) -> None:
+		"""Rebalance bandit campaigns whose weights are older than AB_BANDIT_REBALANCE_SECS."""
+		now = time.monotonic()
+		for campaign_id in campaign_ids:
+			last = self._rebalanced_at.get(campaign_id)
+			if last is not None and now - last < settings.AB_BANDIT_REBALANCE_SECS:
+				continue
+			try:
+				await self.rebalance(db, campaign_id)
+			except Exception:
+				await db.rollback()
+				logger.exception(f"❌ A/B rebalance failed for campaign {campaign_id}")
+
+
+experiment_service = ExperimentService()
@@ -0,0 +1,191 @@
+"""Work leases on due campaign recipients.
+
+Each scheduler worker claims a bounded batch of due recipients by stamping
+lease_owner/lease_expires_at, keeps the lease alive with heartbeats while it
+sends, and clears it when the batch is written. Any worker may claim rows whose
+lease has expired, so a crashed or stalled worker's batch is picked up again.
+lease_owner holds a per-claim token ("<worker id>/<claim no>"), and the batch is
+only written for rows still carrying it, so a worker whose lease lapsed mid-send
+never overwrites the state of whoever claimed the row next.
+On Postgres the claim uses FOR UPDATE SKIP LOCKED so concurrent workers never
+wait on each other; elsewhere the UPDATE re-checks the lease condition, which
+makes it an atomic compare-and-set under the database's write lock.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, List
+import asyncio
+import itertools
+import logging
+import os
+import socket
+import time
+import uuid
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.models.campaign import CampaignRecipient
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process in lease_owner and scheduler runs
+WORKER_ID = f"{socket.gethostname()[:32]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+_claim_seq = itertools.count(1)
+
+
+def new_lease_token() -> str:
+	"""lease_owner value for one claim: this worker's id plus a claim sequence number."""
+	return f"{WORKER_ID}/{next(_claim_seq)}"
+
+
+def lease_worker(owner: str) -> str:
+	"""Worker id a lease_owner token belongs to."""
+	return owner.rpartition("/")[0] or owner
+
+
+def _claimable(now: datetime):
+	return and_(
+		CampaignRecipient.paused == False,
+		CampaignRecipient.next_send_at <= now,
+		or_(CampaignRecipient.lease_expires_at.is_(None), CampaignRecipient.lease_expires_at < now),
+	)
+
+
+async def claim_due_recipients(db: AsyncSession, owner: str, now: datetime, after_id: int = 0, limit: int = 500) -> List[int]:
+	"""Lease up to `limit` due, unleased recipients with id > after_id; commits and returns their ids."""
+	until = now + timedelta(seconds=settings.SCHEDULER_LEASE_SECS)
+	candidates = (
+		select(CampaignRecipient.id)
+		.where(_claimable(now), CampaignRecipient.id > after_id)
+		.order_by(CampaignRecipient.id)
+		.limit(limit)
+	)
+	dialect = db.get_bind().dialect
+	if dialect.name == "postgresql":
+		candidates = candidates.with_for_update(skip_locked=True)
+	stmt = (
+		update(CampaignRecipient)
+		.where(CampaignRecipient.id.in_(candidates.scalar_subquery()), _claimable(now))
+		.values(lease_owner=owner, lease_expires_at=until)
+		.execution_options(synchronize_session=False)
+	)
+	if dialect.update_returning:
+		ids = list((await db.execute(stmt.returning(CampaignRecipient.id))).scalars())
+	else:
+		await db.execute(stmt)
+		ids = list((await db.execute(
+			select(CampaignRecipient.id).where(CampaignRecipient.lease_owner == owner, CampaignRecipient.lease_expires_at == until)
+		)).scalars())
+	await db.commit()
+	return sorted(ids)
+
+
+async def _restamp(db: AsyncSession, owner: str, ids: List[int]) -> set[int]:
+	"""Push this owner's leases on `ids` out by SCHEDULER_LEASE_SECS (uncommitted); returns the ids still held."""
+	if not ids:
+		return set()
+	until = datetime.now(timezone.utc) + timedelta(seconds=settings.SCHEDULER_LEASE_SECS)
+	stmt = (
+		update(CampaignRecipient)
+		.where(CampaignRecipient.id.in_(ids), CampaignRecipient.lease_owner == owner)
+		.values(lease_expires_at=until)
+		.execution_options(synchronize_session=False)
+	)
+	if db.get_bind().dialect.update_returning:
+		return set((await db.execute(stmt.returning(CampaignRecipient.id))).scalars())
+	await db.execute(stmt)
+	return set((await db.execute(
+		select(CampaignRecipient.id).where(CampaignRecipient.lease_owner == owner, CampaignRecipient.lease_expires_at == until)
+	)).scalars())
+
+
+async def renew_leases(db: AsyncSession, owner: str, ids: List[int]) -> set[int]:
+	"""Extend this owner's leases on `ids` and commit; returns the ids still held."""
+	held = await _restamp(db, owner, ids)
+	await db.commit()
+	return held
+
+
+class LeaseGuard:
+	"""This worker's view of one claim: the ids it still holds, and until when that is certain.
+
+	A lease renewed at time t cannot be taken before t + SCHEDULER_LEASE_SECS; the
+	guard stops trusting it one heartbeat interval earlier, so a send that starts
+	while holds() is true finishes before anyone else may claim the row.
+	"""
+
+	def __init__(self, ids: List[int], claimed_at: float) -> None:
+		self.held = set(ids)
+		self.valid_until = claimed_at + self._margin()
+
+	@staticmethod
+	def _margin() -> float:
+		lease = settings.SCHEDULER_LEASE_SECS
+		return max(lease - settings.SCHEDULER_HEARTBEAT_SECS, lease / 2)
+
+	def renewed(self, held: set[int], started: float) -> None:
+		self.held &= held
+		self.valid_until = started + self._margin()
+
+	def holds(self, recipient_id: int) -> bool:
+		return recipient_id in self.held and time.monotonic() < self.valid_until
+
+
+@asynccontextmanager
+async def lease_heartbeat(owner: str, ids: List[int], claimed_at: float) -> AsyncIterator[LeaseGuard]:
+	"""Renew the leases on `ids` every SCHEDULER_HEARTBEAT_SECS while the block runs.
+
+	`claimed_at` is time.monotonic() from just before the claim; the yielded guard
+	tracks which leases are still safe to send under.
+	"""
+	guard = LeaseGuard(ids, claimed_at)
+	stop = asyncio.Event()
+
+	async def beat() -> None:
+		while True:
+			try:
+				await asyncio.wait_for(stop.wait(), timeout=settings.SCHEDULER_HEARTBEAT_SECS)
+				return
+			except asyncio.TimeoutError:
+				pass
+			try:
+				started = time.monotonic()
+				async with AsyncSessionLocal() as db:
+					held = await renew_leases(db, owner, ids)
+				guard.renewed(held, started)
+				if len(held) < len(ids):
+					logger.warning(f"⚠️ Scheduler worker {owner} lost {len(ids) - len(held)} of {len(ids)} recipient leases")
+			except Exception:
+				logger.exception(f"❌ Lease heartbeat failed for worker {owner}")
+
+	# Stopped via the event rather than cancelled, so a renewal in progress finishes cleanly
+	task = asyncio.create_task(beat())
+	try:
+		yield guard
+	finally:
+		stop.set()
+		await task
+
+
+async def seal_leases(db: AsyncSession, owner: str, ids: List[int]) -> set[int]:
+	"""Re-stamp this claim's leases on `ids` in the current transaction and return the ids still held.
+
+	The UPDATE locks the held rows (the write lock on SQLite) until the caller
+	commits, so no other worker can claim them between this check and the batch write.
+	"""
+	return await _restamp(db, owner, ids)
+
+
+async def release_all_leases(db: AsyncSession) -> int:
+	"""Clear every recipient lease (admin escape hatch); returns rows released."""
+	res = await db.execute(
+		update(CampaignRecipient)
+		.where(CampaignRecipient.lease_owner.is_not(None))
+		.values(lease_owner=None, lease_expires_at=None)
+		.execution_options(synchronize_session=False)
+	)
+	await db.commit()
+	return res.rowcount
@@ -0,0 +1,173 @@
+"""Hourly and daily campaign event rollups.
+
+Counters are bumped in the same transaction that writes the underlying
+CampaignRecipientEvent (scheduler sends, provider webhooks), so analytics read
+O(buckets) rows instead of scanning events. rebuild_rollups() recomputes them
+from campaign_recipient_events; run it with:
+
+    python -m app.services.campaigns.rollups [--campaign-id ID]
+"""
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import logging
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.campaign import CampaignRecipient
+from app.models.campaign_stats import CampaignStatsDaily, CampaignStatsHourly
+from app.models.email_tracking import CampaignRecipientEvent
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COUNTERS = ("sent", "delivered", "opened", "clicked", "replied", "bounced")
+# CampaignRecipientEvent.event_type (scheduler and provider webhook spellings) -> rollup counter
+EVENT_COUNTERS = {
+	"sent": "sent",
+	"delivered": "delivered",
+	"open": "opened",
+	"opened": "opened",
+	"click": "clicked",
+	"clicked": "clicked",
+	"reply": "replied",
+	"replied": "replied",
+	"bounce": "bounced",
+	"bounced": "bounced",
+}
+ROLLUP_MODELS = {"hour": CampaignStatsHourly, "day": CampaignStatsDaily}
+REBUILD_BATCH_SIZE = 5000
+
+# (campaign_id, step, variant_label, bucket)
+RollupKey = Tuple[int, int, str, datetime]
+
+
+class RollupEvent(NamedTuple):
+	campaign_id: int
+	step: Optional[int]
+	variant_label: Optional[str]
+	event_type: str
+	at: datetime
+
+
+def bucket_start(at: datetime, granularity: str) -> datetime:
+	"""UTC start of the hour/day containing `at` (naive datetimes are taken as UTC)."""
+	at = at.replace(tzinfo=timezone.utc) if at.tzinfo is None else at.astimezone(timezone.utc)
+	at = at.replace(minute=0, second=0, microsecond=0)
+	return at.replace(hour=0) if granularity == "day" else at
+
+
+def _aggregate(events: Iterable[RollupEvent], into: Optional[Dict[str, Dict[RollupKey, Counter]]] = None) -> Dict[str, Dict[RollupKey, Counter]]:
+	acc = into if into is not None else {g: {} for g in ROLLUP_MODELS}
+	for ev in events:
+		counter = EVENT_COUNTERS.get(ev.event_type)
+		if counter is None or ev.campaign_id is None:
+			continue
+		for granularity, rows in acc.items():
+			key = (ev.campaign_id, ev.step or 0, ev.variant_label or "", bucket_start(ev.at, granularity))
+			rows.setdefault(key, Counter())[counter] += 1
+	return acc
+
+
+def _rows(counts: Dict[RollupKey, Counter]) -> List[dict]:
+	return [
+		{"campaign_id": k[0], "step": k[1], "variant_label": k[2], "bucket": k[3], **{c: n.get(c, 0) for c in ROLLUP_COUNTERS}}
+		for k, n in counts.items()
+	]
+
+
+def _upsert_stmt(dialect: str, table):
+	"""INSERT ... ON CONFLICT (key) DO UPDATE adding the new counts, or None where unsupported."""
+	if dialect == "postgresql":
+		from sqlalchemy.dialects.postgresql import insert as dialect_insert
+	elif dialect == "sqlite":
+		from sqlalchemy.dialects.sqlite import insert as dialect_insert
+	else:
+		return None
+	stmt = dialect_insert(table)
+	return stmt.on_conflict_do_update(
+		index_elements=["campaign_id", "step", "variant_label", "bucket"],
+		set_={c: table.c[c] + stmt.excluded[c] for c in ROLLUP_COUNTERS},
+	)
+
+
+async def record_rollup_events(db: AsyncSession, events: Iterable[RollupEvent]) -> None:
+	"""Add events to the hourly and daily rollups; call before committing the events themselves."""
+	acc = _aggregate(events)
+	dialect = db.get_bind().dialect.name
+	for granularity, counts in acc.items():
+		if not counts:
+			continue
+		table = ROLLUP_MODELS[granularity].__table__
+		rows = _rows(counts)
+		stmt = _upsert_stmt(dialect, table)
+		if stmt is not None:
+			await db.execute(stmt, rows)
+			continue
+		for row in rows:
+			key = [table.c.campaign_id == row["campaign_id"], table.c.step == row["step"], table.c.variant_label == row["variant_label"], table.c.bucket == row["bucket"]]
+			res = await db.execute(update(table).where(*key).values({c: table.c[c] + row[c] for c in ROLLUP_COUNTERS}))
+			if not res.rowcount:
+				await db.execute(insert(table), [row])
+
+
+def rebuild_rollups(conn: Connection, campaign_id: Optional[int] = None) -> int:
+	"""Recompute rollups from campaign_recipient_events (all campaigns, or one); returns events counted."""
+	stmt = (
+		select(
+			CampaignRecipientEvent.id,
+			CampaignRecipient.campaign_id,
+			CampaignRecipientEvent.step,
+			CampaignRecipientEvent.variant_label,
+			CampaignRecipientEvent.event_type,
+			CampaignRecipientEvent.created_at,
+		)
+		.join(CampaignRecipient, CampaignRecipient.id == CampaignRecipientEvent.recipient_id)
+		.where(CampaignRecipientEvent.event_type.in_(list(EVENT_COUNTERS)))
+	)
+	if campaign_id is not None:
+		stmt = stmt.where(CampaignRecipient.campaign_id == campaign_id)
+	acc: Dict[str, Dict[RollupKey, Counter]] = {g: {} for g in ROLLUP_MODELS}
+	counted, last_id = 0, 0
+	# Keyset batches by event id: works on any driver, including under AsyncConnection.run_sync
+	while True:
+		rows = conn.execute(
+			stmt.where(CampaignRecipientEvent.id > last_id).order_by(CampaignRecipientEvent.id).limit(REBUILD_BATCH_SIZE)
+		).all()
+		if not rows:
+			break
+		_aggregate((RollupEvent(*r[1:]) for r in rows if r.created_at is not None), acc)
+		counted += len(rows)
+		last_id = rows[-1].id
+	for granularity, model in ROLLUP_MODELS.items():
+		table = model.__table__
+		clear = delete(table)
+		if campaign_id is not None:
+			clear = clear.where(table.c.campaign_id == campaign_id)
+		conn.execute(clear)
+		rows = _rows(acc[granularity])
+		for i in range(0, len(rows), REBUILD_BATCH_SIZE):
+			conn.execute(insert(table), rows[i:i + REBUILD_BATCH_SIZE])
+	logger.info(f"🧮 Rebuilt campaign rollups from {counted} events" + (f" (campaign {campaign_id})" if campaign_id is not None else ""))
+	return counted
+
+
+async def _main(campaign_id: Optional[int]) -> None:
+	from app.core.db import engine, init_db
+
+	await init_db()
+	async with engine.begin() as conn:
+		await conn.run_sync(rebuild_rollups, campaign_id)
+	await engine.dispose()
+
+
+if __name__ == "__main__":
+	import argparse
+	import asyncio
+
+	parser = argparse.ArgumentParser(description="Rebuild campaign analytics rollups from recorded events")
+	parser.add_argument("--campaign-id", type=int, default=None, help="Only rebuild this campaign")
+	args = parser.parse_args()
+	logging.basicConfig(level=logging.INFO)
+	asyncio.run(_main(args.campaign_id))
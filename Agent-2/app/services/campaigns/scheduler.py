@@ -1,27 +1,32 @@
 from datetime import datetime, timezone
 from random import choices
-import asyncio
 from typing import Optional
+import logging
+import time
 
-from jinja2 import Environment, BaseLoader, select_autoescape
-from sqlalchemy import select
+from sqlalchemy import insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from app.core.db import AsyncSessionLocal
 from app.models.campaign import CampaignRecipient, Campaign, CampaignEmail, CampaignEmailVariant
 from app.models.email_tracking import EmailMessageLog, CampaignRecipientEvent
 from app.models.lead import Lead
 from app.services.email.base import email_service, EmailMessage
+from app.services.email.dispatch import SendJob, send_pool
 from app.core.config import settings
-from app.models.locks import SchedulerLock, SchedulerRun
+from app.models.locks import SchedulerRun
+from app.services.campaigns.rollups import RollupEvent, record_rollup_events
+from app.services.campaigns.analytics_cache import analytics_cache
+from app.services.campaigns.experiments import experiment_service
+from app.services.campaigns.leases import WORKER_ID, LeaseGuard, claim_due_recipients, lease_heartbeat, new_lease_token, seal_leases
+from app.services.campaigns.timer import send_timer
+from app.services.campaigns.templates import lead_context, render
 
-jinja_env = Environment(loader=BaseLoader(), autoescape=select_autoescape(["html", "xml"]))
+logger = logging.getLogger(__name__)
 
 async def render_template(template: Optional[str], context: dict) -> str:
-    if not template:
-        return ""
-    tmpl = jinja_env.from_string(template)
-    return tmpl.render(**context)
+	return render(template, context)
 
 async def pick_variant(email: CampaignEmail) -> CampaignEmailVariant | None:
 	if not email.variants:
@@ -30,104 +35,198 @@ async def pick_variant(email: CampaignEmail) -> CampaignEmailVariant | None:
 	weights = [max(v.weight, 1) for v in labels]
 	return choices(labels, weights, k=1)[0]
 
+async def _prefetch(
+	db: AsyncSession,
+	batch: list[CampaignRecipient],
+	campaigns: dict[int, Campaign],
+	leads: dict[int, Lead],
+	steps_by_campaign: dict[int, list[CampaignEmail]],
+) -> None:
+	"""Load campaigns, leads and ordered steps (with variants) for a batch of recipients in three IN queries.
+
+	Campaigns and steps already loaded by an earlier batch are reused, so a tick costs
+	O(batches) queries instead of several per recipient.
+	"""
+	campaign_ids = {r.campaign_id for r in batch} - campaigns.keys()
+	lead_ids = {r.lead_id for r in batch} - leads.keys()
+	if campaign_ids:
+		res = await db.execute(select(Campaign).where(Campaign.id.in_(campaign_ids)))
+		campaigns.update((c.id, c) for c in res.scalars())
+		res = await db.execute(
+			select(CampaignEmail)
+			.options(selectinload(CampaignEmail.variants))
+			.where(CampaignEmail.campaign_id.in_(campaign_ids))
+			.order_by(CampaignEmail.campaign_id, CampaignEmail.sequence_order)
+		)
+		for step in res.scalars():
+			steps_by_campaign.setdefault(step.campaign_id, []).append(step)
+	if lead_ids:
+		res = await db.execute(select(Lead).where(Lead.id.in_(lead_ids)))
+		leads.update((l.id, l) for l in res.scalars())
+
 async def send_due_emails_once() -> int:
-	"""Send due campaign emails once, return count sent."""
+	"""Claim and send due campaign emails in leased batches until none are left, return count sent."""
+	started = datetime.now(timezone.utc)
+	sent = failed = 0
+	after_id = 0
+	while True:
+		token = new_lease_token()
+		claimed_at = time.monotonic()
+		async with AsyncSessionLocal() as db:
+			ids = await claim_due_recipients(db, token, datetime.now(timezone.utc), after_id, max(1, settings.SCHEDULER_CLAIM_BATCH_SIZE))
+		if not ids:
+			break
+		# Keyset past this batch so rows skipped in it are not re-claimed in the same tick
+		after_id = ids[-1]
+		async with lease_heartbeat(token, ids, claimed_at) as guard:
+			batch_sent, batch_failed = await _send_batch(ids, token, guard)
+		sent += batch_sent
+		failed += batch_failed
+	async with AsyncSessionLocal() as db:
+		db.add(SchedulerRun(
+			owner_token=WORKER_ID,
+			run_started_at=started,
+			run_finished_at=datetime.now(timezone.utc),
+			sent_count=sent,
+			failed_count=failed,
+		))
+		await db.commit()
+	return sent
+
+async def _send_batch(ids: list[int], token: str, guard: LeaseGuard) -> tuple[int, int]:
+	"""Send one leased batch of recipients and release their leases; returns (sent, failed).
+
+	Each provider call first checks the heartbeat's guard, so nothing is sent under a
+	lease that may have lapsed. Recipient changes stay in memory (no autoflush) until
+	seal_leases confirms which rows this claim still holds; rows whose lease was lost
+	are discarded unwritten.
+	"""
 	now = datetime.now(timezone.utc)
-	# Cooperative DB-backed lock to avoid multi-instance duplication
-	lock_token = f"{now.timestamp()}"
-	from sqlalchemy import update
-	from datetime import timedelta
-	async with AsyncSessionLocal() as db_lock:
-		lock = await db_lock.get(SchedulerLock, "campaign_scheduler")
-		expires = now + timedelta(seconds=55)
-		owned = False
-		if not lock:
-			lock = SchedulerLock(name="campaign_scheduler", owner_token=lock_token, expires_at=expires)
-			db_lock.add(lock)
-			await db_lock.commit()
-			owned = True
-		else:
-			if not lock.expires_at or lock.expires_at <= now:
-				await db_lock.execute(update(SchedulerLock).where(SchedulerLock.name == "campaign_scheduler").values(owner_token=lock_token, expires_at=expires))
-				await db_lock.commit()
-				owned = True
-		if not owned:
-			return 0
 	async with AsyncSessionLocal() as db:
-		res = await db.execute(select(CampaignRecipient).where(CampaignRecipient.paused == False).where(CampaignRecipient.next_send_at <= now))
-		recipients = list(res.scalars().all())
-		sent = 0
-		failed = 0
-		run = SchedulerRun(owner_token=lock_token)
-		db.add(run)
-		for r in recipients:
-			campaign = await db.get(Campaign, r.campaign_id)
-			lead = await db.get(Lead, r.lead_id)
-			if not campaign or not lead:
-				continue
-			steps = await db.execute(select(CampaignEmail).where(CampaignEmail.campaign_id == campaign.id).order_by(CampaignEmail.sequence_order))
-			steps = list(steps.scalars().all())
-			if r.current_step >= len(steps):
-				r.paused = True
-				continue
-			email_step = steps[r.current_step]
-			variant = await pick_variant(email_step)
-			context = {"lead": lead.__dict__, "campaign": {"offer": campaign.offer}}
-			subject = await render_template((variant and variant.subject_template) or email_step.subject_template, context)
-			body = await render_template((variant and variant.body_template) or email_step.body_template, context)
-			# Basic rate limiting
-			await asyncio.sleep(max(0.0, 1.0 / max(1, settings.EMAIL_RATE_PER_SEC)))
-			attempts = 0
-			provider_id: str | None = None
-			last_err: Exception | None = None
-			while attempts < max(1, settings.EMAIL_MAX_RETRIES):
-				try:
-					results = await email_service.send([EmailMessage(to=r.email, subject=subject or "", body=body or "")])
-					provider_id = results and results[0][0]
-					break
-				except Exception as e:
-					last_err = e
-					await asyncio.sleep(settings.EMAIL_RETRY_BACKOFF_SECS * (2 ** attempts))
-					attempts += 1
-			if last_err:
-				# Log failure
-				log = EmailMessageLog(
-					recipient_id=r.id,
-					lead_id=r.lead_id,
-					provider=None,
-					provider_message_id=None,
-					status="failed",
-					error=str(last_err),
-					metadata={"to": r.email, "campaign_id": r.campaign_id, "subject": subject},
-					subject=subject or None,
-				)
-				db.add(log)
-				# Defer next retry after failure
-				from datetime import timedelta
-				r.next_send_at = now + timedelta(minutes=settings.EMAIL_FAILURE_DEFERRAL_MINUTES)
-				r.last_sent_at = now
-				failed += 1
-				continue
-			# Record send success in logs and recipient events
-			log = EmailMessageLog(
+		with db.no_autoflush:
+			return await _send_leased(db, ids, token, guard, now)
+
+async def _send_leased(db: AsyncSession, ids: list[int], token: str, guard: LeaseGuard, now: datetime) -> tuple[int, int]:
+	"""Body of _send_batch, run with autoflush off."""
+	res = await db.execute(
+		select(CampaignRecipient)
+		.where(CampaignRecipient.id.in_(ids), CampaignRecipient.lease_owner == token)
+		.order_by(CampaignRecipient.id)
+	)
+	recipients = list(res.scalars().all())
+	sent = 0
+	failed = 0
+	rollup_events: list[RollupEvent] = []
+	campaigns: dict[int, Campaign] = {}
+	leads: dict[int, Lead] = {}
+	steps_by_campaign: dict[int, list[CampaignEmail]] = {}
+	# Logs and events are written with one executemany each; ORM adds insert row by row on SQLite
+	log_rows: list[dict] = []
+	event_rows: list[dict] = []
+	jobs: list[SendJob] = []
+	for i, r in enumerate(recipients):
+		if i % max(1, settings.SCHEDULER_PREFETCH_BATCH_SIZE) == 0:
+			await _prefetch(db, recipients[i:i + max(1, settings.SCHEDULER_PREFETCH_BATCH_SIZE)], campaigns, leads, steps_by_campaign)
+		campaign = campaigns.get(r.campaign_id)
+		lead = leads.get(r.lead_id)
+		if not campaign or not lead:
+			# Campaign or lead was deleted (SQLite does not cascade to recipients); stop sending to it
+			r.paused = True
+			continue
+		steps = steps_by_campaign.get(campaign.id, [])
+		if r.current_step >= len(steps):
+			r.paused = True
+			continue
+		email_step = steps[r.current_step]
+		variant = await pick_variant(email_step)
+		variant_label = variant.label if variant else None
+		r.variant_label = variant_label
+		context = {"lead": lead_context(lead), "campaign": {"offer": campaign.offer}}
+		subject = await render_template((variant and variant.subject_template) or email_step.subject_template, context)
+		body = await render_template((variant and variant.body_template) or email_step.body_template, context)
+		jobs.append(SendJob(EmailMessage(to=r.email, subject=subject or "", body=body or ""), ref=(r, email_step, variant_label, subject)))
+	# Concurrent, rate-limited dispatch; each send first checks the claim is still held
+	await send_pool.run(jobs, email_service.send, hold=lambda job: guard.holds(job.ref[0].id))
+	held = await seal_leases(db, token, [r.id for r in recipients])
+	lost = [r for r in recipients if r.id not in held]
+	if lost:
+		logger.warning(f"⚠️ Lost {len(lost)} recipient leases mid-batch; their sends are not recorded")
+		for r in lost:
+			db.expunge(r)
+		recipients = [r for r in recipients if r.id in held]
+	from datetime import timedelta
+	for job in jobs:
+		r, email_step, variant_label, subject = job.ref
+		if r.id not in held or job.skipped:
+			# Skipped sends leave the recipient due; the next claim sends it
+			continue
+		if not job.ok:
+			# Log failure
+			log_rows.append(dict(
 				recipient_id=r.id,
 				lead_id=r.lead_id,
-				provider=settings.EMAIL_PROVIDER,
-				provider_message_id=provider_id,
-				status="sent",
-				metadata={"to": r.email, "campaign_id": r.campaign_id, "subject": subject},
+				provider=None,
+				provider_message_id=None,
+				status="failed",
+				error=str(job.error),
+				meta={"to": r.email, "campaign_id": r.campaign_id, "subject": subject},
 				subject=subject or None,
-			)
-			db.add(log)
-			db.add(CampaignRecipientEvent(recipient_id=r.id, event_type="sent", payload={"subject": subject, "provider_id": provider_id}))
-			r.current_step += 1
+				step=email_step.sequence_order,
+				variant_label=variant_label,
+			))
+			# Hand the retry back to a later tick: exponential backoff, then the long deferral
+			r.send_failures = (r.send_failures or 0) + 1
+			if r.send_failures < max(1, settings.EMAIL_MAX_RETRIES):
+				r.next_send_at = now + timedelta(seconds=settings.EMAIL_RETRY_BACKOFF_SECS * 2 ** (r.send_failures - 1))
+			else:
+				r.next_send_at = now + timedelta(minutes=settings.EMAIL_FAILURE_DEFERRAL_MINUTES)
+				r.send_failures = 0
 			r.last_sent_at = now
-			from datetime import timedelta
-			r.next_send_at = now + timedelta(hours=email_step.send_delay_hours)
-			sent += 1
-		from datetime import datetime as dt_naive
-		run.sent_count = sent
-		run.failed_count = failed
-		run.run_finished_at = dt_naive.utcnow()
-		await db.commit()
-		return sent
+			failed += 1
+			continue
+		provider_id = job.provider_id
+		# Record send success in logs and recipient events
+		log_rows.append(dict(
+			recipient_id=r.id,
+			lead_id=r.lead_id,
+			provider=settings.EMAIL_PROVIDER,
+			provider_message_id=provider_id,
+			status="sent",
+			error=None,
+			meta={"to": r.email, "campaign_id": r.campaign_id, "subject": subject},
+			subject=subject or None,
+			step=email_step.sequence_order,
+			variant_label=variant_label,
+		))
+		event_rows.append(dict(
+			recipient_id=r.id,
+			event_type="sent",
+			payload={"subject": subject, "provider_id": provider_id},
+			step=email_step.sequence_order,
+			variant_label=variant_label,
+			created_at=now,
+		))
+		rollup_events.append(RollupEvent(r.campaign_id, email_step.sequence_order, variant_label, "sent", now))
+		r.current_step += 1
+		r.send_failures = 0
+		r.last_sent_at = now
+		r.next_send_at = now + timedelta(hours=email_step.send_delay_hours)
+		sent += 1
+	for r in recipients:
+		r.lease_owner = None
+		r.lease_expires_at = None
+	if log_rows:
+		await db.execute(insert(EmailMessageLog), log_rows)
+	if event_rows:
+		await db.execute(insert(CampaignRecipientEvent), event_rows)
+	await record_rollup_events(db, rollup_events)
+	await db.commit()
+	for r in recipients:
+		if not r.paused:
+			send_timer.schedule(r.next_send_at)
+	touched = {e.campaign_id for e in rollup_events}
+	analytics_cache.invalidate_campaigns(touched)
+	if touched:
+		bandits = await db.execute(select(Campaign.id).where(Campaign.id.in_(touched), Campaign.ab_bandit == True))
+		await experiment_service.rebalance_due(db, bandits.scalars().all())
+	return sent, failed
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import hashlib
+
+from jinja2 import BaseLoader, Environment, Template, TemplateSyntaxError, UndefinedError, select_autoescape
+from jinja2.sandbox import SandboxedEnvironment, SecurityError
+from sqlalchemy import inspect
+
+from app.core.config import settings
+from app.models.lead import Lead
+
+jinja_env = Environment(loader=BaseLoader(), autoescape=select_autoescape(["html", "xml"]))
+# Same syntax and escaping, but refuses unsafe attribute access; used to vet templates when they are saved
+sandbox_env = SandboxedEnvironment(loader=BaseLoader(), autoescape=select_autoescape(["html", "xml"]))
+
+
+class TemplateCache:
+	"""Bounded LRU of compiled templates keyed by a hash of their source.
+
+	Keying on content means an edited step or variant simply misses and compiles
+	its new text, with no version bookkeeping; identical texts share one entry.
+	"""
+
+	def __init__(self) -> None:
+		self._templates: "OrderedDict[str, Template]" = OrderedDict()
+		self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+	def get(self, source: str) -> Template:
+		key = hashlib.sha1(source.encode("utf-8")).hexdigest()
+		tmpl = self._templates.get(key)
+		if tmpl is not None:
+			self._templates.move_to_end(key)
+			self.stats["hits"] += 1
+			return tmpl
+		self.stats["misses"] += 1
+		tmpl = self._templates[key] = jinja_env.from_string(source)
+		while len(self._templates) > max(1, settings.TEMPLATE_CACHE_SIZE):
+			self._templates.popitem(last=False)
+			self.stats["evictions"] += 1
+		return tmpl
+
+	def clear(self) -> None:
+		self._templates.clear()
+
+	def snapshot(self) -> Dict[str, int]:
+		return {**self.stats, "entries": len(self._templates)}
+
+
+template_cache = TemplateCache()
+
+
+def render(template: Optional[str], context: dict) -> str:
+	if not template:
+		return ""
+	return template_cache.get(template).render(**context)
+
+
+@lru_cache(maxsize=1)
+def _lead_fields() -> Tuple[str, ...]:
+	return tuple(attr.key for attr in inspect(Lead).column_attrs)
+
+
+@lru_cache(maxsize=1)
+def _lead_samples() -> Tuple[Tuple[str, Any], ...]:
+	"""A value of each lead column's Python type, for trial renders."""
+	samples = []
+	for attr in inspect(Lead).column_attrs:
+		try:
+			kind = attr.columns[0].type.python_type
+		except NotImplementedError:
+			kind = str
+		if kind is datetime:
+			value: Any = datetime.now(timezone.utc)
+		elif kind is date:
+			value = date.today()
+		else:
+			try:
+				value = kind()
+			except TypeError:
+				value = ""
+		samples.append((attr.key, value))
+	return tuple(samples)
+
+
+def lead_context(lead: Lead) -> Dict[str, Any]:
+	"""Plain column values of a lead for templates (no ORM state or relationships)."""
+	return {key: getattr(lead, key) for key in _lead_fields()}
+
+
+def validate_template(source: Optional[str]) -> Optional[str]:
+	"""Compile and trial-render a template in the sandbox; returns an error message, or None if it is fine.
+
+	The trial render uses a sample value of each lead column's type. Only syntax,
+	sandbox and undefined-attribute errors are reported; other runtime errors depend
+	on the real lead's values (e.g. a None score), so they do not reject the template.
+	"""
+	if not source:
+		return None
+	try:
+		sandbox_env.from_string(source).render(lead=dict(_lead_samples()), campaign={"offer": ""})
+	except (TemplateSyntaxError, SecurityError, UndefinedError) as e:
+		line = getattr(e, "lineno", None)
+		return f"{e.__class__.__name__}: {e.message or e}" + (f" (line {line})" if line else "")
+	except Exception:
+		pass
+	return None
+
+
+def template_errors(fields: Iterable[Tuple[str, Optional[str]]]) -> List[Dict[str, str]]:
+	"""Validation errors for (field name, template) pairs, for a 422 response."""
+	errors = []
+	for field, source in fields:
+		error = validate_template(source)
+		if error:
+			errors.append({"field": field, "error": error})
+	return errors
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+from heapq import heappop, heappush
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import logging
+
+from sqlalchemy import or_, select
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.models.campaign import CampaignRecipient
+
+logger = logging.getLogger(__name__)
+
+
+def _utc(at: datetime) -> datetime:
+	return at.replace(tzinfo=timezone.utc) if at.tzinfo is None else at.astimezone(timezone.utc)
+
+
+class SendTimer:
+	"""In-process min-heap of upcoming next_send_at times that wakes the scheduler when one is due.
+
+	The heap holds the send times of unpaused recipients up to a horizon, loaded
+	in windows of SCHEDULER_WINDOW_SECS (at most SCHEDULER_WINDOW_MAX entries) via
+	the (paused, next_send_at) index. Enrollments and step advances in this process
+	feed it through schedule(), so a send due now fires immediately; times set by
+	other instances are picked up by the next window reload. Rows under a live
+	lease are left out, since their worker reschedules them. Only times are held:
+	a firing runs one scheduler tick, which claims whatever is due. Reloads and
+	scheduled times are never sooner than SCHEDULER_MIN_DELAY_SECS from now, so a
+	backlog of overdue rows cannot make the loop spin.
+	"""
+
+	def __init__(self) -> None:
+		self._heap: List[datetime] = []
+		self._horizon: Optional[datetime] = None
+		self._reload_at: Optional[datetime] = None
+		self._wakeup = asyncio.Event()
+		self.stats = {"ticks": 0, "reloads": 0, "scheduled": 0}
+
+	def schedule(self, at: Optional[datetime]) -> None:
+		"""Note that a recipient is due at `at`; times past the loaded horizon wait for the next reload.
+
+		Times at or before now are pushed out to SCHEDULER_MIN_DELAY_SECS from now.
+		"""
+		if at is None:
+			return
+		at = max(_utc(at), datetime.now(timezone.utc) + timedelta(seconds=settings.SCHEDULER_MIN_DELAY_SECS))
+		if self._horizon is None or at > self._horizon:
+			return
+		wake = not self._heap or at < self._heap[0]
+		heappush(self._heap, at)
+		self.stats["scheduled"] += 1
+		if wake:
+			self._wakeup.set()
+
+	async def _load_window(self, now: datetime) -> None:
+		window_end = now + timedelta(seconds=settings.SCHEDULER_WINDOW_SECS)
+		limit = max(1, settings.SCHEDULER_WINDOW_MAX)
+		async with AsyncSessionLocal() as db:
+			res = await db.execute(
+				select(CampaignRecipient.next_send_at)
+				.where(
+					CampaignRecipient.paused == False,
+					CampaignRecipient.next_send_at <= window_end,
+					or_(CampaignRecipient.lease_expires_at.is_(None), CampaignRecipient.lease_expires_at < now),
+				)
+				.order_by(CampaignRecipient.next_send_at)
+				.limit(limit)
+			)
+			times = [_utc(t) for t in res.scalars()]
+		# A full window only covers up to its last entry; reload when that is reached,
+		# but not before the minimum delay (a full window of overdue rows ends in the past)
+		self._horizon = times[-1] if len(times) >= limit else window_end
+		self._reload_at = max(min(self._horizon, window_end), now + timedelta(seconds=settings.SCHEDULER_MIN_DELAY_SECS))
+		self._heap = times  # already sorted, so a valid heap
+		self.stats["reloads"] += 1
+
+	async def run(self, tick: Callable[[], Awaitable[int]]) -> None:
+		"""Fire `tick` whenever a loaded send time comes due; reload the window as it runs out."""
+		while True:
+			now = datetime.now(timezone.utc)
+			if self._reload_at is None or now >= self._reload_at:
+				try:
+					await self._load_window(now)
+				except Exception:
+					logger.exception("❌ Loading scheduler window failed")
+					self._reload_at = now + timedelta(seconds=settings.SCHEDULER_WINDOW_SECS)
+			if self._heap and self._heap[0] <= now:
+				while self._heap and self._heap[0] <= now:
+					heappop(self._heap)
+				self.stats["ticks"] += 1
+				try:
+					await tick()
+				except Exception:
+					logger.exception("❌ Scheduler tick failed")
+				continue
+			wake_at = min(self._heap[0], self._reload_at) if self._heap else self._reload_at
+			self._wakeup.clear()
+			try:
+				await asyncio.wait_for(self._wakeup.wait(), timeout=max(0.0, (wake_at - now).total_seconds()))
+			except asyncio.TimeoutError:
+				pass
+
+	def snapshot(self) -> dict:
+		return {
+			**self.stats,
+			"pending": len(self._heap),
+			"next_due": self._heap[0].isoformat() if self._heap else None,
+			"horizon": self._horizon.isoformat() if self._horizon else None,
+		}
+
+
+send_timer = SendTimer()
@@ -1,10 +1,10 @@
 from typing import Mapping, Any
 
-import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
 logger = logging.getLogger(__name__)
 from app.core.config import settings
+from app.core.http import pooled_client
 from httpx import HTTPStatusError
 
 API_KEY = settings.HUBSPOT_API_KEY
@@ -16,7 +16,7 @@ class HubSpotClient:
 		if not API_KEY:
 			return
 		try:
-			async with httpx.AsyncClient(timeout=30) as client:
+			async with pooled_client(timeout=30) as client:
 				payload = {"properties": [{"property": k, "value": v} for k, v in properties.items() if v is not None]}
 				await client.post(
 					f"{BASE_URL}/contacts/v1/contact/createOrUpdate/email/{email}",
@@ -37,7 +37,7 @@ class HubSpotClient:
 		if not API_KEY:
 			return
 		try:
-			async with httpx.AsyncClient(timeout=30) as client:
+			async with pooled_client(timeout=30) as client:
 				resp = await client.get(
 					f"{BASE_URL}/contacts/v1/contact/email/{email}/profile",
 					params={"hapikey": API_KEY},
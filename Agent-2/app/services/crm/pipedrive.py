@@ -1,10 +1,10 @@
 from typing import Mapping, Any
 
-import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
 logger = logging.getLogger(__name__)
 from app.core.config import settings
+from app.core.http import pooled_client
 from httpx import HTTPStatusError
 
 API_TOKEN = settings.PIPEDRIVE_API_TOKEN or settings.PIPEDRIVE_API_KEY
@@ -15,7 +15,7 @@ class PipedriveClient:
 	async def upsert_contact(self, email: str, properties: Mapping[str, Any]) -> None:
 		if not API_TOKEN:
 			return
-		async with httpx.AsyncClient(timeout=30) as client:
+		async with pooled_client(timeout=30) as client:
 			try:
 				res = await client.get(f"{BASE_URL}/persons/search", params={"api_token": API_TOKEN, "term": email, "fields": "email"})
 				data = res.json() if res.status_code == 200 else {}
@@ -44,7 +44,7 @@ class PipedriveClient:
 	async def add_note(self, email: str, note: str) -> None:
 		if not API_TOKEN:
 			return
-		async with httpx.AsyncClient(timeout=30) as client:
+		async with pooled_client(timeout=30) as client:
 			try:
 				res = await client.get(f"{BASE_URL}/persons/search", params={"api_token": API_TOKEN, "term": email, "fields": "email"})
 				res.raise_for_status()
@@ -71,7 +71,7 @@ class PipedriveClient:
 	async def update_stage(self, email: str, stage: str) -> None:
 		if not API_TOKEN:
 			return
-		async with httpx.AsyncClient(timeout=30) as client:
+		async with pooled_client(timeout=30) as client:
 			try:
 				res = await client.get(f"{BASE_URL}/persons/search", params={"api_token": API_TOKEN, "term": email, "fields": "email"})
 				res.raise_for_status()
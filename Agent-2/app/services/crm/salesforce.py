@@ -1,8 +1,8 @@
 from typing import Mapping, Any
 
-import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 from app.core.config import settings
+from app.core.http import pooled_client
 
 CLIENT_ID = settings.SALESFORCE_CLIENT_ID
 CLIENT_SECRET = settings.SALESFORCE_CLIENT_SECRET
@@ -16,7 +16,7 @@ class SalesforceClient:
 	async def _get_token(self) -> tuple[str | None, str | None]:
 		if not (CLIENT_ID and CLIENT_SECRET and USERNAME and PASSWORD and TOKEN):
 			return None, None
-		async with httpx.AsyncClient(timeout=30) as client:
+		async with pooled_client(timeout=30) as client:
 			resp = await client.post(
 				"https://login.salesforce.com/services/oauth2/token",
 				data={
@@ -33,7 +33,7 @@ class SalesforceClient:
 
 	async def _find_contact(self, token: str, instance_url: str, email: str) -> str | None:
 		query = f"SELECT Id FROM Contact WHERE Email = '{email}' LIMIT 1"
-		async with httpx.AsyncClient(timeout=30) as client:
+		async with pooled_client(timeout=30) as client:
 			resp = await client.get(
 				f"{instance_url}/services/data/{API_VERSION}/query",
 				params={"q": query},
@@ -55,7 +55,7 @@ class SalesforceClient:
 			payload["LastName"] = properties["name"]
 		if properties.get("company"):
 			payload["AccountName"] = properties["company"]
-		async with httpx.AsyncClient(timeout=30, headers={"Authorization": f"Bearer {token}"}) as client:
+		async with pooled_client(timeout=30, headers={"Authorization": f"Bearer {token}"}) as client:
 			if contact_id:
 				await client.patch(f"{base}/services/data/{API_VERSION}/sobjects/Contact/{contact_id}", json=payload)
 			else:
@@ -81,7 +81,7 @@ class SalesforceClient:
 			"Description": note,
 			"WhoId": contact_id,
 		}
-		async with httpx.AsyncClient(timeout=30, headers={"Authorization": f"Bearer {token}"}) as client:
+		async with pooled_client(timeout=30, headers={"Authorization": f"Bearer {token}"}) as client:
 			await client.post(f"{base}/services/data/{API_VERSION}/sobjects/Task", json=payload)
 
 	@retry(stop=stop_after_attempt(3), wait=wait_exponential())
@@ -101,5 +101,5 @@ class SalesforceClient:
 			"Description": f"Updated stage to: {stage}",
 			"WhoId": contact_id,
 		}
-		async with httpx.AsyncClient(timeout=30, headers={"Authorization": f"Bearer {token}"}) as client:
+		async with pooled_client(timeout=30, headers={"Authorization": f"Bearer {token}"}) as client:
 			await client.post(f"{base}/services/data/{API_VERSION}/sobjects/Task", json=payload)
@@ -1,10 +1,10 @@
 from typing import Mapping, Any
 
-import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 import logging
 logger = logging.getLogger(__name__)
 from app.core.config import settings
+from app.core.http import pooled_client
 from httpx import HTTPStatusError
 
 ACCESS_TOKEN = settings.ZOHO_ACCESS_TOKEN or settings.ZOHO_API_KEY
@@ -26,7 +26,7 @@ class ZohoClient:
 			"trigger": ["workflow"],
 		}
 		try:
-			async with httpx.AsyncClient(timeout=30, headers={"Authorization": f"Zoho-oauthtoken {ACCESS_TOKEN}"}) as client:
+			async with pooled_client(timeout=30, headers={"Authorization": f"Zoho-oauthtoken {ACCESS_TOKEN}"}) as client:
 				await client.post(f"{BASE_URL}/Contacts/upsert", json=payload)
 		except HTTPStatusError as e:
 			status = e.response.status_code if e.response else None
@@ -49,7 +49,7 @@ class ZohoClient:
 			return
 		payload = {"data": [{"Note_Title": "Call Note", "Note_Content": note, "Parent_Id": contact_id, "se_module": "Contacts"}]}
 		try:
-			async with httpx.AsyncClient(timeout=30, headers={"Authorization": f"Zoho-oauthtoken {ACCESS_TOKEN}"}) as client:
+			async with pooled_client(timeout=30, headers={"Authorization": f"Zoho-oauthtoken {ACCESS_TOKEN}"}) as client:
 				await client.post(f"{BASE_URL}/Notes", json=payload)
 		except HTTPStatusError as e:
 			status = e.response.status_code if e.response else None
@@ -72,7 +72,7 @@ class ZohoClient:
 			return
 		payload = {"data": [{"id": contact_id, "Description": f"Stage: {stage}"}]}
 		try:
-			async with httpx.AsyncClient(timeout=30, headers={"Authorization": f"Zoho-oauthtoken {ACCESS_TOKEN}"}) as client:
+			async with pooled_client(timeout=30, headers={"Authorization": f"Zoho-oauthtoken {ACCESS_TOKEN}"}) as client:
 				await client.put(f"{BASE_URL}/Contacts", json=payload)
 		except HTTPStatusError as e:
 			status = e.response.status_code if e.response else None
@@ -87,7 +87,7 @@ class ZohoClient:
 		if not ACCESS_TOKEN:
 			return None
 		try:
-			async with httpx.AsyncClient(timeout=30, headers={"Authorization": f"Zoho-oauthtoken {ACCESS_TOKEN}"}) as client:
+			async with pooled_client(timeout=30, headers={"Authorization": f"Zoho-oauthtoken {ACCESS_TOKEN}"}) as client:
 				resp = await client.get(f"{BASE_URL}/Contacts/search", params={"email": email})
 				if resp.status_code == 204:
 					return None
@@ -1,4 +1,5 @@
 from typing import List, Tuple
+import asyncio
 import smtplib
 import ssl
 from email.mime.text import MIMEText
@@ -24,6 +25,10 @@ class EmailService:
 # Gmail SMTP implementation
 class GmailSMTPEmailService(EmailService):
 	async def send(self, messages: List[EmailMessage]) -> List[Tuple[str | None, str]]:
+		# smtplib blocks; run it off the event loop so concurrent sends overlap
+		return await asyncio.to_thread(self._send_sync, messages)
+
+	def _send_sync(self, messages: List[EmailMessage]) -> List[Tuple[str | None, str]]:
 		if not (settings.GMAIL_SMTP_API_KEY and settings.EMAIL_FROM):
 			raise RuntimeError("Gmail SMTP not configured; set GMAIL_SMTP_API_KEY and EMAIL_FROM")
 		
@@ -71,6 +76,10 @@ class GmailSMTPEmailService(EmailService):
 # SES implementation
 class SESEmailService(EmailService):
 	async def send(self, messages: List[EmailMessage]) -> List[Tuple[str | None, str]]:
+		# boto3 blocks; run it off the event loop so concurrent sends overlap
+		return await asyncio.to_thread(self._send_sync, messages)
+
+	def _send_sync(self, messages: List[EmailMessage]) -> List[Tuple[str | None, str]]:
 		import boto3
 		from botocore.config import Config as BotoConfig
 		if not (settings.SES_REGION and settings.EMAIL_FROM):
@@ -93,11 +102,11 @@ class SESEmailService(EmailService):
 # SendGrid implementation
 class SendGridEmailService(EmailService):
 	async def send(self, messages: List[EmailMessage]) -> List[Tuple[str | None, str]]:
-		import httpx
+		from app.core.http import pooled_client
 		if not (settings.SENDGRID_API_KEY and settings.EMAIL_FROM):
 			raise RuntimeError("SendGrid not configured; set SENDGRID_API_KEY and EMAIL_FROM")
 		results: List[Tuple[str | None, str]] = []
-		async with httpx.AsyncClient(timeout=30) as client:
+		async with pooled_client(timeout=30) as client:
 			for m in messages:
 				payload = {
 					"personalizations": [{"to": [{"email": m.to}]}],
@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+import asyncio
+import itertools
+import logging
+import time
+
+from app.core.config import settings
+from app.services.email.base import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+	"""Async token bucket: `rate` tokens per second, holding at most `burst`.
+
+	reserve() takes a token immediately and returns how long the caller must wait
+	before using it; the balance may go negative, which queues later callers behind
+	earlier ones without a lock. A rate <= 0 means unlimited.
+	"""
+
+	def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+		self.rate = float(rate)
+		self.capacity = max(1.0, float(burst or rate or 1))
+		self.tokens = self.capacity
+		self.updated = time.monotonic()
+
+	def _refill(self) -> None:
+		now = time.monotonic()
+		self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+
+	def reserve(self) -> float:
+		if self.rate <= 0:
+			return 0.0
+		self._refill()
+		self.tokens -= 1
+		return max(0.0, -self.tokens / self.rate)
+
+	async def acquire(self) -> None:
+		delay = self.reserve()
+		if delay:
+			await asyncio.sleep(delay)
+
+
+class KeyedTokenBuckets:
+	"""One TokenBucket per key (e.g. recipient domain), LRU-bounded."""
+
+	def __init__(self, rate: float, burst: Optional[float] = None, max_keys: int = 10000) -> None:
+		self.rate = rate
+		self.burst = burst
+		self.max_keys = max_keys
+		self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+	def get(self, key: str) -> TokenBucket:
+		bucket = self._buckets.get(key)
+		if bucket is None:
+			bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+			if len(self._buckets) > self.max_keys:
+				self._buckets.popitem(last=False)
+		else:
+			self._buckets.move_to_end(key)
+		return bucket
+
+
+def recipient_domain(address: str) -> str:
+	return address.rpartition("@")[2].strip().lower()
+
+
+@dataclass
+class SendJob:
+	message: EmailMessage
+	ref: Any = None  # caller's handle (e.g. the recipient), returned untouched
+	attempts: int = 0
+	provider_id: Optional[str] = None
+	error: Optional[Exception] = None
+	skipped: bool = False  # not sent: the caller's hold() check refused it
+
+	@property
+	def ok(self) -> bool:
+		return self.error is None
+
+
+@dataclass(order=True)
+class _Queued:
+	ready_at: float
+	seq: int
+	job: SendJob = field(compare=False)
+	paced: bool = field(default=False, compare=False)  # domain token already reserved for this slot
+
+
+class SendPool:
+	"""Bounded-concurrency sender paced by a provider-wide and a per-recipient-domain token bucket.
+
+	EMAIL_SEND_CONCURRENCY workers pull from a queue ordered by when each job may
+	go out. A job whose domain is over its rate reserves that domain's next token
+	and is re-queued for then, so one busy domain never holds a worker. Each job is
+	attempted once: a failure is left on the job for the caller to reschedule (the
+	scheduler defers the recipient), so no run waits out a retry backoff. Buckets
+	persist across runs, so the provider rate holds across scheduler ticks.
+	"""
+
+	def __init__(self) -> None:
+		self._provider: Optional[TokenBucket] = None
+		self._domains: Optional[KeyedTokenBuckets] = None
+		self.stats = {"sent": 0, "failed": 0, "skipped": 0, "domain_deferrals": 0}
+
+	def _limits(self) -> tuple[TokenBucket, KeyedTokenBuckets]:
+		rate, burst = settings.EMAIL_RATE_PER_SEC, settings.EMAIL_RATE_BURST or None
+		if self._provider is None or (self._provider.rate, self._provider.capacity) != (float(rate), max(1.0, float(burst or rate or 1))):
+			self._provider = TokenBucket(rate, burst)
+		domain_rate, domain_burst = settings.EMAIL_DOMAIN_RATE_PER_SEC, settings.EMAIL_DOMAIN_BURST or None
+		if self._domains is None or (self._domains.rate, self._domains.burst) != (domain_rate, domain_burst):
+			self._domains = KeyedTokenBuckets(domain_rate, domain_burst)
+		return self._provider, self._domains
+
+	async def run(self, jobs: List[SendJob], send, hold: Optional[Callable[[SendJob], bool]] = None) -> List[SendJob]:
+		"""Send every job through `send(messages)` (an EmailService.send); returns the jobs with results filled in.
+
+		When given, hold(job) is checked right before each provider call; a job it
+		refuses is marked skipped instead of sent.
+		"""
+		if not jobs:
+			return jobs
+		provider, domains = self._limits()
+		queue: "asyncio.PriorityQueue[_Queued]" = asyncio.PriorityQueue()
+		seq = itertools.count()
+		now = time.monotonic()
+		for job in jobs:
+			queue.put_nowait(_Queued(now, next(seq), job))
+
+		async def worker() -> None:
+			while True:
+				item = await queue.get()
+				try:
+					delay = item.ready_at - time.monotonic()
+					if delay > 0:
+						await asyncio.sleep(delay)
+					job = item.job
+					if not item.paced:
+						wait = domains.get(recipient_domain(job.message.to)).reserve()
+						if wait > 0:
+							self.stats["domain_deferrals"] += 1
+							queue.put_nowait(_Queued(time.monotonic() + wait, next(seq), job, paced=True))
+							continue
+					await provider.acquire()
+					if hold is not None and not hold(job):
+						job.skipped = True
+						self.stats["skipped"] += 1
+						continue
+					job.attempts += 1
+					try:
+						results = await send([job.message])
+						job.provider_id = results and results[0][0]
+						job.error = None
+						self.stats["sent"] += 1
+					except Exception as e:
+						job.error = e
+						self.stats["failed"] += 1
+						logger.warning(f"⚠️ Send to {job.message.to} failed: {e}")
+				finally:
+					queue.task_done()
+
+		workers = [asyncio.create_task(worker()) for _ in range(max(1, min(settings.EMAIL_SEND_CONCURRENCY, len(jobs))))]
+		try:
+			await queue.join()
+		finally:
+			for w in workers:
+				w.cancel()
+			await asyncio.gather(*workers, return_exceptions=True)
+		return jobs
+
+
+send_pool = SendPool()
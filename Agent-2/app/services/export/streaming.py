@@ -0,0 +1,183 @@
+from typing import Any, AsyncIterator, List, Mapping, Optional, Sequence
+from datetime import datetime, timedelta, timezone
+import csv
+import importlib.util
+import io
+import json
+import logging
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, select
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.models.campaign import Campaign, CampaignRecipient
+from app.models.email_tracking import EmailMessageLog
+from app.models.lead import Lead
+from app.models.lead_score import LeadScore
+from app.services.leads.listing import filtered_leads
+
+logger = logging.getLogger(__name__)
+
+# Parquet output needs the optional `pyarrow` package
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+MEDIA_TYPES = {
+	"csv": "text/csv",
+	"ndjson": "application/x-ndjson",
+	"parquet": "application/vnd.apache.parquet",
+}
+
+LEAD_COLUMNS = [
+	Lead.id, Lead.name, Lead.email, Lead.company, Lead.role, Lead.linkedin_url, Lead.source,
+	Lead.company_size, Lead.industry, Lead.location, Lead.stage, Lead.created_at, Lead.updated_at,
+]
+
+
+def leads_export_stmt(filters: Mapping[str, Optional[str]]) -> Select:
+	"""Lead rows matching the leads grid's filters (the shared filtered_leads query), in id order."""
+	return filtered_leads(filters).with_only_columns(*LEAD_COLUMNS).order_by(Lead.id)
+
+
+def scores_export_stmt(filters: Mapping[str, Optional[str]], qualification_status: Optional[str] = None) -> Select:
+	stmt = leads_export_stmt(filters).add_columns(
+		LeadScore.company_size_score, LeadScore.industry_score, LeadScore.role_score,
+		LeadScore.location_score, LeadScore.engagement_score, LeadScore.email_quality_score,
+		LeadScore.total_score, LeadScore.qualification_status, LeadScore.updated_at.label("scored_at"),
+	).join(LeadScore, LeadScore.lead_id == Lead.id)
+	if qualification_status:
+		stmt = stmt.where(LeadScore.qualification_status == qualification_status)
+	return stmt
+
+
+def recipients_export_stmt(campaign_id: Optional[int] = None) -> Select:
+	stmt = select(
+		CampaignRecipient.id.label("recipient_id"), CampaignRecipient.campaign_id, Campaign.name.label("campaign_name"),
+		CampaignRecipient.lead_id, CampaignRecipient.email, CampaignRecipient.current_step, CampaignRecipient.variant_label,
+		CampaignRecipient.paused, CampaignRecipient.last_sent_at, CampaignRecipient.next_send_at,
+	).join(Campaign, Campaign.id == CampaignRecipient.campaign_id)
+	if campaign_id:
+		stmt = stmt.where(CampaignRecipient.campaign_id == campaign_id)
+	return stmt.order_by(CampaignRecipient.id)
+
+
+def messages_export_stmt(campaign_id: Optional[int] = None, days: Optional[int] = None) -> Select:
+	stmt = select(
+		EmailMessageLog.id.label("message_id"), CampaignRecipient.campaign_id, EmailMessageLog.recipient_id,
+		EmailMessageLog.lead_id, EmailMessageLog.provider, EmailMessageLog.provider_message_id, EmailMessageLog.status,
+		EmailMessageLog.subject, EmailMessageLog.error, EmailMessageLog.sent_at, EmailMessageLog.delivered_at,
+		EmailMessageLog.opened_at, EmailMessageLog.clicked_at, EmailMessageLog.replied_at, EmailMessageLog.bounced_at,
+		EmailMessageLog.complained_at, EmailMessageLog.created_at,
+	).outerjoin(CampaignRecipient, CampaignRecipient.id == EmailMessageLog.recipient_id)
+	if campaign_id:
+		stmt = stmt.where(CampaignRecipient.campaign_id == campaign_id)
+	if days:
+		stmt = stmt.where(EmailMessageLog.created_at >= datetime.now(timezone.utc) - timedelta(days=days))
+	return stmt.order_by(EmailMessageLog.id)
+
+
+def _cell(value: Any) -> Any:
+	return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_chunk(rows: Sequence[Sequence[Any]], header: Optional[List[str]] = None) -> bytes:
+	buf = io.StringIO()
+	writer = csv.writer(buf)
+	if header:
+		writer.writerow(header)
+	writer.writerows([[_cell(v) for v in row] for row in rows])
+	return buf.getvalue().encode("utf-8")
+
+
+def _ndjson_chunk(columns: List[str], rows: Sequence[Sequence[Any]]) -> bytes:
+	return "".join(json.dumps({c: _cell(v) for c, v in zip(columns, row)}, default=str) + "\n" for row in rows).encode("utf-8")
+
+
+class _ChunkSink:
+	"""Write-only file object that hands back whatever pyarrow wrote since the last drain."""
+
+	def __init__(self) -> None:
+		self._parts: List[bytes] = []
+		self._pos = 0
+		self.closed = False
+
+	def write(self, data) -> int:
+		b = bytes(data)
+		self._parts.append(b)
+		self._pos += len(b)
+		return len(b)
+
+	def tell(self) -> int:
+		return self._pos
+
+	def flush(self) -> None:
+		pass
+
+	def close(self) -> None:
+		self.closed = True
+
+	def drain(self) -> bytes:
+		out, self._parts = b"".join(self._parts), []
+		return out
+
+
+def _arrow_schema(stmt: Select):
+	"""Parquet schema from the SELECT's column types, so null-only batches still agree."""
+	import pyarrow as pa
+
+	fields = []
+	for col in stmt.selected_columns:
+		t = col.type
+		if isinstance(t, Boolean):
+			arrow = pa.bool_()
+		elif isinstance(t, Integer):
+			arrow = pa.int64()
+		elif isinstance(t, Float):
+			arrow = pa.float64()
+		elif isinstance(t, DateTime):
+			arrow = pa.timestamp("us", tz="UTC")
+		else:
+			arrow = pa.string()
+		fields.append(pa.field(col.key, arrow))
+	return pa.schema(fields)
+
+
+async def stream_export(stmt: Select, fmt: str, batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+	"""Stream a SELECT as CSV, NDJSON or Parquet chunks.
+
+	Rows come from a server-side cursor (`stream` + `yield_per`) and are encoded one
+	partition at a time, so memory stays bounded by the batch size rather than the
+	row count. Parquet emits one row group per partition. Opens its own session,
+	since the response body outlives the request's dependencies.
+	"""
+	batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+	columns = [c.key for c in stmt.selected_columns]
+	if fmt == "parquet":
+		import pyarrow as pa
+		import pyarrow.parquet as pq
+		sink = _ChunkSink()
+		schema = _arrow_schema(stmt)
+		writer = pq.ParquetWriter(sink, schema)
+	async with AsyncSessionLocal() as db:
+		result = await db.stream(stmt.execution_options(yield_per=batch_size))
+		first = True
+		async for partition in result.partitions(batch_size):
+			if fmt == "csv":
+				yield _csv_chunk(partition, columns if first else None)
+			elif fmt == "ndjson":
+				yield _ndjson_chunk(columns, partition)
+			else:
+				writer.write_table(pa.Table.from_pylist([dict(zip(columns, row)) for row in partition], schema=schema))
+				chunk = sink.drain()
+				if chunk:
+					yield chunk
+			first = False
+		if fmt == "csv" and first:
+			yield _csv_chunk([], columns)
+		if fmt == "parquet":
+			writer.close()
+			yield sink.drain()
+
+
+def export_filename(dataset: str, fmt: str) -> str:
+	return f"{dataset}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.{fmt}"
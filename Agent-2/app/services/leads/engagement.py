@@ -0,0 +1,121 @@
+from typing import Dict, Optional, Set
+import asyncio
+import logging
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.models.lead import Lead
+from app.models.lead_score import LeadQualification, LeadScore
+from app.services.leads.leaderboard import leaderboards
+from app.services.leads.scoring import lead_scoring_service
+
+logger = logging.getLogger(__name__)
+
+# Tracking event -> LeadQualification flag it sets
+ENGAGEMENT_FLAGS = {
+	"open": "email_opened",
+	"click": "email_clicked",
+	"reply": "email_replied",
+}
+
+
+class EngagementRescorer:
+	"""Incremental rescoring driven by open/click/reply tracking events.
+
+	Events are buffered per lead for SCORING_ENGAGEMENT_COALESCE_SECS, then flushed
+	together: qualification flags are set and only engagement_score, total_score and
+	qualification_status are recomputed from the stored components. A burst of
+	events for one lead costs one write. Leads without a score yet get a full score.
+	"""
+
+	def __init__(self) -> None:
+		self._pending: Dict[int, Set[str]] = {}
+		self._flush_task: Optional[asyncio.Task] = None
+		self.stats = {"events": 0, "flushes": 0, "leads_rescored": 0}
+
+	def record(self, lead_id: Optional[int], event: str) -> bool:
+		"""Buffer an engagement event; returns False for events that do not affect scoring."""
+		flag = ENGAGEMENT_FLAGS.get(event)
+		if not lead_id or not flag:
+			return False
+		self._pending.setdefault(lead_id, set()).add(flag)
+		self.stats["events"] += 1
+		if self._flush_task is None or self._flush_task.done():
+			self._flush_task = asyncio.create_task(self._flush_later())
+		return True
+
+	async def _flush_later(self) -> None:
+		# Events recorded while a flush runs find this task still alive, so keep going until none are left
+		while True:
+			await asyncio.sleep(settings.SCORING_ENGAGEMENT_COALESCE_SECS)
+			await self.flush()
+			if not self._pending:
+				return
+
+	async def flush(self) -> None:
+		pending, self._pending = self._pending, {}
+		if not pending:
+			return
+		try:
+			async with AsyncSessionLocal() as db:
+				await self._apply(db, pending)
+		except Exception:
+			logger.exception(f"❌ Engagement rescoring failed for {len(pending)} leads")
+			return
+		self.stats["flushes"] += 1
+		self.stats["leads_rescored"] += len(pending)
+
+	async def _apply(self, db, pending: Dict[int, Set[str]]) -> None:
+		lead_ids = list(pending)
+		quals = {q.lead_id: q for q in (await db.execute(select(LeadQualification).where(LeadQualification.lead_id.in_(lead_ids)))).scalars()}
+		scores = {s.lead_id: s for s in (await db.execute(select(LeadScore).where(LeadScore.lead_id.in_(lead_ids)).order_by(LeadScore.id))).scalars()}
+		# Lead rows are only needed to seed missing qualifications or fully score unscored leads
+		need_lead = [i for i in lead_ids if i not in quals or i not in scores]
+		leads = {l.id: l for l in (await db.execute(select(Lead).where(Lead.id.in_(need_lead)))).scalars()} if need_lead else {}
+		unscored, rescored = [], []
+		for lead_id, flags in pending.items():
+			qual = quals.get(lead_id)
+			if qual is None:
+				lead = leads.get(lead_id)
+				if lead is None:
+					continue
+				qual = LeadQualification(
+					lead_id=lead_id,
+					has_email=bool(lead.email),
+					has_linkedin=bool(lead.linkedin_url),
+					has_company_info=bool(lead.company),
+					has_role_info=bool(lead.role),
+					email_opened=False,
+					email_clicked=False,
+					email_replied=False,
+				)
+				db.add(qual)
+			for flag in flags:
+				setattr(qual, flag, True)
+			qual.is_qualified = lead_scoring_service._is_lead_qualified(qual)
+			qual.qualification_reason = lead_scoring_service._get_qualification_reason(qual)
+			score = scores.get(lead_id)
+			if score is None:
+				unscored.append(lead_id)
+				continue
+			score.engagement_score = lead_scoring_service._calculate_engagement_score(qual)
+			lead_scoring_service.apply_total(score)
+			rescored.append((lead_id, score.total_score, score.qualification_status))
+		await db.commit()
+		leaderboards.record_many(rescored)
+		for lead_id in unscored:
+			if lead_id in leads:
+				await lead_scoring_service.calculate_lead_score(leads[lead_id], db)
+
+	async def aclose(self) -> None:
+		if self._flush_task and not self._flush_task.done():
+			self._flush_task.cancel()
+		await self.flush()
+
+	def snapshot(self) -> Dict[str, int]:
+		return {**self.stats, "pending_leads": len(self._pending)}
+
+
+engagement_rescorer = EngagementRescorer()
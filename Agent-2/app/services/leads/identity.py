@@ -0,0 +1,30 @@
+from typing import Optional
+import re
+import urllib.parse
+
+_LINKEDIN_PROFILE_RE = re.compile(r"linkedin\.com/(in|pub|company|school)/([^/?#\s]+)")
+_SCHEME_RE = re.compile(r"^[a-z]+://(www\.)?")
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+	"""Canonical email identity: trimmed and lowercased."""
+	if not email:
+		return None
+	key = email.strip().lower()
+	return key or None
+
+
+def normalize_linkedin(url: Optional[str]) -> Optional[str]:
+	"""Canonical LinkedIn identity, e.g. `in/jane-doe` or `company/acme`.
+
+	Scheme, host variant (www., country subdomains), query string and trailing
+	slash are ignored. Non-profile URLs fall back to a scheme-less lowercased URL.
+	"""
+	if not url:
+		return None
+	value = urllib.parse.unquote(url.strip()).lower()
+	m = _LINKEDIN_PROFILE_RE.search(value)
+	if m:
+		return f"{m.group(1)}/{m.group(2)}"
+	value = _SCHEME_RE.sub("", value).split("#")[0].split("?")[0].rstrip("/")
+	return value or None
@@ -0,0 +1,156 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from datetime import datetime, timezone
+from itertools import islice
+import asyncio
+import csv
+import json
+import logging
+import os
+import tempfile
+
+from fastapi import UploadFile
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.models.lead_import import LeadImportJob, LeadImportError
+from app.schemas.lead import LeadCreate
+from app.services.leads.identity import normalize_email, normalize_linkedin
+from app.services.leads.upsert import SCRAPED_FIELDS, upsert_scraped_leads
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+# (row_number, parsed row or None, parse error or None)
+ParsedRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def detect_format(filename: Optional[str], explicit: Optional[str] = None) -> Optional[str]:
+	if explicit:
+		return explicit
+	return IMPORT_FORMATS.get(os.path.splitext(filename or "")[1].lower())
+
+
+async def spool_upload(file: UploadFile, chunk_size: int = 1 << 20) -> str:
+	"""Copy an upload to a temp file in fixed-size chunks; the background job reads it after the request ends."""
+	fd, path = tempfile.mkstemp(prefix="lead-import-", suffix=os.path.splitext(file.filename or "")[1])
+	with os.fdopen(fd, "wb") as out:
+		while chunk := await file.read(chunk_size):
+			await asyncio.to_thread(out.write, chunk)
+	return path
+
+
+def iter_rows(fh, fmt: str) -> Iterator[ParsedRow]:
+	"""Lazily parse CSV (header row required) or NDJSON; row numbers are 1-based data rows."""
+	if fmt == "csv":
+		for n, row in enumerate(csv.DictReader(fh), start=1):
+			yield n, row, None
+		return
+	n = 0
+	for line in fh:
+		if not line.strip():
+			continue
+		n += 1
+		try:
+			obj = json.loads(line)
+		except ValueError as e:
+			yield n, None, f"Invalid JSON: {e}"
+			continue
+		if isinstance(obj, dict):
+			yield n, obj, None
+		else:
+			yield n, None, "Expected a JSON object per line"
+
+
+def validate_row(raw: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+	"""Validate a raw row with LeadCreate; blank cells count as missing, unknown columns are ignored.
+
+	Returns None for rows without any lead field.
+	"""
+	cleaned = {}
+	for k, v in raw.items():
+		if k is None:
+			continue
+		key = str(k).strip().lower()
+		if isinstance(v, str):
+			v = v.strip() or None
+		if key in SCRAPED_FIELDS and v is not None:
+			cleaned[key] = v
+	if not cleaned:
+		return None
+	lead = LeadCreate.model_validate(cleaned)
+	values = lead.model_dump(exclude_none=True, include=SCRAPED_FIELDS)
+	values.setdefault("source", "import")
+	return values
+
+
+def _identities(values: Dict[str, Any]) -> List[tuple]:
+	keys = [("email", normalize_email(values.get("email"))), ("linkedin", normalize_linkedin(values.get("linkedin_url")))]
+	return [k for k in keys if k[1]]
+
+
+async def run_import(job_id: int, path: str) -> None:
+	"""Background job: stream-parse the spooled file and upsert it in LEAD_IMPORT_BATCH_SIZE batches.
+
+	Each batch commits together with the job's progress counters and that batch's
+	row errors, so GET /leads/import/{id} reflects progress while the job runs.
+	"""
+	seen: set[tuple] = set()
+	async with AsyncSessionLocal() as db:
+		job = await db.get(LeadImportJob, job_id)
+		if not job:
+			return
+		job.status = "running"
+		job.started_at = datetime.now(timezone.utc)
+		await db.commit()
+		try:
+			with open(path, "r", encoding="utf-8-sig", newline="") as fh:
+				rows = iter_rows(fh, job.format)
+				while True:
+					batch = await asyncio.to_thread(lambda: list(islice(rows, settings.LEAD_IMPORT_BATCH_SIZE)))
+					if not batch:
+						break
+					valid: List[Dict[str, Any]] = []
+					errors: List[LeadImportError] = []
+					for n, raw, parse_error in batch:
+						if parse_error:
+							errors.append(LeadImportError(job_id=job_id, row_number=n, error=parse_error))
+							continue
+						try:
+							values = validate_row(raw)
+						except ValidationError as e:
+							detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+							errors.append(LeadImportError(job_id=job_id, row_number=n, error=detail, data=raw))
+							continue
+						if values is None:
+							errors.append(LeadImportError(job_id=job_id, row_number=n, error="Row has no lead fields", data=raw))
+							continue
+						keys = _identities(values)
+						if any(k in seen for k in keys):
+							job.duplicate_rows += 1
+						seen.update(keys)
+						valid.append(values)
+					stats: Dict[str, int] = {}
+					if valid:
+						await upsert_scraped_leads(db, valid, overwrite=job.overwrite, stats=stats)
+					db.add_all(errors)
+					job.processed_rows += len(batch)
+					job.inserted_rows += stats.get("inserted", 0)
+					job.updated_rows += stats.get("updated", 0)
+					job.failed_rows += len(errors)
+					await db.commit()
+			job.status = "completed"
+		except Exception as e:
+			logger.exception(f"❌ Lead import {job_id} failed")
+			await db.rollback()
+			job = await db.get(LeadImportJob, job_id)
+			job.status = "failed"
+			job.error = str(e)
+		finally:
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+		job.finished_at = datetime.now(timezone.utc)
+		await db.commit()
+		logger.info(f"📥 Lead import {job_id} {job.status}: {job.processed_rows} rows, {job.inserted_rows} inserted, {job.updated_rows} updated, {job.failed_rows} failed")
@@ -0,0 +1,78 @@
+from functools import lru_cache
+from typing import Dict, Generic, Iterable, Mapping, Optional, TypeVar
+import re
+
+T = TypeVar("T")  # table values; compared to pick among several matches
+
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_text(value: Optional[str]) -> str:
+	"""Lowercase and collapse punctuation/whitespace runs to single spaces ("VP, Sales" -> "vp sales")."""
+	if not value:
+		return ""
+	return _NON_WORD_RE.sub(" ", value.lower()).strip()
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+	"""Regex for a keyword set, factored as a trie so matching cost does not grow with the keyword count.
+
+	At each node the longer continuation is tried first, so the match at a given
+	position is the longest keyword that also ends on a word boundary.
+	"""
+	trie: Dict[str, dict] = {}
+	for word in keywords:
+		node = trie
+		for ch in word:
+			node = node.setdefault(ch, {})
+		node[""] = {}
+
+	def build(node: Dict[str, dict]) -> str:
+		terminal = "" in node
+		branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+		if not branches:
+			return ""
+		body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+		if terminal:
+			return ("(?:" + body + ")?") if len(branches) == 1 else body + "?"
+		return body
+
+	return build(trie)
+
+
+class KeywordMatcher(Generic[T]):
+	"""Whole-word keyword lookup compiled into a single regex.
+
+	Keywords and inputs are compared after normalize_text, so "vp" matches
+	"VP, Sales" but not "SVP", and "cto" never matches inside "director". Where
+	keywords overlap ("vice president" vs "president") the longest is the match;
+	across separate matches the one with the highest value wins, ties going to the
+	earliest. Results are memoized per input string.
+	"""
+
+	def __init__(self, table: Mapping[str, T], memo_size: int = 4096) -> None:
+		self.table: Dict[str, T] = {}
+		for key, value in table.items():
+			norm = normalize_text(key)
+			if norm:
+				self.table[norm] = value
+		self._regex = (
+			re.compile(r"(?<![a-z0-9])(?:" + _trie_pattern(self.table) + r")(?![a-z0-9])") if self.table else None
+		)
+		self.match = lru_cache(maxsize=memo_size)(self._match)
+
+	def _match(self, text: Optional[str]) -> Optional[str]:
+		"""The matched keyword (normalized form), or None."""
+		norm = normalize_text(text)
+		if not norm or self._regex is None:
+			return None
+		best: Optional[str] = None
+		# finditer yields non-overlapping matches, each already the longest at its position
+		for m in self._regex.finditer(norm):
+			if best is None or self.table[m.group(0)] > self.table[best]:
+				best = m.group(0)
+		return best
+
+	def lookup(self, text: Optional[str], default: Optional[T] = None) -> Optional[T]:
+		key = self.match(text)
+		return self.table[key] if key is not None else default
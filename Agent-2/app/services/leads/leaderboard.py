@@ -0,0 +1,131 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+import time
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.lead_score import LeadScore
+from app.services.leads.listing import decode_token, encode_token
+
+QUALIFICATION_STATUSES = ("unqualified", "qualified", "hot")
+# Board holding every scored lead regardless of status
+ALL = "all"
+
+# (total_score, lead_id): leaderboard order is this key descending
+Key = Tuple[float, int]
+
+
+def encode_score_cursor(key: Key) -> str:
+	return encode_token({"s": key[0], "id": key[1]})
+
+
+def decode_score_cursor(token: str) -> Key:
+	payload = decode_token(token)
+	score, lead_id = payload.get("s"), payload.get("id")
+	if not isinstance(score, (int, float)) or not isinstance(lead_id, int):
+		raise ValueError("invalid cursor")
+	return float(score), lead_id
+
+
+class _Board:
+	"""Bounded top-K of (total_score, lead_id), kept sorted so the top N is a slice.
+
+	`complete` means no lead belonging on this board is missing from it (nothing
+	was ever evicted or left out). Once incomplete, only a prefix that is known to
+	be exact can be served; a new entry below the current minimum cannot be placed.
+	"""
+
+	def __init__(self, capacity: int, keys: List[Key], complete: bool) -> None:
+		self.capacity = capacity
+		self.keys = sorted(keys)  # ascending; the best entry is last
+		self.held: Dict[int, Key] = {k[1]: k for k in self.keys}
+		self.complete = complete
+		self.loaded_at = time.monotonic()
+
+	def discard(self, lead_id: int) -> None:
+		key = self.held.pop(lead_id, None)
+		if key is not None:
+			del self.keys[bisect_left(self.keys, key)]
+
+	def offer(self, key: Key) -> None:
+		if len(self.keys) >= self.capacity:
+			self.complete = False
+			if key <= self.keys[0]:
+				return
+			del self.held[self.keys.pop(0)[1]]
+		elif not self.complete and (not self.keys or key < self.keys[0]):
+			return
+		insort(self.keys, key)
+		self.held[key[1]] = key
+
+	def top(self, n: int) -> Optional[List[Key]]:
+		"""Best n keys (best first), or None when the board cannot answer exactly."""
+		if n > len(self.keys) and not self.complete:
+			return None
+		return self.keys[:-n - 1:-1] if n else []
+
+
+class Leaderboards:
+	"""In-process top-scored boards: one over all scored leads and one per qualification status.
+
+	Boards load lazily from the (total_score, lead_id) indexes and are updated in place
+	by every score write in this worker via record(). Writes from other workers are
+	picked up when a board reloads after LEADERBOARD_REFRESH_SECS.
+	"""
+
+	def __init__(self) -> None:
+		self._boards: Dict[str, _Board] = {}
+
+	def record(self, lead_id: int, total_score: float, status: str) -> None:
+		key = (float(total_score), lead_id)
+		for name, board in self._boards.items():
+			board.discard(lead_id)
+			if name == ALL or name == status:
+				board.offer(key)
+
+	def record_many(self, rows: Iterable[Tuple[int, float, str]]) -> None:
+		for lead_id, total_score, status in rows:
+			self.record(lead_id, total_score, status)
+
+	def forget(self, lead_ids: Iterable[int]) -> None:
+		for lead_id in lead_ids:
+			for board in self._boards.values():
+				board.discard(lead_id)
+
+	@staticmethod
+	def _stmt(status: Optional[str], after: Optional[Key], limit: int):
+		stmt = select(LeadScore.total_score, LeadScore.lead_id)
+		if status != ALL:
+			stmt = stmt.where(LeadScore.qualification_status == status)
+		if after is not None:
+			stmt = stmt.where(or_(
+				LeadScore.total_score < after[0],
+				and_(LeadScore.total_score == after[0], LeadScore.lead_id < after[1]),
+			))
+		return stmt.order_by(LeadScore.total_score.desc(), LeadScore.lead_id.desc()).limit(limit)
+
+	async def _load(self, db: AsyncSession, name: str) -> _Board:
+		capacity = settings.LEADERBOARD_SIZE
+		rows = (await db.execute(self._stmt(name, None, capacity))).all()
+		board = _Board(capacity, [(float(r.total_score), r.lead_id) for r in rows], complete=len(rows) < capacity)
+		self._boards[name] = board
+		return board
+
+	async def page(self, db: AsyncSession, status: str, limit: int, after: Optional[Key] = None) -> List[Key]:
+		"""Up to `limit` keys best first; the first page comes from memory, later pages by keyset."""
+		if after is None:
+			board = self._boards.get(status)
+			if board is None or time.monotonic() - board.loaded_at > settings.LEADERBOARD_REFRESH_SECS:
+				board = await self._load(db, status)
+			keys = board.top(limit)
+			if keys is None:
+				keys = (await self._load(db, status)).top(limit)
+			if keys is not None:
+				return keys
+		rows = (await db.execute(self._stmt(status, after, limit))).all()
+		return [(float(r.total_score), r.lead_id) for r in rows]
+
+
+leaderboards = Leaderboards()
@@ -0,0 +1,108 @@
+from typing import Any, Dict, Mapping, Optional
+import base64
+import json
+import time
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from app.core.config import settings
+from app.models.lead import Lead
+
+FILTER_COLUMNS = ("company_size", "role", "industry", "location")
+
+
+def filtered_leads(filters: Mapping[str, Optional[str]]) -> Select:
+	"""SELECT Lead with the equality filters the leads grid supports."""
+	stmt = select(Lead)
+	for name in FILTER_COLUMNS:
+		value = filters.get(name)
+		if value:
+			stmt = stmt.where(getattr(Lead, name) == value)
+	return stmt
+
+
+def encode_token(payload: Dict[str, Any]) -> str:
+	"""Opaque URL-safe page token for a keyset position."""
+	raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+	return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+	"""Inverse of encode_token; raises ValueError on tampered or malformed tokens."""
+	try:
+		padded = token + "=" * (-len(token) % 4)
+		payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+	except Exception as e:
+		raise ValueError("invalid cursor") from e
+	if not isinstance(payload, dict):
+		raise ValueError("invalid cursor")
+	return payload
+
+
+def encode_cursor(last_id: int) -> str:
+	"""Opaque next-page token for keyset pagination (newest first, by id)."""
+	return encode_token({"id": last_id})
+
+
+def decode_cursor(token: str) -> int:
+	"""Inverse of encode_cursor; raises ValueError on tampered or malformed tokens."""
+	value = decode_token(token).get("id")
+	if not isinstance(value, int):
+		raise ValueError("invalid cursor")
+	return value
+
+
+class LeadCountCache:
+	"""Per-filter-combination cache of lead totals for the X-Total-Count header.
+
+	Entries expire after LEAD_COUNT_CACHE_TTL_SECS and the whole cache is dropped
+	whenever a session flushes a Lead insert/delete or a change to a filter column,
+	so counts stay exact for writes made through the app.
+	"""
+
+	def __init__(self) -> None:
+		self._counts: Dict[tuple, tuple[float, int]] = {}
+		self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+	@staticmethod
+	def _key(filters: Mapping[str, Optional[str]]) -> tuple:
+		return tuple(filters.get(name) or None for name in FILTER_COLUMNS)
+
+	async def count(self, db: AsyncSession, filters: Mapping[str, Optional[str]]) -> int:
+		key = self._key(filters)
+		entry = self._counts.get(key)
+		if entry and entry[0] > time.monotonic():
+			self.stats["hits"] += 1
+			return entry[1]
+		self.stats["misses"] += 1
+		stmt = filtered_leads(filters).with_only_columns(func.count(Lead.id)).order_by(None)
+		total = (await db.execute(stmt)).scalar_one() or 0
+		if settings.LEAD_COUNT_CACHE_TTL_SECS > 0:
+			self._counts[key] = (time.monotonic() + settings.LEAD_COUNT_CACHE_TTL_SECS, total)
+		return total
+
+	def invalidate(self) -> None:
+		if self._counts:
+			self._counts.clear()
+		self.stats["invalidations"] += 1
+
+	def snapshot(self) -> Dict[str, Any]:
+		return {**self.stats, "entries": len(self._counts)}
+
+
+lead_counts = LeadCountCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_on_lead_writes(session: Session, _flush_context) -> None:
+	"""Unit-of-work writes; bulk INSERT statements call lead_counts.invalidate() themselves."""
+	if any(isinstance(o, Lead) for o in session.new) or any(isinstance(o, Lead) for o in session.deleted):
+		lead_counts.invalidate()
+		return
+	for obj in session.dirty:
+		if isinstance(obj, Lead) and any(inspect(obj).attrs[name].history.has_changes() for name in FILTER_COLUMNS):
+			lead_counts.invalidate()
+			return
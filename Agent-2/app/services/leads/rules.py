@@ -0,0 +1,164 @@
+from typing import Dict, Iterable, List, Optional
+import asyncio
+import logging
+import re
+import time
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.lead_score import ScoringRule, ScoringRuleVersion
+from app.services.leads.keywords import KeywordMatcher, normalize_text
+
+logger = logging.getLogger(__name__)
+
+RULE_SET = "lead_scoring"
+RULE_FIELDS = ("company_size", "industry", "role", "location")
+RULE_CONDITIONS = ("equals", "contains", "greater_than", "less_than")
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def parse_number(value: Optional[str]) -> Optional[float]:
+	"""First number in a value, ignoring thousands separators ("1,000+" -> 1000.0, "50-200" -> 50.0)."""
+	if not value:
+		return None
+	m = _NUMBER_RE.search(value.replace(",", ""))
+	return float(m.group(0)) if m else None
+
+
+class FieldPlan:
+	"""Compiled rules for one lead field.
+
+	Precedence: exact `equals` match, then the longest whole-word `contains`
+	keyword, then the best-scoring satisfied `greater_than`/`less_than` bound.
+	"""
+
+	def __init__(self, rules: Iterable[ScoringRule]) -> None:
+		self.equals: Dict[str, float] = {}
+		contains: Dict[str, float] = {}
+		self.greater: List[tuple[float, float]] = []
+		self.less: List[tuple[float, float]] = []
+		for rule in rules:
+			if rule.condition == "equals":
+				self.equals.setdefault(normalize_text(rule.value), rule.score)
+			elif rule.condition == "contains":
+				# Grouped by the matcher's normalized key so case/spacing variants resolve like `equals`
+				contains.setdefault(normalize_text(rule.value), rule.score)
+			else:
+				threshold = parse_number(rule.value)
+				if threshold is None:
+					logger.warning(f"⚠️ Scoring rule {rule.id} has non-numeric bound {rule.value!r}; skipped")
+					continue
+				(self.greater if rule.condition == "greater_than" else self.less).append((threshold, rule.score))
+		self.contains = KeywordMatcher(contains)
+
+	def score(self, value: Optional[str]) -> Optional[float]:
+		if not value:
+			return None
+		hit = self.equals.get(normalize_text(value))
+		if hit is not None:
+			return hit
+		hit = self.contains.lookup(value)
+		if hit is not None:
+			return hit
+		if self.greater or self.less:
+			number = parse_number(value)
+			if number is not None:
+				satisfied = [s for t, s in self.greater if number > t] + [s for t, s in self.less if number < t]
+				if satisfied:
+					return max(satisfied)
+		return None
+
+
+class ScoringPlan:
+	"""Immutable evaluation plan compiled from the active ScoringRule rows at one version."""
+
+	def __init__(self, version: int, rules: List[ScoringRule]) -> None:
+		self.version = version
+		self.rule_count = len(rules)
+		self.compiled_at = time.time()
+		self.fields: Dict[str, FieldPlan] = {}
+		for field in RULE_FIELDS:
+			field_rules = [r for r in rules if r.field == field and r.condition in RULE_CONDITIONS]
+			if field_rules:
+				self.fields[field] = FieldPlan(field_rules)
+		skipped = [r.id for r in rules if r.field not in RULE_FIELDS or r.condition not in RULE_CONDITIONS]
+		if skipped:
+			logger.warning(f"⚠️ Ignoring scoring rules with unsupported field/condition: {skipped}")
+
+	def score(self, field: str, value: Optional[str]) -> Optional[float]:
+		"""Score from the DB rules, or None when no rule for the field matches."""
+		plan = self.fields.get(field)
+		return plan.score(value) if plan else None
+
+
+class ScoringRuleEngine:
+	"""Keeps the compiled ScoringPlan in step with the scoring_rules table.
+
+	Workers share a version counter row (scoring_rule_versions) that every rule
+	write bumps. refresh() compares it at most every SCORING_RULES_CHECK_SECS and
+	recompiles only when it moved, so scoring itself never queries scoring_rules.
+	"""
+
+	def __init__(self) -> None:
+		# Version -1 never matches the stored counter, so the first refresh() always compiles
+		self._plan = ScoringPlan(-1, [])
+		self._checked_at = 0.0
+		self._lock = asyncio.Lock()
+
+	@property
+	def current(self) -> ScoringPlan:
+		return self._plan
+
+	async def refresh(self, db: AsyncSession) -> ScoringPlan:
+		if time.monotonic() - self._checked_at < settings.SCORING_RULES_CHECK_SECS:
+			return self._plan
+		async with self._lock:
+			if time.monotonic() - self._checked_at < settings.SCORING_RULES_CHECK_SECS:
+				return self._plan
+			version = (await db.execute(
+				select(ScoringRuleVersion.version).where(ScoringRuleVersion.name == RULE_SET)
+			)).scalar_one_or_none() or 0
+			if version != self._plan.version:
+				res = await db.execute(select(ScoringRule).where(ScoringRule.is_active == True).order_by(ScoringRule.id))
+				self._plan = ScoringPlan(version, list(res.scalars().all()))
+				logger.info(f"🧮 Compiled scoring plan v{version} from {self._plan.rule_count} active rules")
+			self._checked_at = time.monotonic()
+		return self._plan
+
+	async def bump_version(self, db: AsyncSession) -> None:
+		"""Mark the rule set changed; call in the same transaction as the rule write, then invalidate() after commit."""
+		dialect = db.get_bind().dialect.name
+		if dialect in ("postgresql", "sqlite"):
+			# Single upsert, so two first-ever edits cannot both try to insert the row
+			if dialect == "postgresql":
+				from sqlalchemy.dialects.postgresql import insert as dialect_insert
+			else:
+				from sqlalchemy.dialects.sqlite import insert as dialect_insert
+			stmt = dialect_insert(ScoringRuleVersion).values(name=RULE_SET, version=1)
+			await db.execute(stmt.on_conflict_do_update(
+				index_elements=[ScoringRuleVersion.name], set_={"version": ScoringRuleVersion.version + 1, "updated_at": func.now()},
+			))
+			return
+		res = await db.execute(
+			update(ScoringRuleVersion).where(ScoringRuleVersion.name == RULE_SET).values(version=ScoringRuleVersion.version + 1)
+		)
+		if not res.rowcount:
+			db.add(ScoringRuleVersion(name=RULE_SET, version=1))
+
+	def invalidate(self) -> None:
+		"""Force the next refresh() to check the shared version (this worker just wrote a rule)."""
+		self._checked_at = 0.0
+
+	def snapshot(self) -> Dict[str, object]:
+		return {
+			"version": self._plan.version,
+			"rule_count": self._plan.rule_count,
+			"fields": sorted(self._plan.fields),
+			"compiled_at": self._plan.compiled_at,
+		}
+
+
+scoring_rule_engine = ScoringRuleEngine()
@@ -1,13 +1,24 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, Mapping, Optional, Sequence
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import insert, select, update
 import logging
+import time
 
+import numpy as np
+
+from app.core.config import settings
 from app.models.lead import Lead
 from app.models.lead_score import LeadScore, ScoringRule, LeadQualification
+from app.services.leads.keywords import KeywordMatcher
+from app.services.leads.leaderboard import leaderboards
+from app.services.leads.listing import FILTER_COLUMNS
+from app.services.leads.rules import scoring_rule_engine
 
 logger = logging.getLogger(__name__)
 
+# Order of the component columns in the batch score matrix
+SCORE_COMPONENTS = ["company_size", "industry", "role", "location", "engagement", "email_quality"]
+
 class LeadScoringService:
     def __init__(self):
         # Default scoring weights
@@ -56,8 +67,33 @@ class LeadScoringService:
             }
         }
 
+        # Bumped whenever default_rules change; compiled matchers are rebuilt for the new version
+        self.rules_version = 1
+        self._matchers: Dict[str, tuple[int, KeywordMatcher]] = {}
+
+    def _matcher(self, category: str) -> KeywordMatcher:
+        """Compiled keyword matcher for a rule category, built once per rules_version."""
+        cached = self._matchers.get(category)
+        if cached and cached[0] == self.rules_version:
+            return cached[1]
+        table = {k: v for k, v in self.default_rules[category].items() if k != "other"}
+        matcher = KeywordMatcher(table)
+        self._matchers[category] = (self.rules_version, matcher)
+        return matcher
+
+    def _keyword_score(self, category: str, value: Optional[str]) -> float:
+        """Score from the compiled DB rule plan if a rule matches, else the best-scoring whole-word
+        default keyword in value, else the category's "other" score"""
+        if not value:
+            return 0.0
+        ruled = scoring_rule_engine.current.score(category, value)
+        if ruled is not None:
+            return ruled
+        return self._matcher(category).lookup(value, self.default_rules[category]["other"])
+
     async def calculate_lead_score(self, lead: Lead, db: AsyncSession) -> LeadScore:
         """Calculate comprehensive lead score"""
+        await scoring_rule_engine.refresh(db)
         
         # Get or create lead score record
         result = await db.execute(select(LeadScore).where(LeadScore.lead_id == lead.id))
@@ -78,24 +114,127 @@ class LeadScoringService:
         qualification = await self._get_qualification(lead.id, db)
         lead_score.engagement_score = self._calculate_engagement_score(qualification)
         
-        # Calculate total weighted score
-        lead_score.total_score = (
-            lead_score.company_size_score * self.weights["company_size"] +
-            lead_score.industry_score * self.weights["industry"] +
-            lead_score.role_score * self.weights["role"] +
-            lead_score.location_score * self.weights["location"] +
-            lead_score.engagement_score * self.weights["engagement"] +
-            lead_score.email_quality_score * self.weights["email_quality"]
-        )
-        
-        # Determine qualification status
-        lead_score.qualification_status = self._determine_qualification_status(lead_score.total_score)
+        # Calculate total weighted score and qualification status
+        self.apply_total(lead_score)
         
         await db.commit()
         await db.refresh(lead_score)
+        leaderboards.record(lead.id, lead_score.total_score, lead_score.qualification_status)
         
         return lead_score
 
+    def apply_total(self, lead_score: LeadScore) -> None:
+        """Recompute total_score and qualification_status from the stored component scores"""
+        lead_score.total_score = sum(
+            (getattr(lead_score, f"{c}_score") or 0.0) * self.weights[c] for c in SCORE_COMPONENTS
+        )
+        lead_score.qualification_status = self._determine_qualification_status(lead_score.total_score)
+
+    async def score_leads(
+        self,
+        db: AsyncSession,
+        lead_ids: Optional[Sequence[int]] = None,
+        filters: Optional[Mapping[str, Optional[str]]] = None,
+        batch_size: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Score many leads at once: by id list, by list_leads-style filters, or all leads.
+
+        Leads are walked in id order in batches. Each batch costs one SELECT for lead
+        attributes, one for qualification flags and one for existing score ids, then a
+        single executemany UPDATE and a single multi-row INSERT for the LeadScore rows.
+        Component scores are computed column-wise: each distinct attribute value is scored
+        once and broadcast with NumPy, and the weighted total is one matrix-vector product.
+        """
+        batch_size = batch_size or settings.SCORING_BATCH_SIZE
+        await scoring_rule_engine.refresh(db)
+        weights = np.array([self.weights[c] for c in SCORE_COMPONENTS], dtype=np.float64)
+        stats = {"scored": 0, "inserted": 0, "updated": 0, "batches": 0}
+        started = time.monotonic()
+        ids = sorted(set(lead_ids)) if lead_ids is not None else None
+        offset, last_id = 0, 0
+        while True:
+            stmt = select(Lead.id, Lead.company_size, Lead.industry, Lead.role, Lead.location, Lead.email)
+            if ids is not None:
+                if offset >= len(ids):
+                    break
+                stmt = stmt.where(Lead.id.in_(ids[offset:offset + batch_size])).order_by(Lead.id)
+                offset += batch_size
+            else:
+                for name in FILTER_COLUMNS:
+                    value = (filters or {}).get(name)
+                    if value:
+                        stmt = stmt.where(getattr(Lead, name) == value)
+                stmt = stmt.where(Lead.id > last_id).order_by(Lead.id).limit(batch_size)
+            rows = (await db.execute(stmt)).all()
+            if not rows:
+                if ids is not None:
+                    continue
+                break
+            batch_ids = [r.id for r in rows]
+            last_id = batch_ids[-1]
+
+            quals = {
+                q.lead_id: q
+                for q in (await db.execute(
+                    select(LeadQualification.lead_id, LeadQualification.email_opened, LeadQualification.email_clicked, LeadQualification.email_replied)
+                    .where(LeadQualification.lead_id.in_(batch_ids))
+                )).all()
+            }
+            existing = dict((await db.execute(
+                select(LeadScore.lead_id, LeadScore.id).where(LeadScore.lead_id.in_(batch_ids)).order_by(LeadScore.id)
+            )).all())
+
+            matrix = np.column_stack([
+                self._score_column([r.company_size for r in rows], self._calculate_company_size_score),
+                self._score_column([r.industry for r in rows], self._calculate_industry_score),
+                self._score_column([r.role for r in rows], self._calculate_role_score),
+                self._score_column([r.location for r in rows], self._calculate_location_score),
+                self._engagement_column([quals.get(i) for i in batch_ids]),
+                self._score_column([self._email_domain(r.email) for r in rows], self._calculate_domain_score),
+            ])
+            totals = matrix @ weights
+            statuses = np.select([totals >= 80, totals >= 60], ["hot", "qualified"], default="unqualified")
+
+            updates, inserts = [], []
+            for i, lead_id in enumerate(batch_ids):
+                values = {f"{c}_score": float(matrix[i, j]) for j, c in enumerate(SCORE_COMPONENTS)}
+                values["total_score"] = float(totals[i])
+                values["qualification_status"] = str(statuses[i])
+                if lead_id in existing:
+                    updates.append({"id": existing[lead_id], **values})
+                else:
+                    inserts.append({"lead_id": lead_id, **values})
+            if updates:
+                await db.execute(update(LeadScore), updates)
+            if inserts:
+                await db.execute(insert(LeadScore), inserts)
+            await db.commit()
+            leaderboards.record_many(zip(batch_ids, totals.tolist(), statuses.tolist()))
+
+            stats["scored"] += len(rows)
+            stats["updated"] += len(updates)
+            stats["inserted"] += len(inserts)
+            stats["batches"] += 1
+        stats["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+        logger.info(f"🧮 Batch scored {stats['scored']} leads in {stats['batches']} batches ({stats['elapsed_ms']} ms)")
+        return stats
+
+    @staticmethod
+    def _score_column(values: Sequence[Optional[str]], scorer: Callable[[Optional[str]], float]) -> np.ndarray:
+        """Score each distinct value once and broadcast back to the column."""
+        column = np.array([v or "" for v in values], dtype=object)
+        uniques, inverse = np.unique(column, return_inverse=True)
+        scored = np.array([scorer(u or None) for u in uniques], dtype=np.float64)
+        return scored[inverse.reshape(-1)]
+
+    @staticmethod
+    def _engagement_column(quals: Sequence[Any]) -> np.ndarray:
+        flags = np.array(
+            [(bool(q.email_opened), bool(q.email_clicked), bool(q.email_replied)) if q else (False, False, False) for q in quals],
+            dtype=np.float64,
+        ).reshape(-1, 3)
+        return np.minimum(flags @ np.array([30.0, 40.0, 100.0]), 100.0)
+
     async def qualify_lead(self, lead: Lead, db: AsyncSession) -> LeadQualification:
         """Qualify lead based on data completeness and engagement"""
         
@@ -127,54 +266,43 @@ class LeadScoringService:
         if not company_size:
             return 0.0
         
+        ruled = scoring_rule_engine.current.score("company_size", company_size)
+        if ruled is not None:
+            return ruled
         size_lower = company_size.lower()
         return self.default_rules["company_size"].get(size_lower, 50)
 
     def _calculate_industry_score(self, industry: Optional[str]) -> float:
         """Calculate score based on industry"""
-        if not industry:
-            return 0.0
-        
-        industry_lower = industry.lower()
-        for key, score in self.default_rules["industry"].items():
-            if key in industry_lower:
-                return score
-        return self.default_rules["industry"]["other"]
+        return self._keyword_score("industry", industry)
 
     def _calculate_role_score(self, role: Optional[str]) -> float:
         """Calculate score based on role"""
-        if not role:
-            return 0.0
-        
-        role_lower = role.lower()
-        for key, score in self.default_rules["role"].items():
-            if key in role_lower:
-                return score
-        return self.default_rules["role"]["other"]
+        return self._keyword_score("role", role)
 
     def _calculate_location_score(self, location: Optional[str]) -> float:
         """Calculate score based on location"""
-        if not location:
-            return 0.0
-        
-        location_lower = location.lower()
-        for key, score in self.default_rules["location"].items():
-            if key in location_lower:
-                return score
-        return self.default_rules["location"]["other"]
+        return self._keyword_score("location", location)
 
     def _calculate_email_quality_score(self, email: Optional[str]) -> float:
         """Calculate score based on email quality"""
         if not email:
             return 0.0
-        
+        return self._calculate_domain_score(self._email_domain(email))
+
+    @staticmethod
+    def _email_domain(email: Optional[str]) -> Optional[str]:
+        if not email or "@" not in email:
+            return None
+        return email.split("@")[-1].lower() or None
+
+    def _calculate_domain_score(self, domain: Optional[str]) -> float:
+        """Personal webmail domains score lower than business domains"""
         # Check for common business email patterns
         business_domains = [
             "gmail.com", "yahoo.com", "hotmail.com", "outlook.com"
         ]
         
-        domain = email.split("@")[-1].lower() if "@" in email else ""
-        
         if domain in business_domains:
             return 60  # Personal email
         elif domain:
@@ -253,10 +381,29 @@ class LeadScoringService:
         """Create a new scoring rule"""
         rule = ScoringRule(**rule_data)
         db.add(rule)
+        await scoring_rule_engine.bump_version(db)
         await db.commit()
+        scoring_rule_engine.invalidate()
         await db.refresh(rule)
         return rule
 
+    async def update_scoring_rule(self, rule: ScoringRule, changes: Dict[str, Any], db: AsyncSession) -> ScoringRule:
+        """Update a scoring rule and publish a new rule set version"""
+        for k, v in changes.items():
+            setattr(rule, k, v)
+        await scoring_rule_engine.bump_version(db)
+        await db.commit()
+        scoring_rule_engine.invalidate()
+        await db.refresh(rule)
+        return rule
+
+    async def delete_scoring_rule(self, rule: ScoringRule, db: AsyncSession) -> None:
+        """Delete a scoring rule and publish a new rule set version"""
+        await db.delete(rule)
+        await scoring_rule_engine.bump_version(db)
+        await db.commit()
+        scoring_rule_engine.invalidate()
+
 # Global instance
 lead_scoring_service = LeadScoringService()
 
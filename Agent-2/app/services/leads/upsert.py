@@ -0,0 +1,174 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from sqlalchemy import case, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.lead import Lead
+from app.models.scraping import LeadSource
+from app.services.leads.identity import normalize_email, normalize_linkedin
+from app.services.leads.listing import lead_counts
+
+SCRAPED_FIELDS = {"name", "email", "company", "role", "linkedin_url", "source", "company_size", "industry", "location"}
+
+
+def _insert_stmt(db: AsyncSession):
+	"""INSERT ... ON CONFLICT DO NOTHING on SQLite/Postgres, plain INSERT elsewhere.
+
+	No conflict target is given, so both unique identity indexes (email_key and
+	linkedin_key) act as arbiters.
+	"""
+	dialect = db.get_bind().dialect.name
+	if dialect == "postgresql":
+		from sqlalchemy.dialects.postgresql import insert as pg_insert
+		return pg_insert(Lead).on_conflict_do_nothing()
+	if dialect == "sqlite":
+		from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+		return sqlite_insert(Lead).on_conflict_do_nothing()
+	return insert(Lead)
+
+
+def _identity(p: Mapping[str, Any]) -> List[tuple[str, str]]:
+	keys = [("email_key", normalize_email(p.get("email"))), ("linkedin_key", normalize_linkedin(p.get("linkedin_url")))]
+	return [(f, v) for f, v in keys if v]
+
+
+async def upsert_scraped_leads(
+	db: AsyncSession,
+	records: Iterable[Mapping[str, Any]],
+	overwrite: bool = True,
+	stats: Optional[Dict[str, int]] = None,
+) -> List[Optional[Lead]]:
+	"""Set-based upsert of scraped records keyed on the canonical email, then LinkedIn identity.
+
+	Returns one entry per input record, in order (records sharing an identity map to
+	the same Lead); an entry is None when a concurrent writer's row for that identity
+	could not be re-read, e.g. it was deleted mid-race. With overwrite=False only
+	empty fields of existing leads are filled.
+	When given, stats["inserted"] and stats["updated"] are incremented by the number
+	of new and matched leads.
+	Costs one prefetch SELECT, one executemany UPDATE and one multi-row
+	INSERT ... RETURNING regardless of batch size. Flushes but does not commit, so
+	callers control the transaction.
+	"""
+	payloads: List[Dict[str, Any]] = [{k: v for k, v in r.items() if k in SCRAPED_FIELDS} for r in records]
+	if not payloads:
+		return []
+	identities = [_identity(p) for p in payloads]
+
+	# 1) Prefetch every existing lead matching the batch's identities in one query (index-only on the unique keys)
+	owners: Dict[tuple[str, str], Lead] = {}
+	email_keys = {v for ids in identities for f, v in ids if f == "email_key"}
+	linkedin_keys = {v for ids in identities for f, v in ids if f == "linkedin_key"}
+	if email_keys or linkedin_keys:
+		clauses = []
+		if email_keys:
+			clauses.append(Lead.email_key.in_(email_keys))
+		if linkedin_keys:
+			clauses.append(Lead.linkedin_key.in_(linkedin_keys))
+		res = await db.execute(select(Lead).where(or_(*clauses)))
+		for lead in res.scalars().all():
+			for f in ("email_key", "linkedin_key"):
+				if getattr(lead, f):
+					owners[(f, getattr(lead, f))] = lead
+
+	def _apply(lead: Lead, p: Mapping[str, Any]) -> None:
+		for k, v in p.items():
+			if v is None or (not overwrite and getattr(lead, k) is not None):
+				continue
+			if k in ("email", "linkedin_url"):
+				# Never move an identity onto a lead when another lead already owns it
+				f = "email_key" if k == "email" else "linkedin_key"
+				new_key = normalize_email(v) if k == "email" else normalize_linkedin(v)
+				holder = owners.get((f, new_key))
+				if holder is not None and holder is not lead:
+					continue
+				old_key = getattr(lead, f)
+				if old_key and old_key != new_key:
+					owners.pop((f, old_key), None)
+				owners[(f, new_key)] = lead
+			setattr(lead, k, v)
+
+	# 2) Merge updates into matched leads; the flush below batches them into one executemany UPDATE.
+	#    Unmatched records are grouped by identity (whichever key was seen first) so in-batch
+	#    duplicates insert once.
+	to_insert: Dict[Any, Dict[str, Any]] = {}
+	aliases: Dict[tuple, tuple] = {}
+	slots: List[Any] = []
+	for idx, (p, keys) in enumerate(zip(payloads, identities)):
+		existing = next((owners[k] for k in keys if k in owners), None)
+		if existing:
+			_apply(existing, p)
+			slots.append(existing)
+			continue
+		ident = next((aliases[k] for k in keys if k in aliases), keys[0] if keys else ("row", idx))
+		for k in keys:
+			aliases.setdefault(k, ident)
+		row = to_insert.setdefault(ident, {})
+		row.update({k: v for k, v in p.items() if v is not None or k not in row})
+		slots.append(ident)
+	await db.flush()
+
+	# 3) Insert new leads: rows without an identity in one plain multi-row INSERT (mapped back by
+	#    parameter order), identified rows in one INSERT ... ON CONFLICT DO NOTHING against the
+	#    unique identity indexes (mapped back by identity)
+	inserted: Dict[Any, Lead] = {}
+	if to_insert:
+		lead_counts.invalidate()
+
+	def _row(ident: Any) -> Dict[str, Any]:
+		row = {k: to_insert[ident].get(k) for k in SCRAPED_FIELDS}
+		row["email_key"] = normalize_email(row["email"])
+		row["linkedin_key"] = normalize_linkedin(row["linkedin_url"])
+		return row
+
+	def _claim(lead: Lead, apply: bool = False) -> None:
+		for f in ("email_key", "linkedin_key"):
+			value = getattr(lead, f)
+			ident = aliases.get((f, value)) if value else None
+			if ident and ident not in inserted:
+				inserted[ident] = lead
+				if apply:
+					_apply(lead, to_insert[ident])
+
+	raced: List[Any] = []
+	anonymous = [i for i in to_insert if i[0] == "row"]
+	if anonymous:
+		res = await db.scalars(insert(Lead).returning(Lead, sort_by_parameter_order=True), [_row(i) for i in anonymous])
+		inserted.update(zip(anonymous, res.all()))
+	identified = [i for i in to_insert if i[0] != "row"]
+	if identified:
+		res = await db.scalars(_insert_stmt(db).returning(Lead), [_row(i) for i in identified])
+		for lead in res.all():
+			_claim(lead)
+		missing = [i for i in identified if i not in inserted]
+		if missing:
+			# Lost a race with a concurrent writer; update the row it inserted instead
+			keys = [k for k, i in aliases.items() if i in missing]
+			res = await db.execute(select(Lead).where(or_(
+				Lead.email_key.in_([v for f, v in keys if f == "email_key"]),
+				Lead.linkedin_key.in_([v for f, v in keys if f == "linkedin_key"]),
+			)))
+			for lead in res.scalars().all():
+				_claim(lead, apply=True)
+			raced = [i for i in missing if i in inserted]
+			await db.flush()
+
+	if stats is not None:
+		matched = {id(slot) for slot in slots if isinstance(slot, Lead)}
+		stats["updated"] = stats.get("updated", 0) + len(matched) + len(raced)
+		stats["inserted"] = stats.get("inserted", 0) + len(inserted) - len(raced)
+	return [slot if isinstance(slot, Lead) else inserted.get(slot) for slot in slots]
+
+
+async def link_lead_sources(db: AsyncSession, run_id: int, leads: Iterable[Lead]) -> None:
+	"""Attach lead ids to a search run's LeadSource rows in a single UPDATE."""
+	email_ids = {l.email: l.id for l in leads if l.email}
+	linkedin_ids = {l.linkedin_url: l.id for l in leads if l.linkedin_url}
+	if not email_ids and not linkedin_ids:
+		return
+	lead_id = LeadSource.lead_id
+	if linkedin_ids:
+		lead_id = case(linkedin_ids, value=LeadSource.data["linkedin_url"].as_string(), else_=lead_id)
+	if email_ids:
+		lead_id = case(email_ids, value=LeadSource.data["email"].as_string(), else_=lead_id)
+	await db.execute(update(LeadSource).where(LeadSource.search_run_id == run_id).values(lead_id=lead_id))
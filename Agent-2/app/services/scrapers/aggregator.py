@@ -1,4 +1,5 @@
-from typing import Mapping, Any, Iterable, List, Dict, Set
+from typing import Mapping, Any, AsyncIterator, Callable, Iterable, List, Dict, Set
+import asyncio
 import logging
 
 from app.services.scrapers.providers.apollo import ApolloScraper
@@ -6,6 +7,9 @@ from app.services.scrapers.providers.crunchbase import CrunchbaseScraper
 from app.services.scrapers.providers.proxycurl import ProxycurlLinkedInScraper
 from app.services.scrapers.providers.serpapi_clutch import SerpapiClutchScraper
 from app.services.scrapers.providers.web_generic import WebGenericScraper
+from app.services.scrapers.cache import search_cache, cache_key
+from app.services.leads.identity import normalize_email, normalize_linkedin
+from app.services.leads.keywords import normalize_text
 from app.core.config import settings
 from app.core.db import AsyncSessionLocal
 from app.models.scraping import SearchRun, LeadSource
@@ -103,21 +107,30 @@ def generate_mock_leads(query: Mapping[str, Any], count: int = 5) -> List[Dict[s
 	
 	return results
 
-async def aggregate_search(query: Mapping[str, Any], providers: List[str] | None = None) -> tuple[List[Dict[str, Any]], int | None]:
-    """Aggregate search results from multiple lead scraping providers.
-    Returns (results, search_run_id).
-    """
-	
-	logger.info(f"🔍 Starting lead search with query: {query}")
-	
-	provider_map = {
+# Providers in priority order; dedup keeps the record from the highest-priority provider
+PROVIDER_PRIORITY = ["apollo", "crunchbase", "linkedin", "clutch", "web"]
+
+def dedup_key(n: Mapping[str, Any]) -> str:
+	# Same identities as the lead upsert, so provider merges agree with what gets persisted
+	email_key = normalize_email(n.get("email")) or ""
+	li_key = normalize_linkedin(n.get("linkedin_url")) or ""
+	company_key = normalize_text(n.get("company")) + "|" + normalize_text(n.get("role"))
+	return email_key or li_key or (company_key if company_key != "|" else "")
+
+def _priority(name: str) -> int:
+	return PROVIDER_PRIORITY.index(name) if name in PROVIDER_PRIORITY else len(PROVIDER_PRIORITY)
+
+def build_provider_map() -> Dict[str, Any]:
+	return {
 		"apollo": ApolloScraper(),
 		"crunchbase": CrunchbaseScraper(),
 		"linkedin": ProxycurlLinkedInScraper(),
 		"clutch": SerpapiClutchScraper(),
 		"web": WebGenericScraper(),
 	}
-	
+
+def select_providers(providers: List[str] | None, provider_map: Mapping[str, Any]) -> List[str]:
+	"""Resolve requested/configured/auto-detected providers into a deterministic priority order."""
 	# Check for explicitly configured providers
 	configured = set(filter(None, (settings.ENABLED_SCRAPERS or "").lower().split(",")))
 	logger.info(f"📋 Explicitly configured scrapers: {configured}")
@@ -146,105 +159,296 @@ async def aggregate_search(query: Mapping[str, Any], providers: List[str] | None
 	default_set = list(configured) if configured else []
 	selected = providers if providers is not None else default_set
 	
+	for name in selected:
+		if name not in provider_map:
+			logger.warning(f"❌ Unknown scraper: {name}")
+	# Deterministic order so dedup always prefers the same provider
+	return sorted(dict.fromkeys(n for n in selected if n in provider_map), key=_priority)
+
+async def _run_provider(scraper: Any, query: Mapping[str, Any], emit: Callable[[Dict[str, Any]], None], timeout: float) -> None:
+	"""Drain one provider through `emit`; records emitted before a timeout are kept."""
+	async def _consume() -> None:
+		async for rec in scraper.search(query):
+			emit(normalize(rec))
+	await asyncio.wait_for(_consume(), timeout=timeout)
+
+def _describe_failure(name: str, task: asyncio.Task, count: int) -> str | None:
+	"""Error message for a finished/cancelled provider task, or None if it succeeded."""
+	if task.cancelled():
+		return f"⏱️ Scraper {name} missed the {settings.SCRAPER_SEARCH_TIMEOUT_SECS:g}s search deadline (kept {count} partial results)"
+	e = task.exception()
+	if isinstance(e, asyncio.TimeoutError):
+		return f"⏱️ Scraper {name} timed out after {settings.SCRAPER_PROVIDER_TIMEOUT_SECS:g}s (kept {count} partial results)"
+	if e is not None:
+		logger.error(f"❌ Scraper {name} failed: {e}", exc_info=e)
+		return f"❌ Scraper {name} failed: {str(e)}"
+	return None
+
+async def _fan_out(selected: List[str], provider_map: Mapping[str, Any], query: Mapping[str, Any]) -> tuple[Dict[str, List[Dict[str, Any]]], List[str], List[str]]:
+	"""Run the selected providers (concurrently unless SCRAPER_CONCURRENT is off).
+	Returns (records per provider, providers that finished, error messages).
+	"""
+	provider_timeout = settings.SCRAPER_PROVIDER_TIMEOUT_SECS
+	search_timeout = settings.SCRAPER_SEARCH_TIMEOUT_SECS
+	sinks: Dict[str, List[Dict[str, Any]]] = {name: [] for name in selected}
+	tasks: Dict[str, asyncio.Task] = {}
+	errors: List[str] = []
+	successful: List[str] = []
+
+	if settings.SCRAPER_CONCURRENT:
+		for name in selected:
+			tasks[name] = asyncio.create_task(_run_provider(provider_map[name], query, sinks[name].append, provider_timeout))
+		pending = set()
+		if tasks:
+			_, pending = await asyncio.wait(tasks.values(), timeout=search_timeout)
+		for task in pending:
+			task.cancel()
+		if pending:
+			await asyncio.gather(*pending, return_exceptions=True)
+	else:
+		loop = asyncio.get_running_loop()
+		search_deadline = loop.time() + search_timeout
+		for name in selected:
+			remaining = search_deadline - loop.time()
+			tasks[name] = asyncio.create_task(_run_provider(provider_map[name], query, sinks[name].append, max(0.0, min(provider_timeout, remaining))))
+			await asyncio.gather(tasks[name], return_exceptions=True)
+
+	for name in selected:
+		error = _describe_failure(name, tasks[name], len(sinks[name]))
+		if error:
+			errors.append(error)
+		else:
+			successful.append(name)
+		logger.info(f"✅ Scraper {name} returned {len(sinks[name])} results")
+	return sinks, successful, errors
+
+async def _save_run(query: Mapping[str, Any], providers: List[str] | None, used: List[str], has_results: bool, errors: List[str], sources: List[tuple[str, Dict[str, Any]]] = ()) -> int:
+	"""Persist the provenance SearchRun (and optionally its LeadSource rows)."""
+	async with AsyncSessionLocal() as db:
+		run = SearchRun(query=dict(query), providers_requested={"requested": providers}, providers_used={"used": used})
+		if not has_results:
+			# Web provider also failed and REQUIRE_REAL_DATA=True; return empty (no mock)
+			logger.warning("⚠️ No results and REQUIRE_REAL_DATA=True; returning empty results")
+			errors = errors + ["no_results_real_data"]
+			run.status = "failed"
+		else:
+			run.status = "partial" if errors else "completed"
+		run.errors = {"errors": errors} if errors else None
+		db.add(run)
+		await db.flush()
+		db.add_all([LeadSource(search_run_id=run.id, provider=name, lead_id=None, data=n) for name, n in sources])
+		await db.commit()
+		return run.id
+
+async def aggregate_search(query: Mapping[str, Any], providers: List[str] | None = None, force_refresh: bool = False) -> tuple[List[Dict[str, Any]], int | None]:
+	"""Aggregate search results from multiple lead scraping providers.
+	Returns (results, search_run_id). Completed searches are cached per
+	normalized query + provider set; pass force_refresh=True to bypass the cache.
+	"""
+	
+	logger.info(f"🔍 Starting lead search with query: {query}")
+	
+	provider_map = build_provider_map()
+	selected = select_providers(providers, provider_map)
+	
+	# If no providers selected, use mock data only if not requiring real data
+	if not selected:
+		if not settings.REQUIRE_REAL_DATA:
+			logger.warning("⚠️ No scrapers available, using mock data")
+			return generate_mock_leads(query, count=25), None
+		logger.warning("⚠️ No scrapers available and real data required; falling back to 'web' provider")
+		selected = ["web"]
+	
 	logger.info(f"✅ Final selected scrapers: {selected}")
 	
-    # If no providers selected, use mock data only if not requiring real data
-    if not selected:
-		if settings.REQUIRE_REAL_DATA:
-			logger.warning("⚠️ No scrapers available and real data required; falling back to 'web' provider")
-			selected = ["web"]
-		logger.warning("⚠️ No scrapers available, using mock data")
-        return generate_mock_leads(query, count=25), None
+	key = cache_key(query, selected)
+	if search_cache.enabled:
+		if force_refresh:
+			search_cache.stats["forced_refreshes"] += 1
+		else:
+			cached = await search_cache.get(key)
+			if cached is not None:
+				logger.info(f"⚡ Search cache hit for providers {selected} ({len(cached[0])} results)")
+				return list(cached[0]), cached[1]
 	
-    results: List[Dict[str, Any]] = []
+	results: List[Dict[str, Any]] = []
+	sources: List[tuple[str, Dict[str, Any]]] = []
 	seen: Set[str] = set()
-	errors = []
-	successful_scrapers = []
-
-    # Begin provenance run
-    async with AsyncSessionLocal() as db:
-        run = SearchRun(query=dict(query), providers_requested={"requested": providers}, providers_used=None, status="completed")
-        db.add(run)
-        await db.flush()
 	
+	def _merge(name: str, records: Iterable[Dict[str, Any]]) -> None:
+		for n in records:
+			key = dedup_key(n)
+			if not key or key in seen:
+				continue
+			seen.add(key)
+			results.append(n)
+			sources.append((name, n))
+	
+	sinks, successful_scrapers, errors = await _fan_out(selected, provider_map, query)
 	for name in selected:
-		scraper = provider_map.get(name)
-		if not scraper:
-			logger.warning(f"❌ Unknown scraper: {name}")
-			continue
-		
-		logger.info(f"🚀 Running scraper: {name}")
-		try:
-			scraper_results = []
-			result_count = 0
-			
-			async for rec in scraper.search(query):
-				n = normalize(rec)
-				email_key = (n.get("email") or "").lower()
-				li_key = (n.get("linkedin_url") or "").lower()
-				company_key = ((n.get("company") or "") + "|" + (n.get("role") or "")).strip().lower()
-				key = email_key or li_key or company_key
-				if not key or key in seen:
-					continue
-				seen.add(key)
-				scraper_results.append(n)
-				result_count += 1
-			
-			logger.info(f"✅ Scraper {name} returned {result_count} results")
-            results.extend(scraper_results)
-			successful_scrapers.append(name)
-            # Persist sources
-            if scraper_results:
-                for n in scraper_results:
-                    await db.flush()
-                    db.add(LeadSource(search_run_id=run.id, provider=name, lead_id=None, data=n))
-			
-		except Exception as e:
-			error_msg = f"❌ Scraper {name} failed: {str(e)}"
-			logger.error(error_msg, exc_info=True)
-			errors.append(error_msg)
-	
-    # If no results from any scraper, try web provider when real data required; else optionally fall back to mock
+		_merge(name, sinks[name])
+	
+	# If no results from any scraper, try web provider when real data required; else optionally fall back to mock
+	used = list(selected)
+	mocked = False
 	if not results:
 		if settings.REQUIRE_REAL_DATA:
-			logger.warning("⚠️ No results from API scrapers; attempting 'web' provider for real data")
-			try:
-				web_scraper = provider_map.get("web")
-				if web_scraper:
-					async for rec in web_scraper.search(query):
-						n = normalize(rec)
-						email_key = (n.get("email") or "").lower()
-						li_key = (n.get("linkedin_url") or "").lower()
-						company_key = ((n.get("company") or "") + "|" + (n.get("role") or "")).strip().lower()
-						key = email_key or li_key or company_key
-						if not key or key in seen:
-							continue
-						seen.add(key)
-						results.append(n)
-			except Exception:
-				logger.debug("web_provider_fallback_failed", exc_info=True)
-			
-            # If web provider also fails and real data is required, return empty (no mock)
-            if not results:
-                logger.warning("⚠️ Web provider also failed and REQUIRE_REAL_DATA=True; returning empty results")
-                # finalize run and return empty
-                run.providers_used = {"used": selected + (["web"] if "web" not in selected else [])}
-                run.status = "failed"
-                run.errors = {"errors": errors + ["no_results_real_data"]}
-                await db.commit()
-                return [], run.id
+			if "web" not in selected:
+				logger.warning("⚠️ No results from API scrapers; attempting 'web' provider for real data")
+				used.append("web")
+				web_sinks, _, web_errors = await _fan_out(["web"], provider_map, query)
+				errors.extend(web_errors)
+				_merge("web", web_sinks["web"])
 		else:
 			logger.warning("⚠️ No results from any scraper, using mock data as fallback")
 			results = generate_mock_leads(query, count=15)
+			mocked = True
 	
-    # Finalize run
-    run.providers_used = {"used": selected}
-    run.status = "completed" if results else ("partial" if errors else "failed")
-    run.errors = {"errors": errors} if errors else None
-    await db.commit()
-
-    logger.info(f"🎉 Search complete - Total results: {len(results)}, Successful scrapers: {successful_scrapers}")
+	run_id = await _save_run(query, providers, used, bool(results), errors, sources)
+	
+	logger.info(f"🎉 Search complete - Total results: {len(results)}, Successful scrapers: {successful_scrapers}")
 	if errors:
 		logger.warning(f"⚠️ Scraper errors: {errors}")
+	elif results and not mocked and search_cache.enabled:
+		# Only complete searches with real provider results are cached, so a slow provider's miss is retried next time
+		await search_cache.set(key, (results, run_id), search_cache.ttl_for(used))
+	
+	return results, run_id
+
+async def _stream_providers(selected: List[str], provider_map: Mapping[str, Any], query: Mapping[str, Any], errors: List[str]) -> AsyncIterator[tuple[str, Dict[str, Any]]]:
+	"""Run providers concurrently and yield (provider, record) in arrival order, honouring both deadlines."""
+	loop = asyncio.get_running_loop()
+	search_deadline = loop.time() + settings.SCRAPER_SEARCH_TIMEOUT_SECS
+	queue: asyncio.Queue = asyncio.Queue()
+	counts = {name: 0 for name in selected}
+	tasks: Dict[str, asyncio.Task] = {}
+
+	def _emitter(name: str) -> Callable[[Dict[str, Any]], None]:
+		def _emit(n: Dict[str, Any]) -> None:
+			counts[name] += 1
+			queue.put_nowait((name, n))
+		return _emit
+
+	for name in selected:
+		task = asyncio.create_task(_run_provider(provider_map[name], query, _emitter(name), settings.SCRAPER_PROVIDER_TIMEOUT_SECS))
+		task.add_done_callback(lambda _t: queue.put_nowait(None))
+		tasks[name] = task
+	try:
+		remaining_tasks = len(tasks)
+		while remaining_tasks:
+			timeout = search_deadline - loop.time()
+			if timeout <= 0:
+				break
+			try:
+				item = await asyncio.wait_for(queue.get(), timeout=timeout)
+			except asyncio.TimeoutError:
+				break
+			if item is None:
+				remaining_tasks -= 1
+				continue
+			yield item
+		# Drain whatever was queued before the deadline hit
+		while not queue.empty():
+			item = queue.get_nowait()
+			if item is not None:
+				yield item
+	finally:
+		pending = [t for t in tasks.values() if not t.done()]
+		for task in pending:
+			task.cancel()
+		if pending:
+			await asyncio.gather(*pending, return_exceptions=True)
+	for name in selected:
+		error = _describe_failure(name, tasks[name], counts[name])
+		if error:
+			errors.append(error)
+		logger.info(f"✅ Scraper {name} streamed {counts[name]} results")
+
+async def _open_run(query: Mapping[str, Any], providers: List[str] | None, selected: List[str]) -> int:
+	async with AsyncSessionLocal() as db:
+		run = SearchRun(query=dict(query), providers_requested={"requested": providers}, providers_used={"used": selected}, status="running")
+		db.add(run)
+		await db.commit()
+		return run.id
+
+async def _close_run(run_id: int, used: List[str], has_results: bool, errors: List[str]) -> str:
+	async with AsyncSessionLocal() as db:
+		run = await db.get(SearchRun, run_id)
+		if not has_results:
+			errors = errors + ["no_results_real_data"]
+		run.providers_used = {"used": used}
+		run.status = "failed" if not has_results else ("partial" if errors else "completed")
+		run.errors = {"errors": errors} if errors else None
+		await db.commit()
+		return run.status
+
+async def stream_search(query: Mapping[str, Any], providers: List[str] | None = None, force_refresh: bool = False) -> AsyncIterator[Dict[str, Any]]:
+	"""Streaming variant of aggregate_search.
+
+	Yields one `{"type": "run"}` event with the search run id, then
+	`{"type": "lead", "provider", "lead"}` events as soon as a provider produces a new
+	(deduped) record, then one `{"type": "done"}` summary. Dedup here is by arrival order
+	rather than provider priority. LeadSource rows are left to the consumer, which knows
+	the lead ids once it has persisted each batch.
+	"""
+	logger.info(f"🔍 Starting streaming lead search with query: {query}")
+	provider_map = build_provider_map()
+	selected = select_providers(providers, provider_map)
+	if not selected:
+		if not settings.REQUIRE_REAL_DATA:
+			mock = generate_mock_leads(query, count=25)
+			yield {"type": "run", "search_run_id": None, "cached": False}
+			for n in mock:
+				yield {"type": "lead", "provider": "mock", "lead": n}
+			yield {"type": "done", "search_run_id": None, "count": len(mock), "status": "mock", "errors": []}
+			return
+		selected = ["web"]
+	
+	key = cache_key(query, selected)
+	if search_cache.enabled:
+		if force_refresh:
+			search_cache.stats["forced_refreshes"] += 1
+		else:
+			cached = await search_cache.get(key)
+			if cached is not None:
+				yield {"type": "run", "search_run_id": cached[1], "cached": True}
+				for n in cached[0]:
+					yield {"type": "lead", "provider": n.get("source"), "lead": n}
+				yield {"type": "done", "search_run_id": cached[1], "count": len(cached[0]), "status": "completed", "errors": []}
+				return
+	
+	run_id = await _open_run(query, providers, selected)
+	yield {"type": "run", "search_run_id": run_id, "cached": False}
+	
+	results: List[Dict[str, Any]] = []
+	seen: Set[str] = set()
+	errors: List[str] = []
+	used = list(selected)
+	rounds = [selected]
+	if settings.REQUIRE_REAL_DATA and "web" not in selected:
+		rounds.append(["web"])
+	for round_providers in rounds:
+		if results:
+			break
+		if round_providers is not selected:
+			logger.warning("⚠️ No results from API scrapers; attempting 'web' provider for real data")
+			used.append("web")
+		async for name, n in _stream_providers(round_providers, provider_map, query, errors):
+			key_ = dedup_key(n)
+			if not key_ or key_ in seen:
+				continue
+			seen.add(key_)
+			results.append(n)
+			yield {"type": "lead", "provider": name, "lead": n}
 	
-    return results, run.id
\ No newline at end of file
+	mocked = False
+	if not results and not settings.REQUIRE_REAL_DATA:
+		logger.warning("⚠️ No results from any scraper, using mock data as fallback")
+		results = generate_mock_leads(query, count=15)
+		mocked = True
+		for n in results:
+			yield {"type": "lead", "provider": "mock", "lead": n}
+	status = await _close_run(run_id, used, bool(results), errors)
+	if results and not mocked and not errors and search_cache.enabled:
+		await search_cache.set(key, (results, run_id), search_cache.ttl_for(used))
+	yield {"type": "done", "search_run_id": run_id, "count": len(results), "status": status, "errors": errors}
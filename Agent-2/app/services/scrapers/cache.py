@@ -0,0 +1,154 @@
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from typing import Any, Dict, Iterator, List, Mapping, Iterable
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CacheValue = tuple[List[Dict[str, Any]], int | None]
+
+
+def parse_provider_ttls(raw: str | None) -> Dict[str, float]:
+	"""Parse `apollo=86400,web=600` into {provider: seconds}."""
+	out: Dict[str, float] = {}
+	for part in filter(None, (raw or "").split(",")):
+		name, _, ttl = part.partition("=")
+		try:
+			out[name.strip().lower()] = float(ttl)
+		except ValueError:
+			logger.warning(f"⚠️ Ignoring invalid search cache TTL entry: {part}")
+	return out
+
+
+def cache_key(query: Mapping[str, Any], providers: Iterable[str]) -> str:
+	"""Stable key from the normalized query plus the provider set."""
+	norm = {
+		k: " ".join(str(v).lower().split())
+		for k, v in query.items()
+		if v is not None and str(v).strip()
+	}
+	raw = json.dumps({"q": norm, "p": sorted(set(providers))}, sort_keys=True)
+	return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SearchResultCache:
+	"""Two-tier cache for aggregate_search results.
+
+	An in-memory LRU sits in front of an optional SQLite file (SEARCH_CACHE_SQLITE_PATH)
+	so cached searches survive restarts. Entries expire after the shortest TTL among
+	the providers that produced them.
+	"""
+
+	def __init__(self) -> None:
+		self._memory: "OrderedDict[str, tuple[float, CacheValue]]" = OrderedDict()
+		self._db_ready = False
+		self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "forced_refreshes": 0, "stores": 0, "evictions": 0}
+
+	@property
+	def enabled(self) -> bool:
+		return settings.SEARCH_CACHE_ENABLED
+
+	def ttl_for(self, providers: Iterable[str]) -> float:
+		overrides = parse_provider_ttls(settings.SEARCH_CACHE_PROVIDER_TTLS)
+		ttls = [overrides.get(p, settings.SEARCH_CACHE_TTL_SECS) for p in providers]
+		return min(ttls) if ttls else settings.SEARCH_CACHE_TTL_SECS
+
+	# --- disk tier (stdlib sqlite3, run off the event loop) ---
+
+	@contextmanager
+	def _connect(self) -> Iterator[sqlite3.Connection]:
+		"""Connection that commits (or rolls back) and is closed when the block exits."""
+		with closing(sqlite3.connect(settings.SEARCH_CACHE_SQLITE_PATH)) as conn:
+			if not self._db_ready:
+				conn.execute("CREATE TABLE IF NOT EXISTS search_cache (key TEXT PRIMARY KEY, expires_at REAL NOT NULL, run_id INTEGER, results TEXT NOT NULL)")
+				conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),))
+				conn.commit()
+				self._db_ready = True
+			with conn:
+				yield conn
+
+	def _disk_get(self, key: str) -> tuple[float, CacheValue] | None:
+		with self._connect() as conn:
+			row = conn.execute("SELECT expires_at, run_id, results FROM search_cache WHERE key = ?", (key,)).fetchone()
+		if not row or row[0] <= time.time():
+			return None
+		return row[0], (json.loads(row[2]), row[1])
+
+	def _disk_set(self, key: str, expires_at: float, value: CacheValue) -> None:
+		results, run_id = value
+		with self._connect() as conn:
+			conn.execute(
+				"INSERT OR REPLACE INTO search_cache (key, expires_at, run_id, results) VALUES (?, ?, ?, ?)",
+				(key, expires_at, run_id, json.dumps(results, default=str)),
+			)
+
+	def _disk_clear(self) -> None:
+		with self._connect() as conn:
+			conn.execute("DELETE FROM search_cache")
+
+	# --- public API ---
+
+	def _remember(self, key: str, expires_at: float, value: CacheValue) -> None:
+		self._memory[key] = (expires_at, value)
+		self._memory.move_to_end(key)
+		while len(self._memory) > max(1, settings.SEARCH_CACHE_MAX_ENTRIES):
+			self._memory.popitem(last=False)
+			self.stats["evictions"] += 1
+
+	async def get(self, key: str) -> CacheValue | None:
+		entry = self._memory.get(key)
+		if entry and entry[0] > time.time():
+			self._memory.move_to_end(key)
+			self.stats["memory_hits"] += 1
+			return entry[1]
+		if entry:
+			del self._memory[key]
+		if settings.SEARCH_CACHE_SQLITE_PATH:
+			try:
+				disk = await asyncio.to_thread(self._disk_get, key)
+			except Exception:
+				logger.debug("search_cache_disk_get_failed", exc_info=True)
+				disk = None
+			if disk:
+				self._remember(key, *disk)
+				self.stats["disk_hits"] += 1
+				return disk[1]
+		self.stats["misses"] += 1
+		return None
+
+	async def set(self, key: str, value: CacheValue, ttl: float) -> None:
+		if ttl <= 0:
+			return
+		expires_at = time.time() + ttl
+		self._remember(key, expires_at, value)
+		self.stats["stores"] += 1
+		if settings.SEARCH_CACHE_SQLITE_PATH:
+			try:
+				await asyncio.to_thread(self._disk_set, key, expires_at, value)
+			except Exception:
+				logger.debug("search_cache_disk_set_failed", exc_info=True)
+
+	async def clear(self) -> None:
+		self._memory.clear()
+		if settings.SEARCH_CACHE_SQLITE_PATH:
+			await asyncio.to_thread(self._disk_clear)
+
+	def snapshot(self) -> Dict[str, Any]:
+		lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+		hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+		return {
+			**self.stats,
+			"entries": len(self._memory),
+			"hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+			"disk_tier": bool(settings.SEARCH_CACHE_SQLITE_PATH),
+		}
+
+
+search_cache = SearchResultCache()
@@ -2,6 +2,7 @@ from typing import Mapping, Any, AsyncIterator
 import logging
 
 from app.core.config import settings
+from app.core.http import pooled_client
 
 logger = logging.getLogger(__name__)
 
@@ -50,7 +51,7 @@ class ApolloScraper:
 			"per_page": 20,
 		}
 		
-		async with httpx.AsyncClient(timeout=30) as client:
+		async with pooled_client(timeout=30) as client:
 			try:
 				# Try people search endpoint (free plan)
 				resp = await client.post(
@@ -1,8 +1,8 @@
 from typing import Mapping, Any, AsyncIterator, List
 
-import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 from app.core.config import settings
+from app.core.http import pooled_client
 from httpx import HTTPStatusError
 import logging
 logger = logging.getLogger(__name__)
@@ -17,7 +17,7 @@ class CrunchbaseScraper:
 	@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=8))
 	async def search(self, query: Mapping[str, Any]) -> AsyncIterator[Mapping[str, Any]]:
 		# Prefer API; gracefully fallback to web search if unavailable
-		async with httpx.AsyncClient(timeout=30, headers={"User-Agent": "Mozilla/5.0"}) as client:
+		async with pooled_client(timeout=30, headers={"User-Agent": "Mozilla/5.0"}) as client:
 			api_worked = False
 			if API_KEY:
 				try:
@@ -1,8 +1,8 @@
 from typing import Mapping, Any, AsyncIterator
 
-import httpx
 from tenacity import retry, stop_after_attempt, wait_exponential
 from app.core.config import settings
+from app.core.http import pooled_client
 from httpx import HTTPStatusError
 import logging
 logger = logging.getLogger(__name__)
@@ -24,7 +24,7 @@ class ProxycurlLinkedInScraper:
 			"current_company_num_employees_min": None,
 			"industry": query.get("industry"),
 		}
-		async with httpx.AsyncClient(timeout=30) as client:
+		async with pooled_client(timeout=30) as client:
 			try:
 				resp = await client.get(f"{BASE_URL}/search/person", headers=headers, params={k: v for k, v in params.items() if v})
 				resp.raise_for_status()
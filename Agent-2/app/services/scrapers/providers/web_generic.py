@@ -1,10 +1,11 @@
 from typing import Mapping, Any, AsyncIterator, List
 
-import httpx
 import re
 import urllib.parse
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+from app.core.http import pooled_client
+
 
 DDG_URL = "https://duckduckgo.com/html/"
 DDG_ALT = "https://r.jina.ai/http://duckduckgo.com/html/"
@@ -26,7 +27,7 @@ class WebGenericScraper:
 		# Prefer LinkedIn or company sites
 		terms.append("(site:linkedin.com OR site:about.me OR site:crunchbase.com OR site:clutch.co)")
 		q = " ".join(terms)
-		async with httpx.AsyncClient(timeout=30, headers={"User-Agent": "Mozilla/5.0"}) as client:
+		async with pooled_client(timeout=30, headers={"User-Agent": "Mozilla/5.0"}) as client:
 			try:
 				resp = await client.get(DDG_URL, params={"q": q})
 				resp.raise_for_status()
@@ -0,0 +1,98 @@
+"""Shared fixtures: a throwaway SQLite database and one event loop for the whole run.
+
+The app's engine is a module-level singleton bound to DATABASE_URL at import, so
+the URL is set here before anything from `app` is imported, and every test runs
+its coroutines on the same loop (aiosqlite connections are tied to it).
+"""
+from datetime import datetime, timedelta, timezone
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix="agent2-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_DIR}/test.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app.core.db import AsyncSessionLocal, Base, engine, init_db
+
+
+@pytest.fixture(scope="session")
+def loop():
+	loop = asyncio.new_event_loop()
+	yield loop
+	loop.run_until_complete(engine.dispose())
+	loop.close()
+
+
+@pytest.fixture
+def run(loop):
+	"""Run a coroutine to completion on the shared loop."""
+	return loop.run_until_complete
+
+
+@pytest.fixture
+def db(run):
+	"""Fresh schema (create_all + startup migrations) and an open session."""
+	async def reset():
+		async with engine.begin() as conn:
+			await conn.run_sync(Base.metadata.drop_all)
+		await init_db()
+
+	run(reset())
+	session = AsyncSessionLocal()
+	yield session
+	run(session.close())
+
+
+class FakeEmailService:
+	"""Records sent messages; addresses in `failing` raise instead."""
+
+	def __init__(self):
+		self.ids = itertools.count(1)
+		self.sent = []
+		self.failing = set()
+
+	async def send(self, messages):
+		results = []
+		for message in messages:
+			if message.to in self.failing:
+				raise RuntimeError(f"provider rejected {message.to}")
+			self.sent.append(message)
+			results.append((f"pm{next(self.ids)}", "ok"))
+		return results
+
+
+@pytest.fixture
+def email(monkeypatch):
+	from app.services.campaigns import scheduler
+
+	service = FakeEmailService()
+	monkeypatch.setattr(scheduler, "email_service", service)
+	return service
+
+
+@pytest.fixture
+def seed_campaign(run, db):
+	"""seed_campaign(n) -> campaign id: an active one-step campaign with n recipients due now."""
+	from app.models.campaign import Campaign, CampaignEmail, CampaignRecipient
+	from app.models.lead import Lead
+
+	async def seed(recipients):
+		campaign = Campaign(name="c", offer="o", status="active")
+		db.add(campaign)
+		await db.flush()
+		db.add(CampaignEmail(campaign_id=campaign.id, sequence_order=1, subject_template="Hi {{ lead.name }}", body_template="b", send_delay_hours=24))
+		due = datetime.now(timezone.utc) - timedelta(minutes=1)
+		for i in range(recipients):
+			lead = Lead(name=f"l{i}", email=f"l{i}@example.com")
+			db.add(lead)
+			await db.flush()
+			db.add(CampaignRecipient(campaign_id=campaign.id, lead_id=lead.id, email=lead.email, next_send_at=due, current_step=0, paused=False))
+		await db.commit()
+		return campaign.id
+
+	return lambda recipients=4: run(seed(recipients))
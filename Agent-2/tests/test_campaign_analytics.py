@@ -0,0 +1,39 @@
+from sqlalchemy import func, select
+
+from app.api.v1.routes import webhooks
+from app.models.campaign import CampaignRecipient
+from app.models.email_tracking import CampaignRecipientEvent, EmailMessageLog
+from app.services.campaigns import scheduler
+from app.services.campaigns.analytics import campaign_analytics_service
+from app.services.campaigns.analytics_cache import analytics_cache
+
+
+async def _log_based_counts(db, campaign_id):
+	"""sent/replied exactly as counted before the rollups: sent events and logs with status "replied"."""
+	recipient_ids = select(CampaignRecipient.id).where(CampaignRecipient.campaign_id == campaign_id)
+	sent = await db.scalar(select(func.count()).where(CampaignRecipientEvent.recipient_id.in_(recipient_ids), CampaignRecipientEvent.event_type == "sent"))
+	replied = await db.scalar(select(func.count()).where(EmailMessageLog.recipient_id.in_(recipient_ids), EmailMessageLog.status == "replied"))
+	return sent, replied
+
+
+def test_rollup_and_log_counts_agree_with_retried_webhooks(run, db, email, seed_campaign, monkeypatch):
+	monkeypatch.setattr(webhooks.engagement_rescorer, "record", lambda *a: True)
+	campaign_id = seed_campaign(4)
+	assert run(scheduler.send_due_emails_once()) == 4
+
+	# pm1 replies and the provider retries that webhook; pm2 replies once; pm3 only opens
+	for message_id, event in [("pm1", "reply"), ("pm1", "reply"), ("pm2", "reply"), ("pm3", "open")]:
+		run(webhooks.provider_event_webhook(webhooks.ProviderEvent(message_id=message_id, event=event), None, db))
+	analytics_cache.invalidate_campaigns([campaign_id])
+
+	sent, replied = run(_log_based_counts(db, campaign_id))
+	assert (sent, replied) == (4, 2)
+
+	metrics = run(campaign_analytics_service.get_campaign_performance(campaign_id, db))["metrics"]
+	assert metrics["emails_sent"] == sent
+	assert metrics["reply_rate"] == round(replied / sent * 100, 2)
+
+	overall = run(campaign_analytics_service.get_overall_analytics(db))
+	campaign = next(c for c in overall["all_campaigns"] if c["campaign_id"] == campaign_id)
+	assert (campaign["emails_sent"], campaign["replies"]) == (sent, replied)
+	assert overall["summary"]["total_replies"] == replied
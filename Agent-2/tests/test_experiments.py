@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+import math
+
+import numpy as np
+from sqlalchemy import select
+
+from app.models.campaign import CampaignRecipient
+from app.models.email_tracking import EmailMessageLog
+from app.services.campaigns.experiments import experiment_service, wilson_interval
+
+
+def test_wilson_interval():
+	low, high = wilson_interval(np.array([50.0, 0.0, 3.0]), np.array([100.0, 0.0, 3.0]), 1.96)
+	assert np.allclose(low, [0.4038, 0.0, 0.4385], atol=1e-4)
+	assert np.allclose(high, [0.5962, 0.0, 1.0], atol=1e-4)
+
+
+def test_funnel_counts_each_message_once_and_fills_skipped_stages(run, db, seed_campaign):
+	campaign_id = seed_campaign(5)
+	now = datetime.now(timezone.utc)
+
+	async def scenario():
+		recipients = list((await db.execute(select(CampaignRecipient).order_by(CampaignRecipient.id))).scalars())
+		logs = [
+			dict(variant_label="A", delivered_at=now),
+			dict(variant_label="A", clicked_at=now),  # click without open/delivery events
+			dict(variant_label="A", replied_at=now, status="replied"),
+			dict(variant_label="B"),
+			dict(variant_label="B", status="failed"),
+		]
+		for r, fields in zip(recipients, logs):
+			db.add(EmailMessageLog(recipient_id=r.id, lead_id=r.lead_id, step=1, **{"status": "sent", **fields}))
+		await db.commit()
+		return await experiment_service.funnel_counts(db, campaign_id)
+
+	rows = run(scenario())
+	assert rows == [
+		{"step": 1, "variant_label": "A", "sent": 3, "delivered": 3, "opened": 1, "clicked": 1, "replied": 1},
+		{"step": 1, "variant_label": "B", "sent": 1, "delivered": 0, "opened": 0, "clicked": 0, "replied": 0},
+	]
+
+
+def test_funnel_stats_tests_each_variant_against_the_step_control():
+	zero = {"delivered": 0, "opened": 0, "clicked": 0}
+	rows = [
+		{"step": 1, "variant_label": "A", "sent": 1000, "replied": 100, **zero},
+		{"step": 1, "variant_label": "B", "sent": 500, "replied": 75, **zero},
+		{"step": 2, "variant_label": "A", "sent": 10, "replied": 1, **zero},
+	]
+	a, b, only = experiment_service.funnel_stats(rows)
+	assert (a["control"], b["control"], only["control"]) == ("A", "A", "A")
+	assert a["z"] is None and only["z"] is None and not a["significant"]
+
+	# Pooled two-proportion z-test
+	pooled = 175 / 1500
+	z = (0.15 - 0.10) / math.sqrt(pooled * (1 - pooled) * (1 / 500 + 1 / 1000))
+	assert b["z"] == round(z, 4)
+	assert b["p_value"] == round(math.erfc(z / math.sqrt(2)), 6)
+	assert b["lift"] == 0.5
+	assert b["significant"]
+	assert b["rates"]["replied"]["rate"] == 0.15
+	assert b["rates"]["replied"]["ci_low"] < 0.15 < b["rates"]["replied"]["ci_high"]
+	assert experiment_service.funnel_stats(rows, confidence=0.999)[1]["significant"] is False
@@ -0,0 +1,33 @@
+from app.services.leads.keywords import KeywordMatcher, normalize_text
+from app.services.leads.scoring import LeadScoringService
+
+
+def test_normalize_text_collapses_punctuation():
+	assert normalize_text("  VP, Sales & Ops ") == "vp sales ops"
+	assert normalize_text(None) == ""
+
+
+def test_keywords_match_whole_words_only():
+	roles = KeywordMatcher({"vp": 90, "cto": 95, "ceo": 100})
+	assert roles.lookup("VP, Sales") == 90
+	assert roles.lookup("SVP Sales") is None
+	assert roles.lookup("Director of Sales") is None  # "cto" inside "director"
+	assert roles.lookup("co-founder/CTO") == 95
+	assert roles.lookup("", default=50) == 50
+
+
+def test_longest_overlapping_keyword_wins_then_highest_value():
+	titles = KeywordMatcher({"president": 60, "vice president": 80, "vice": 10})
+	assert titles.match("Vice President, Sales") == "vice president"
+	assert titles.match("Vice Chair") == "vice"
+	# Separate matches: highest value wins, ties go to the earliest
+	roles = KeywordMatcher({"manager": 70, "director": 80, "lead": 70, "head": 70})
+	assert roles.match("Manager / Director") == "director"
+	assert roles.match("Lead and Head") == "lead"
+
+
+def test_default_rules_score_roles_by_whole_word():
+	scoring = LeadScoringService()
+	assert scoring._matcher("role").lookup("Senior Director of Engineering") == 80
+	assert scoring._matcher("role").lookup("Directorate assistant", 50) == 50
+	assert scoring._matcher("location").lookup("New York City") == 85
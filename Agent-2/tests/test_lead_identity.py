@@ -0,0 +1,91 @@
+from sqlalchemy import func, select
+
+from app.models.lead import Lead
+from app.services.leads.identity import normalize_email, normalize_linkedin
+from app.services.leads.upsert import upsert_scraped_leads
+
+
+def test_identity_keys_are_normalized():
+	assert normalize_email("  Jane.Doe@Example.COM ") == "jane.doe@example.com"
+	assert normalize_email("   ") is None
+	for url in (
+		"https://www.linkedin.com/in/Jane-Doe/",
+		"http://uk.linkedin.com/in/jane-doe?trk=abc",
+		"linkedin.com/in/jane%2Ddoe#about",
+	):
+		assert normalize_linkedin(url) == "in/jane-doe"
+	assert normalize_linkedin("https://www.Example.com/team/?x=1") == "example.com/team"
+	assert Lead(email=" A@B.com ", linkedin_url="https://linkedin.com/company/Acme").email_key == "a@b.com"
+
+
+def test_upsert_merges_on_either_identity(run, db):
+	async def scenario():
+		stats = {}
+		first = await upsert_scraped_leads(db, [
+			{"name": "Jane", "email": "Jane@Example.com"},
+			{"email": "jane@example.com ", "linkedin_url": "https://linkedin.com/in/jane", "company": "Acme"},
+			{"name": "Bob"},
+			{"name": "Bob"},
+		], stats=stats)
+		await db.commit()
+		# In-batch duplicates share one lead; identity-less rows never merge
+		assert first[0] is first[1]
+		assert first[2] is not first[3]
+		assert stats == {"inserted": 3, "updated": 0}
+		assert (first[0].name, first[0].company, first[0].linkedin_key) == ("Jane", "Acme", "in/jane")
+
+		# A later batch matches by the LinkedIn key alone; overwrite=False only fills empty fields
+		stats = {}
+		again = await upsert_scraped_leads(db, [
+			{"name": "Janet", "role": "CTO", "linkedin_url": "https://www.linkedin.com/in/Jane/"},
+		], overwrite=False, stats=stats)
+		await db.commit()
+		assert again == [first[0]]
+		assert stats == {"inserted": 0, "updated": 1}
+		assert (again[0].name, again[0].role) == ("Jane", "CTO")
+		return await db.scalar(select(func.count()).select_from(Lead))
+
+	assert run(scenario()) == 3
+
+
+def test_migration_folds_duplicates_with_their_scores_and_qualifications(run, db):
+	from sqlalchemy import insert, text
+
+	from app.core.db import engine
+	from app.core.migrations import migrate_lead_identity, migrate_unique_lead_qualifications
+	from app.models.lead_note import LeadNote
+	from app.models.lead_score import LeadQualification, LeadScore
+
+	async def scenario():
+		# Legacy rows: identity keys not backfilled yet, so the unique indexes let duplicates in
+		async with engine.begin() as conn:
+			await conn.execute(insert(Lead.__table__), [
+				{"id": 1, "name": "Jane", "email": "Jane@Example.com", "linkedin_url": None},
+				{"id": 2, "name": None, "email": "jane@example.com", "linkedin_url": "https://linkedin.com/in/jane"},
+				{"id": 3, "name": "J. Doe", "email": None, "linkedin_url": "https://www.linkedin.com/in/Jane/"},
+				{"id": 4, "name": "Bob", "email": "bob@example.com", "linkedin_url": None},
+			])
+			await conn.execute(insert(LeadScore.__table__), [{"id": i, "lead_id": i, "total_score": 10.0 * i} for i in (1, 2, 3)])
+			await conn.execute(insert(LeadQualification.__table__), [
+				{"id": 1, "lead_id": 1, "has_email": True, "has_linkedin": False, "email_replied": False},
+				{"id": 2, "lead_id": 2, "has_email": False, "has_linkedin": True, "email_replied": False},
+				{"id": 3, "lead_id": 3, "has_email": False, "has_linkedin": False, "email_replied": True},
+			])
+			await conn.execute(insert(LeadNote.__table__), [{"lead_id": 3, "content": "met at expo"}])
+			await conn.run_sync(migrate_lead_identity)
+			await conn.run_sync(migrate_unique_lead_qualifications)
+
+		async with engine.connect() as conn:
+			leads = (await conn.execute(text("SELECT id, name, email_key, linkedin_key FROM leads ORDER BY id"))).all()
+			scores = (await conn.execute(text("SELECT lead_id, total_score FROM lead_scores"))).all()
+			quals = (await conn.execute(text(
+				"SELECT lead_id, has_email, has_linkedin, email_replied, is_qualified FROM lead_qualifications"
+			))).all()
+			notes = (await conn.execute(text("SELECT lead_id FROM lead_notes"))).scalars().all()
+		return leads, scores, quals, notes
+
+	leads, scores, quals, notes = run(scenario())
+	assert [tuple(r) for r in leads] == [(1, "Jane", "jane@example.com", "in/jane"), (4, "Bob", "bob@example.com", None)]
+	assert [tuple(r) for r in scores] == [(1, 30.0)]  # the newest score survives
+	assert [tuple(r) for r in quals] == [(1, 1, 1, 1, 0)]  # flags are OR-ed into one row
+	assert notes == [1]
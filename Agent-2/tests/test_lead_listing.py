@@ -0,0 +1,40 @@
+import pytest
+from fastapi import HTTPException, Response
+
+from app.api.v1.routes.leads import list_leads
+from app.models.lead import Lead
+from app.services.leads.listing import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips_and_rejects_tampering():
+	assert decode_cursor(encode_cursor(42)) == 42
+	assert "=" not in encode_cursor(42)
+	for bad in ("not-base64!", encode_cursor(42)[:-3], "eyJpZCI6ImEifQ", "WzFd"):  # garbage, truncated, {"id":"a"}, [1]
+		with pytest.raises(ValueError):
+			decode_cursor(bad)
+
+
+def test_keyset_pages_cover_every_lead_once(run, db):
+	async def seed():
+		db.add_all([Lead(name=f"l{i}", industry="saas" if i % 2 else "retail") for i in range(7)])
+		await db.commit()
+
+	async def page(cursor=None, industry=None):
+		response = Response()
+		leads = await list_leads(response, None, None, industry, None, cursor=cursor, skip=0, limit=3, db=db)
+		return [l.id for l in leads], response.headers.get("X-Next-Cursor"), response.headers["X-Total-Count"]
+
+	async def walk(industry=None):
+		ids, cursor = [], None
+		while True:
+			got, cursor, total = await page(cursor, industry)
+			ids += got
+			if not cursor:
+				return ids, total
+
+	run(seed())
+	assert run(walk()) == ([7, 6, 5, 4, 3, 2, 1], "7")
+	assert run(walk("saas")) == ([6, 4, 2], "3")  # exactly one full page: no next cursor
+	with pytest.raises(HTTPException) as err:
+		run(page("bogus"))
+	assert err.value.status_code == 400
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+import asyncio
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal
+from app.models.campaign import CampaignRecipient
+from app.services.campaigns import scheduler
+from app.services.campaigns.leases import claim_due_recipients, lease_worker, new_lease_token, seal_leases
+
+
+def test_claim_is_exclusive_until_the_lease_expires(run, db, seed_campaign):
+	seed_campaign(3)
+	first, second = new_lease_token(), new_lease_token()
+	assert lease_worker(first) == lease_worker(second) != first
+
+	async def scenario():
+		now = datetime.now(timezone.utc)
+		ids = await claim_due_recipients(db, first, now)
+		assert len(ids) == 3
+		assert await claim_due_recipients(db, second, now) == []
+		# Keyset: only rows past after_id are considered
+		await db.execute(update(CampaignRecipient).values(lease_owner=None, lease_expires_at=None))
+		await db.commit()
+		assert await claim_due_recipients(db, first, now, after_id=ids[0]) == ids[1:]
+		# An expired lease is claimable by anyone
+		later = now + timedelta(seconds=settings.SCHEDULER_LEASE_SECS + 1)
+		assert await claim_due_recipients(db, second, later) == ids
+		return ids
+
+	ids = run(scenario())
+
+	async def sealed():
+		# The first claim's CAS no longer matches any row; the second still holds all of them
+		return await seal_leases(db, first, ids), await seal_leases(db, second, ids)
+
+	assert run(sealed()) == (set(), set(ids))
+
+
+def test_no_send_after_the_lease_is_taken(run, db, email, seed_campaign, monkeypatch):
+	monkeypatch.setattr(settings, "EMAIL_SEND_CONCURRENCY", 1)
+	monkeypatch.setattr(settings, "SCHEDULER_HEARTBEAT_SECS", 0.05)
+	seed_campaign(3)
+	send = email.send
+
+	async def steal_then_send(messages):
+		if not email.sent:
+			# Another worker takes rows 2 and 3 while the first send is in flight
+			async with AsyncSessionLocal() as other:
+				await other.execute(
+					update(CampaignRecipient)
+					.where(CampaignRecipient.email != messages[0].to)
+					.values(lease_owner="other/1", lease_expires_at=datetime.now(timezone.utc) + timedelta(minutes=5))
+				)
+				await other.commit()
+			await asyncio.sleep(0.3)  # long enough for a heartbeat to notice
+		return await send(messages)
+
+	monkeypatch.setattr(email, "send", steal_then_send)
+	assert run(scheduler.send_due_emails_once()) == 1
+	assert [m.to for m in email.sent] == ["l0@example.com"]
+
+	async def load():
+		db.expire_all()
+		return list((await db.execute(select(CampaignRecipient).order_by(CampaignRecipient.id))).scalars())
+
+	sent, *stolen = run(load())
+	assert (sent.current_step, sent.lease_owner) == (1, None)
+	assert [(r.current_step, r.lease_owner) for r in stolen] == [(0, "other/1")] * 2
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+import time
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.models.campaign import CampaignRecipient
+from app.services.campaigns import scheduler
+
+
+def _recipients(run, db):
+	async def load():
+		db.expire_all()
+		return list((await db.execute(select(CampaignRecipient).order_by(CampaignRecipient.id))).scalars())
+
+	return run(load())
+
+
+def _make_due(run, db):
+	async def due():
+		await db.execute(update(CampaignRecipient).values(next_send_at=datetime.now(timezone.utc) - timedelta(seconds=1)))
+		await db.commit()
+
+	run(due())
+
+
+def test_failed_send_is_deferred_to_a_later_tick(run, db, email, seed_campaign, monkeypatch):
+	monkeypatch.setattr(settings, "EMAIL_RETRY_BACKOFF_SECS", 30.0)
+	monkeypatch.setattr(settings, "EMAIL_MAX_RETRIES", 3)
+	seed_campaign(2)
+	email.failing.add("l1@example.com")
+
+	started = time.monotonic()
+	assert run(scheduler.send_due_emails_once()) == 1
+	assert time.monotonic() - started < 5  # the tick does not wait out the backoff
+
+	ok, failed = _recipients(run, db)
+	assert (ok.current_step, ok.send_failures) == (1, 0)
+	assert (failed.current_step, failed.send_failures, failed.lease_owner) == (0, 1, None)
+	delay = (failed.next_send_at.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds()
+	assert 25 < delay <= 30
+
+	# Second failure doubles the backoff; the last allowed one falls back to the long deferral
+	_make_due(run, db)
+	run(scheduler.send_due_emails_once())
+	failed = _recipients(run, db)[1]
+	assert failed.send_failures == 2
+	assert 55 < (failed.next_send_at.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds() <= 60
+
+	_make_due(run, db)
+	run(scheduler.send_due_emails_once())
+	failed = _recipients(run, db)[1]
+	assert failed.send_failures == 0
+	assert (failed.next_send_at.replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)) > timedelta(minutes=settings.EMAIL_FAILURE_DEFERRAL_MINUTES - 1)
+
+	# Recovers once the provider accepts it
+	email.failing.clear()
+	_make_due(run, db)
+	assert run(scheduler.send_due_emails_once()) == 1
+	assert _recipients(run, db)[1].current_step == 1
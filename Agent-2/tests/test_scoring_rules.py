@@ -0,0 +1,55 @@
+from app.models.lead_score import ScoringRule
+from app.services.leads.rules import FieldPlan, ScoringRuleEngine, parse_number
+
+
+def _rule(condition, value, score, field="company_size", id=None):
+	return ScoringRule(id=id, name=f"{condition} {value}", field=field, condition=condition, value=value, score=score, is_active=True)
+
+
+def test_parse_number():
+	assert parse_number("1,000+") == 1000.0
+	assert parse_number("50-200") == 50.0
+	assert parse_number("startup") is None
+
+
+def test_equals_beats_contains_beats_bounds():
+	plan = FieldPlan([
+		_rule("greater_than", "100", 40),
+		_rule("greater_than", "1000", 70),
+		_rule("less_than", "10", 5),
+		_rule("contains", "Enterprise", 90),
+		_rule("contains", "  enterprise ", 10),  # same normalized key: the first rule wins
+		_rule("equals", "1,000+ (Enterprise)", 99),
+		_rule("greater_than", "lots", 1),  # non-numeric bound is skipped
+	])
+	assert plan.score("1,000+ (enterprise)") == 99
+	assert plan.score("5000 employees, enterprise") == 90
+	assert plan.score("5000 employees") == 70  # best satisfied bound
+	assert plan.score("500") == 40
+	assert plan.score("3") == 5
+	assert plan.score("50") is None
+	assert plan.score("") is None
+
+
+def test_rule_writes_bump_the_version_and_recompile(run, db, monkeypatch):
+	from app.core.config import settings
+
+	monkeypatch.setattr(settings, "SCORING_RULES_CHECK_SECS", 3600)
+	engine = ScoringRuleEngine()
+
+	async def scenario():
+		assert (await engine.refresh(db)).version == 0
+		db.add(_rule("contains", "fintech", 88, field="industry"))
+		await engine.bump_version(db)
+		await db.commit()
+		# Still within the check interval: the old plan is served until invalidate()
+		assert (await engine.refresh(db)).score("industry", "Fintech") is None
+		engine.invalidate()
+		plan = await engine.refresh(db)
+		assert (plan.version, plan.score("industry", "Fintech, payments")) == (1, 88)
+		await engine.bump_version(db)
+		await db.commit()
+		engine.invalidate()
+		return (await engine.refresh(db)).version
+
+	assert run(scenario()) == 2
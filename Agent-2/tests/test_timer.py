@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+import asyncio
+
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.models.campaign import CampaignRecipient
+from app.services.campaigns.timer import SendTimer
+
+
+def test_schedule_never_sets_a_time_in_the_past(run, db):
+	timer = SendTimer()
+	now = datetime.now(timezone.utc)
+	run(timer._load_window(now))
+	timer.schedule(now - timedelta(hours=1))
+	assert timer._heap[0] >= now + timedelta(seconds=settings.SCHEDULER_MIN_DELAY_SECS)
+	# Past the horizon waits for the next reload
+	timer.schedule(now + timedelta(seconds=settings.SCHEDULER_WINDOW_SECS * 2))
+	assert len(timer._heap) == 1
+
+
+def test_full_overdue_window_reloads_after_the_minimum_delay(run, db, seed_campaign, monkeypatch):
+	monkeypatch.setattr(settings, "SCHEDULER_WINDOW_MAX", 2)
+	seed_campaign(4)
+
+	async def lease_first():
+		await db.execute(
+			update(CampaignRecipient)
+			.where(CampaignRecipient.id == 1)
+			.values(lease_owner="other/1", lease_expires_at=datetime.now(timezone.utc) + timedelta(minutes=5))
+		)
+		await db.commit()
+
+	run(lease_first())
+	timer = SendTimer()
+	now = datetime.now(timezone.utc)
+	run(timer._load_window(now))
+	assert len(timer._heap) == 2  # the leased row is left out
+	assert timer._horizon < now
+	assert timer._reload_at >= now + timedelta(seconds=settings.SCHEDULER_MIN_DELAY_SECS)
+
+
+def test_run_does_not_spin_on_rows_that_stay_overdue(run, db, seed_campaign, monkeypatch):
+	monkeypatch.setattr(settings, "SCHEDULER_WINDOW_MAX", 2)
+	monkeypatch.setattr(settings, "SCHEDULER_MIN_DELAY_SECS", 0.1)
+	seed_campaign(4)
+	timer = SendTimer()
+
+	async def noop_tick():
+		return 0  # sends nothing, so every row stays overdue
+
+	async def run_for(secs):
+		task = asyncio.create_task(timer.run(noop_tick))
+		await asyncio.sleep(secs)
+		task.cancel()
+		await asyncio.gather(task, return_exceptions=True)
+
+	run(run_for(0.5))
+	assert 1 <= timer.stats["reloads"] <= 7
+	assert timer.stats["ticks"] <= timer.stats["reloads"]